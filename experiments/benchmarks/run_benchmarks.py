@@ -0,0 +1,338 @@
+r"""Microbenchmarks of GraphEnv, space_util, the example states and the example
+models, swept over the number of TSP nodes and the branching factor of a
+synthetic tree graph. Results are written as JSON, and can be compared against
+the results of an earlier run to spot regressions between releases. Run it as a
+module from the repository root, so that graphenv can be imported:
+
+    python -m experiments.benchmarks.run_benchmarks --output results.json
+    python -m experiments.benchmarks.run_benchmarks \
+        --only env_step make_observation --branching 2 64
+    python -m experiments.benchmarks.run_benchmarks \
+        --output new.json --compare results.json
+
+Each result records the seconds per call of the benchmarked function, best and
+mean over the repeats, and the items processed per second at the best time
+(environment steps, vertices or stacked observations).
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import timeit
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import gym
+import numpy as np
+from graphenv import space_util
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.tsp_nfp_state import TSPNFPState
+from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.graph_env import GraphEnv
+from graphenv.vertex import Vertex
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--num-nodes",
+    type=int,
+    nargs="+",
+    default=[10, 20, 50],
+    help="Numbers of TSP nodes to sweep over",
+)
+parser.add_argument(
+    "--branching",
+    type=int,
+    nargs="+",
+    default=[2, 8, 32],
+    help="Branching factors of the synthetic tree graph to sweep over",
+)
+parser.add_argument(
+    "--depth", type=int, default=8, help="Depth of the synthetic tree graph"
+)
+parser.add_argument(
+    "--only", type=str, nargs="+", default=None, help="Benchmarks to run"
+)
+parser.add_argument(
+    "--repeat", type=int, default=5, help="Number of timed repeats per benchmark"
+)
+parser.add_argument(
+    "--output", type=str, default=None, help="JSON file to write, else stdout"
+)
+parser.add_argument(
+    "--compare", type=str, default=None, help="JSON results of an earlier run"
+)
+
+# A benchmark yields, for each point of its sweep, the parameters and a function
+# doing one unit of work and returning the number of items it processed.
+Benchmark = Callable[[argparse.Namespace], Iterator[Tuple[Dict, Callable[[], int]]]]
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(function: Benchmark) -> Benchmark:
+    BENCHMARKS[function.__name__] = function
+    return function
+
+
+class TreeVertex(Vertex):
+    """A complete tree with a given branching factor and height, whose vertices
+    are observed as a small feature vector."""
+
+    __slots__ = ("branching", "height", "depth", "index")
+
+    def __init__(
+        self, branching: int, height: int, depth: int = 0, index: int = 0
+    ) -> None:
+        super().__init__()
+        self.branching = branching
+        self.height = height
+        self.depth = depth
+        self.index = index
+
+    @property
+    def observation_space(self) -> gym.spaces.Dict:
+        return gym.spaces.Dict(
+            {
+                "features": gym.spaces.Box(
+                    low=-np.inf, high=np.inf, shape=(8,), dtype=np.float32
+                ),
+                "depth": gym.spaces.Box(low=0, high=np.inf, shape=(1,), dtype=int),
+            }
+        )
+
+    @property
+    def root(self) -> "TreeVertex":
+        return TreeVertex(self.branching, self.height)
+
+    @property
+    def reward(self) -> float:
+        return 1.0
+
+    def _get_num_children(self) -> int:
+        return self.branching if self.depth < self.height else 0
+
+    def _get_children(self) -> Iterator["TreeVertex"]:
+        for i in range(self._get_num_children()):
+            yield TreeVertex(self.branching, self.height, self.depth + 1, i)
+
+    def _make_observation(self) -> Dict[str, np.ndarray]:
+        return {
+            "features": np.full(8, self.index, dtype=np.float32),
+            "depth": np.array([self.depth]),
+        }
+
+
+def tree_env(branching: int, depth: int) -> GraphEnv:
+    return GraphEnv(
+        {"state": TreeVertex(branching, depth), "max_num_children": branching}
+    )
+
+
+def tsp_env(state_class: type, num_nodes: int) -> GraphEnv:
+    state = state_class(make_complete_planar_graph(N=num_nodes, seed=0))
+    return GraphEnv({"state": state, "max_num_children": num_nodes})
+
+
+@benchmark
+def env_reset(args):
+    for branching in args.branching:
+        env = tree_env(branching, args.depth)
+
+        def run():
+            env.reset()
+            return 1
+
+        yield {"branching": branching}, run
+
+
+@benchmark
+def env_step(args):
+    for branching in args.branching:
+        env = tree_env(branching, args.depth)
+
+        def run():
+            env.reset()
+            done, steps = False, 0
+            while not done:
+                _, _, done, _ = env.step(steps % branching)
+                steps += 1
+            return steps
+
+        yield {"branching": branching, "depth": args.depth}, run
+
+
+@benchmark
+def make_observation(args):
+    for branching in args.branching:
+        env = tree_env(branching, args.depth)
+
+        def run():
+            # Observe a fresh vertex, with nothing memoized
+            env.make_observation(env.state.root)
+            return 1
+
+        yield {"branching": branching}, run
+
+    for state_class in [TSPState, TSPNFPState]:
+        for num_nodes in args.num_nodes:
+            env = tsp_env(state_class, num_nodes)
+
+            def run():
+                env.make_observation(env.state.root)
+                return 1
+
+            yield {"state": state_class.__name__, "num_nodes": num_nodes}, run
+
+
+@benchmark
+def stack_observations(args):
+    for branching in args.branching:
+        vertex = TreeVertex(branching, 1)
+        space = vertex.observation_space
+        observations = [child.observation for child in vertex.children]
+
+        def run():
+            space_util.stack_observations(space, observations)
+            return len(observations)
+
+        yield {"branching": branching}, run
+
+
+@benchmark
+def broadcast_space(args):
+    for num_nodes in args.num_nodes:
+        state = TSPNFPState(make_complete_planar_graph(N=num_nodes, seed=0))
+        space = state.observation_space
+
+        def run():
+            space_util.broadcast_space(space, (num_nodes + 1,))
+            return 1
+
+        yield {"state": "TSPNFPState", "num_nodes": num_nodes}, run
+
+
+@benchmark
+def tsp_expansion(args):
+    for state_class in [TSPState, TSPNFPState]:
+        for num_nodes in args.num_nodes:
+            state = state_class(make_complete_planar_graph(N=num_nodes, seed=0))
+
+            def expand():
+                children = state.new([0]).children
+                for child in children:
+                    child.observation
+                return len(children)
+
+            def expand_batch():
+                return state.new([0]).children_batch.num_children
+
+            params = {"state": state_class.__name__, "num_nodes": num_nodes}
+            yield {**params, "mode": "objects"}, expand
+            yield {**params, "mode": "batch"}, expand_batch
+
+
+@benchmark
+def forward_vertex(args):
+    from graphenv import tf
+    from graphenv.examples.tsp.tsp_model import TSPModel
+    from graphenv.examples.tsp.tsp_nfp_model import TSPGNNModel
+
+    for state_class, model_class in [(TSPState, TSPModel), (TSPNFPState, TSPGNNModel)]:
+        for num_nodes in args.num_nodes:
+            env = tsp_env(state_class, num_nodes)
+            model_kwargs = {"num_nodes": num_nodes} if model_class is TSPModel else {}
+            model = model_class(
+                env.observation_space,
+                env.action_space,
+                1,
+                {},
+                model_class.__name__,
+                **model_kwargs,
+            )
+            inputs = tf.nest.map_structure(
+                tf.constant, env.reset()["vertex_observations"]
+            )
+
+            def run():
+                model.forward_vertex(inputs)
+                return num_nodes + 1
+
+            yield {"model": model_class.__name__, "num_nodes": num_nodes}, run
+
+
+def measure(function: Callable[[], int], repeat: int) -> Dict:
+    """Times a benchmark function, calling it enough times per repeat for the
+    repeat to take about 0.2 seconds."""
+    items = function()  # warm up, e.g. for tf.function tracing
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    times = np.array(timer.repeat(repeat=repeat, number=number)) / number
+    return {
+        "number": number,
+        "repeat": repeat,
+        "min_seconds": float(times.min()),
+        "mean_seconds": float(times.mean()),
+        "items_per_second": items / float(times.min()),
+    }
+
+
+def compare(results: List[Dict], path: str) -> None:
+    """Prints the ratio of each result's best time to that of the same
+    benchmark and parameters in an earlier run."""
+    with open(path) as file:
+        baseline = {
+            (r["benchmark"], json.dumps(r["params"], sort_keys=True)): r
+            for r in json.load(file)["results"]
+            if "min_seconds" in r
+        }
+    for result in results:
+        key = (result["benchmark"], json.dumps(result["params"], sort_keys=True))
+        if key in baseline and "min_seconds" in result:
+            ratio = result["min_seconds"] / baseline[key]["min_seconds"]
+            print(f"{key[0]} {key[1]}: {ratio:.2f}x baseline time", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    names = args.only or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks {sorted(unknown)}")
+
+    results = []
+    for name in names:
+        try:
+            for params, function in BENCHMARKS[name](args):
+                result = {"benchmark": name, "params": params}
+                result.update(measure(function, args.repeat))
+                results.append(result)
+                print(
+                    f"{name} {params}: {1e6 * result['min_seconds']:.1f} us, "
+                    f"{result['items_per_second']:.0f} items/s",
+                    file=sys.stderr,
+                )
+        except ImportError as error:
+            # e.g. the example models without rllib's model classes
+            results.append({"benchmark": name, "params": {}, "skipped": str(error)})
+            print(f"{name}: skipped, {error}", file=sys.stderr)
+
+    import graphenv
+
+    output = {
+        "metadata": {
+            "graphenv": graphenv.__version__,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+    if args.output is None:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as file:
+            json.dump(output, file, indent=2)
+
+    if args.compare is not None:
+        compare(results, args.compare)
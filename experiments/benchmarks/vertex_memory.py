@@ -0,0 +1,78 @@
+r"""Reports the memory held per live vertex, for vertex objects alone and for
+memoized search trees, using tracemalloc.
+
+Run it from the repository root before and after changes to Vertex or the
+example states:
+
+    python -m experiments.benchmarks.vertex_memory \
+        --num-vertices 100000 --tsp-nodes 20 --depth 3
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable, List
+
+from graphenv.examples.hallway.hallway_state import HallwayState
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.tsp_state import TSPState
+
+parser = argparse.ArgumentParser()
+parser.add_argument(
+    "--num-vertices", type=int, default=100000, help="Number of standalone vertices"
+)
+parser.add_argument("--tsp-nodes", type=int, default=20, help="Nodes in the TSP")
+parser.add_argument(
+    "--depth", type=int, default=3, help="Depth of the expanded TSP search tree"
+)
+
+
+def measure(build: Callable[[], List]) -> float:
+    """Returns the bytes allocated by build() and still held by its result,
+    per element of the result."""
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    result = build()
+    gc.collect()
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    total = sum(stat.size_diff for stat in end.compare_to(start, "filename"))
+    return total / len(result)
+
+
+def expand(root, depth: int, observe: bool) -> List:
+    """Memoizes the children, and optionally observations, of every vertex down
+    to the given depth, returning all vertices of the tree."""
+    vertices, frontier = [root], [root]
+    for _ in range(depth):
+        frontier = [child for vertex in frontier for child in vertex.children]
+        vertices.extend(frontier)
+    if observe:
+        for vertex in vertices:
+            vertex.observation
+    return vertices
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    per_vertex = measure(
+        lambda: [HallwayState(10, i % 10) for i in range(args.num_vertices)]
+    )
+    print(f"HallwayState: {per_vertex:.0f} bytes/vertex")
+
+    G = make_complete_planar_graph(N=args.tsp_nodes, seed=0)
+    state = TSPState(G)
+    per_vertex = measure(
+        lambda: [state.new([0, i]) for i in range(args.num_vertices)]
+    )
+    print(f"TSPState: {per_vertex:.0f} bytes/vertex")
+
+    for observe in [False, True]:
+        root = TSPState(G)
+        per_vertex = measure(lambda: expand(root, args.depth, observe))
+        label = "with observations" if observe else "children only"
+        print(
+            f"TSPState tree, depth {args.depth}, {label}: "
+            f"{per_vertex:.0f} bytes/vertex"
+        )
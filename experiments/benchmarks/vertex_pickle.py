@@ -0,0 +1,48 @@
+"""Reports the pickle size and time of TSPState vertices whose search tree has
+been expanded to increasing depths, as when a touched env_config state or a
+searched vertex is sent to another process.
+
+Run it from the repository root before and after changes to vertex pickling:
+
+    python -m experiments.benchmarks.vertex_pickle --tsp-nodes 20 --max-depth 3
+"""
+import argparse
+import pickle
+import timeit
+
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.tsp_state import TSPState
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--tsp-nodes", type=int, default=20, help="Nodes in the TSP")
+parser.add_argument(
+    "--max-depth", type=int, default=3, help="Deepest expanded search tree"
+)
+parser.add_argument(
+    "--repeat", type=int, default=5, help="Number of timed pickles per depth"
+)
+
+
+def expand(root, depth: int) -> None:
+    """Memoizes the children and observations of every vertex down to the
+    given depth."""
+    frontier = [root]
+    for _ in range(depth):
+        for vertex in frontier:
+            vertex.observation
+        frontier = [child for vertex in frontier for child in vertex.children]
+
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    G = make_complete_planar_graph(N=args.tsp_nodes, seed=0)
+
+    for depth in range(args.max_depth + 1):
+        root = TSPState(G)
+        expand(root, depth)
+        size = len(pickle.dumps(root))
+        seconds = timeit.timeit(lambda: pickle.dumps(root), number=args.repeat)
+        print(
+            f"TSPState, tree depth {depth}: {size} bytes, "
+            f"{1e3 * seconds / args.repeat:.3f} ms per pickle"
+        )
@@ -1,14 +1,23 @@
 import argparse
 import logging
+import os
+import sys
 
 import ray
-from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.baselines import (
+    greedy_edge_tour,
+    nearest_neighbor_tour,
+    space_filling_curve_tour,
+)
+from graphenv.examples.tsp.graph_utils import get_positions, make_complete_planar_graph
+from graphenv.examples.tsp.held_karp import HeldKarp
+from graphenv.examples.tsp.instance_pool import TSPInstancePool
+from graphenv.examples.tsp.local_search import improve_tours
 from graphenv.examples.tsp.tsp_model import TSPModel, TSPQModel
-from graphenv.examples.tsp.tsp_nfp_model import TSPGNNModel
+from graphenv.examples.tsp.tsp_nfp_model import TSPGNNModel, TSPSharedGNNModel
 from graphenv.examples.tsp.tsp_nfp_state import TSPNFPState
 from graphenv.examples.tsp.tsp_state import TSPState
 from graphenv.graph_env import GraphEnv
-from networkx.algorithms.approximation.traveling_salesman import greedy_tsp
 from ray import tune
 from ray.rllib.agents import a3c, dqn, marwil, ppo
 from ray.rllib.models import ModelCatalog
@@ -29,15 +38,47 @@ parser.add_argument("--N", type=int, default=5, help="Number of nodes in TSP net
 parser.add_argument(
     "--use-gnn", action="store_true", help="use the nfp state and gnn model"
 )
+parser.add_argument(
+    "--shared-gnn",
+    action="store_true",
+    help="with --use-gnn, encode the graph once per observation rather than once "
+    "per vertex",
+)
 parser.add_argument(
     "--max-num-neighbors",
     type=int,
     default=5,
     help="Number of nearest neighbors for the gnn model",
 )
+parser.add_argument(
+    "--max-num-children",
+    type=int,
+    default=None,
+    help="Only offer the nearest unvisited nodes as actions, at most this many "
+    "per step. Defaults to all nodes.",
+)
 parser.add_argument(
     "--seed", type=int, default=0, help="Random seed used to generate networkx graph"
 )
+parser.add_argument(
+    "--instance-pool",
+    type=str,
+    default=None,
+    help="Directory of a pre-generated instance pool to draw a new graph from on "
+    "every reset. Generated with --num-instances instances if it does not exist.",
+)
+parser.add_argument(
+    "--num-instances",
+    type=int,
+    default=10000,
+    help="Number of instances to generate for a new instance pool",
+)
+parser.add_argument(
+    "--build-in-workers",
+    action="store_true",
+    help="Build the instance in each rollout worker from --N and --seed, rather "
+    "than sending it from the driver",
+)
 parser.add_argument(
     "--num-workers", type=int, default=1, help="Number of rllib workers"
 )
@@ -81,17 +122,23 @@ if __name__ == "__main__":
     N = args.N
     G = make_complete_planar_graph(N=N, seed=args.seed)
 
-    # Compute the reward baseline with heuristic
-    import networkx as nx
+    # Compute the reward baselines with construction heuristics
+    pos = get_positions(G)
+    for name, heuristic in [
+        ("nearest neighbor", nearest_neighbor_tour),
+        ("greedy edge", greedy_edge_tour),
+        ("space filling curve", space_filling_curve_tour),
+    ]:
+        tour, cost = heuristic(pos)
+        print(f"Baseline {name} reward: {-cost:1.3f}")
 
-    tsp_approx = nx.approximation.traveling_salesman_problem
-    path = tsp_approx(G, cycle=True)
-    reward_baseline = -sum([G[path[i]][path[i + 1]]["weight"] for i in range(0, N)])
-    print(f"Networkx heuristic reward: {reward_baseline:1.3f}")
+    tour, _ = greedy_edge_tour(pos)
+    _, cost = improve_tours(pos, tour, time_budget=10.0)
+    print(f"Baseline greedy edge + 2-opt/Or-opt reward: {-cost:1.3f}")
 
-    path = tsp_approx(G, cycle=True, method=greedy_tsp)
-    reward_baseline = -sum([G[path[i]][path[i + 1]]["weight"] for i in range(0, N)])
-    print(f"Networkx greedy reward: {reward_baseline:1.3f}")
+    if N <= 20:
+        cost = HeldKarp(TSPState(G).distance_matrix).cost
+        print(f"Optimal (Held-Karp) reward: {-cost:1.3f}")
 
     # Algorithm-specific config, common ones are in the main config dict below
     if args.run == "PPO":
@@ -124,8 +171,10 @@ if __name__ == "__main__":
     if args.use_gnn:
         custom_model = "TSPGNNModel"
         custom_model_config = {"num_messages": 1, "embed_dim": 32}
-        ModelCatalog.register_custom_model(custom_model, TSPGNNModel)
+        Model = TSPSharedGNNModel if args.shared_gnn else TSPGNNModel
+        ModelCatalog.register_custom_model(custom_model, Model)
         _tag = "gnn"
+        state_class = TSPNFPState
         state = TSPNFPState(G, max_num_neighbors=args.max_num_neighbors)
     else:
         custom_model_config = {"hidden_dim": 256, "embed_dim": 256, "num_nodes": N}
@@ -133,19 +182,58 @@ if __name__ == "__main__":
         Model = TSPQModel if args.run in ["DQN", "R2D2"] else TSPModel
         ModelCatalog.register_custom_model(custom_model, Model)
         _tag = f"basic{args.run}"
+        state_class = TSPState
         state = TSPState(G)
 
+    if args.instance_pool is not None:
+        if not os.path.exists(args.instance_pool):
+            TSPInstancePool.generate(
+                args.instance_pool,
+                args.num_instances,
+                N,
+                seed=args.seed,
+                preprocess=args.use_gnn,
+                max_num_neighbors=args.max_num_neighbors,
+            )
+        pool = TSPInstancePool(args.instance_pool, seed=args.seed)
+        state = state_class.from_instance_pool(pool)
+        _tag += "_pool"
+    elif not args.build_in_workers and sys.version_info >= (3, 8):
+        # Publish the instance once in shared memory rather than pickling a
+        # copy of the graph to every rollout worker. Shared memory needs
+        # Python 3.8, earlier versions pickle the state as is.
+        state = state.share()
+
     # Register env name with hyperparams that will help tracking experiments
     # via tensorboard
     env_name = f"graphenv_{N}_{_tag}_lr={args.lr}"
-    register_env(env_name, lambda config: GraphEnv(config))
+
+    def make_env(config):
+        pool = getattr(config.get("state"), "instance_pool", None)
+        if pool is not None:
+            # Each rollout worker and vectorized env draws its own reproducible
+            # stream of instances
+            pool = pool.spawn(config.worker_index, config.vector_index)
+            config = {**config, "state": state_class.from_instance_pool(pool)}
+        return GraphEnv(config)
+
+    register_env(env_name, make_env)
+
+    env_config = {
+        "max_num_children": args.max_num_children or G.number_of_nodes(),
+        "preselect_children": args.max_num_children is not None,
+    }
+    if args.build_in_workers and args.instance_pool is None:
+        env_config["state_factory"] = "tsp_nfp" if args.use_gnn else "tsp"
+        env_config["state_config"] = {"N": N, "seed": args.seed}
+        if args.use_gnn:
+            env_config["state_config"]["max_num_neighbors"] = args.max_num_neighbors
+    else:
+        env_config["state"] = state
 
     config = {
         "env": env_name,
-        "env_config": {
-            "state": state,
-            "max_num_children": G.number_of_nodes(),
-        },
+        "env_config": env_config,
         "model": {
             "custom_model": custom_model,
             "custom_model_config": custom_model_config,
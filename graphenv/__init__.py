@@ -1,10 +1,42 @@
-from . import _version
+"""graphenv loads its optional heavy dependencies lazily: importing the package,
+graphenv.vertex, graphenv.graph_env or graphenv.space_util imports neither
+TensorFlow nor rllib. TensorFlow is imported, with eager execution enabled, the
+first time graphenv.tf is used, e.g. by ``from graphenv import tf`` in the model
+modules. The package version is read from the installed package metadata,
+written at build time, and only falls back to querying git in source checkouts.
+"""
+import functools
 
-__version__ = _version.get_versions()["version"]
 
-from ray.rllib.utils.framework import try_import_tf
+@functools.lru_cache(maxsize=None)
+def _import_tf():
+    from ray.rllib.utils.framework import try_import_tf
 
-tf1, tf, tfv = try_import_tf(error=True)
-assert tfv == 2
-if not tf1.executing_eagerly():
-    tf1.enable_eager_execution()
+    tf1, tf, tfv = try_import_tf(error=True)
+    assert tfv == 2
+    if not tf1.executing_eagerly():
+        tf1.enable_eager_execution()
+    return tf1, tf, tfv
+
+
+@functools.lru_cache(maxsize=None)
+def _get_version() -> str:
+    try:
+        from importlib import metadata
+    except ImportError:  # Python < 3.8
+        import importlib_metadata as metadata
+
+    try:
+        return metadata.version(__name__)
+    except metadata.PackageNotFoundError:
+        from . import _version
+
+        return _version.get_versions()["version"]
+
+
+def __getattr__(name: str):
+    if name == "__version__":
+        return _get_version()
+    if name in ("tf1", "tf", "tfv"):
+        return _import_tf()[("tf1", "tf", "tfv").index(name)]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,99 @@
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import gym
+import numpy as np
+
+from graphenv.csr_graph import CSRGraph
+from graphenv.vertex import ChildrenBatch, Vertex
+
+
+class ArrayGraphVertex(Vertex):
+    """Vertex of an explicit graph stored in a CSRGraph, such as a road network
+    or a state machine loaded from networkx, SciPy, or arrays saved with
+    CSRGraph.save(). A vertex is only a graph reference and an index: its
+    children are a slice of the graph's indices, its observation is a row of
+    the graph's features, and its children are observed as a ChildrenBatch.
+    Graphs loaded with a mmap_mode are read from disk as the env walks them.
+
+    Observations are dicts with the vertex index under "index" and, if the
+    graph has features, the vertex's features under "features".
+    """
+
+    __slots__ = ("graph", "index", "root_index")
+
+    def __init__(self, graph: CSRGraph, index: int = 0, root_index: int = 0) -> None:
+        """Creates a vertex of a graph.
+
+        Args:
+            graph (CSRGraph): graph the vertex belongs to
+            index (int, optional): index of the vertex. Defaults to 0.
+            root_index (int, optional): index of the root vertex. Defaults to 0.
+        """
+        super().__init__()
+        self.graph = graph
+        self.index = index
+        self.root_index = root_index
+
+    def new(self, index: int) -> "ArrayGraphVertex":
+        """Creates another vertex of the same graph.
+
+        Args:
+            index (int): index of the vertex
+
+        Returns:
+            ArrayGraphVertex: the vertex
+        """
+        return self.__class__(self.graph, index, self.root_index)
+
+    @property
+    def observation_space(self) -> gym.spaces.Dict:
+        spaces = {
+            "index": gym.spaces.Box(
+                low=0, high=self.graph.num_vertices, shape=(1,), dtype=int
+            )
+        }
+        features = self.graph.features
+        if features is not None:
+            spaces["features"] = gym.spaces.Box(
+                low=-np.inf, high=np.inf, shape=features.shape[1:], dtype=features.dtype
+            )
+        return gym.spaces.Dict(spaces)
+
+    @property
+    def root(self) -> "ArrayGraphVertex":
+        return self.new(self.root_index)
+
+    @property
+    def reward(self) -> float:
+        return float(self.graph.rewards[self.index])
+
+    def _child_indices(self) -> np.ndarray:
+        if self.graph.terminal[self.index]:
+            return self.graph.indices[:0]
+        return self.graph.children(self.index)
+
+    def _get_num_children(self) -> int:
+        return len(self._child_indices())
+
+    def _get_children(self) -> Iterator["ArrayGraphVertex"]:
+        for index in self._child_indices().tolist():
+            yield self.new(index)
+
+    def _get_children_subset(self, indices: Sequence[int]) -> List["ArrayGraphVertex"]:
+        children = self._child_indices()[np.asarray(indices, dtype=np.int64)]
+        return [self.new(index) for index in children.tolist()]
+
+    def _observe(self, indices: np.ndarray) -> Dict[str, np.ndarray]:
+        observation = {"index": np.asarray(indices)[..., np.newaxis]}
+        if self.graph.features is not None:
+            observation["features"] = np.asarray(self.graph.features[indices])
+        return observation
+
+    def _make_observation(self) -> Dict[str, np.ndarray]:
+        return self._observe(np.array(self.index))
+
+    def _get_children_batch(self) -> Optional[ChildrenBatch]:
+        children = np.asarray(self._child_indices())
+        return ChildrenBatch(
+            len(children), self._observe(children), fields={"index": children}
+        )
@@ -0,0 +1,107 @@
+import asyncio
+from abc import abstractmethod
+from typing import Iterable, List, Optional, Sequence
+
+from graphenv.vertex import V, Vertex, _lock_for
+
+
+class AsyncVertex(Vertex[V]):
+    """Vertex whose children and observation are computed by coroutines, for
+    verticies that wait on slow external evaluators. To implement a graph using
+    this class, subclass AsyncVertex and implement _get_children_async() and
+    _make_observation_async() in place of _get_children() and
+    _make_observation().
+
+    GraphEnv's async methods, such as make_observation_async(), await the
+    observations of all children concurrently, so that a step waits for about
+    one evaluator round-trip rather than one per child. The synchronous API
+    still works, running each coroutine to completion with asyncio.run(), but
+    only outside of a running event loop.
+    """
+
+    __slots__ = ()
+
+    @abstractmethod
+    async def _get_children_async(self) -> Sequence[V]:
+        """Gets the child verticies of this vertex.
+
+        Returns:
+            Sequence[N]: Sequence of child verticies.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _make_observation_async(self) -> any:
+        """Gets an observation of this vertex. This observation should have
+        the same shape as described by the vertex observation space.
+
+        Returns:
+            any: Observation with the same shape as defined by
+                the observation space.
+        """
+        raise NotImplementedError
+
+    def _get_children(self) -> Sequence[V]:
+        return asyncio.run(self._get_children_async())
+
+    def _make_observation(self) -> any:
+        return asyncio.run(self._make_observation_async())
+
+    async def children_async(self) -> List[V]:
+        """
+        Gets the child verticies of this vertex, memoized as for children.
+        Concurrent calls on the same vertex may each await
+        _get_children_async(), but all of them return the first memoized list.
+
+        Returns:
+            List[N] : List of child verticies
+        """
+        if self._children is None:
+            children = list(await self._get_children_async())
+            with _lock_for(self):
+                if self._children is None:
+                    self._children = children
+        return self._children
+
+    async def observation_async(self) -> any:
+        """
+        Gets the observation of this vertex, memoized as for observation.
+
+        Returns:
+            Observation of this vertex.
+        """
+        if self._observation is None:
+            observation = await self._make_observation_async()
+            with _lock_for(self):
+                if self._observation is None:
+                    self._observation = observation
+        return self._observation
+
+
+async def gather_observations(
+    vertices: Iterable[Vertex], max_concurrency: Optional[int] = None
+) -> List[any]:
+    """Observes verticies concurrently, awaiting the observations of
+    AsyncVertex instances and reading those of other verticies directly.
+
+    Args:
+        vertices (Iterable[Vertex]): verticies to observe
+        max_concurrency (int, optional): maximum number of observations awaited
+            at once. Defaults to None, which awaits all of them at once.
+
+    Returns:
+        List[any]: Observation of each vertex, in order.
+    """
+    semaphore = None
+    if max_concurrency is not None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def observe(vertex: Vertex) -> any:
+        if not isinstance(vertex, AsyncVertex):
+            return vertex.observation
+        if semaphore is None:
+            return await vertex.observation_async()
+        async with semaphore:
+            return await vertex.observation_async()
+
+    return await asyncio.gather(*(observe(vertex) for vertex in vertices))
@@ -0,0 +1,160 @@
+import logging
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import graphenv.space_util as space_util
+from graphenv.graph_model import GraphModel
+from graphenv.vertex import V
+
+logger = logging.getLogger(__name__)
+
+SCORINGS = ("log_prob", "value")
+
+
+def _segment_log_softmax(
+    weights: np.ndarray, starts: np.ndarray, segments: np.ndarray
+) -> np.ndarray:
+    """Log-softmax of weights over each run of entries beginning at starts,
+    where segments holds the index of the run every entry belongs to."""
+    shifted = weights - np.maximum.reduceat(weights, starts)[segments]
+    log_norm = np.log(np.add.reduceat(np.exp(shifted), starts))
+    return shifted - log_norm[segments]
+
+
+def _unroll(history: Tuple) -> List:
+    path = []
+    while history is not None:
+        history, vertex = history
+        path.append(vertex)
+    return path[::-1]
+
+
+def beam_search(
+    model: GraphModel,
+    roots: Sequence[V],
+    beam_width: int = 4,
+    scoring: str = "log_prob",
+    max_steps: Optional[int] = None,
+    groups: Optional[Sequence[int]] = None,
+) -> List[Tuple[List[V], float]]:
+    """Decodes paths from a batch of root vertices with beam search.
+
+    Each instance keeps its beam_width best partial paths. At every step, the
+    children of every path of every instance are evaluated together in a single
+    call to model.forward_vertex, and each instance keeps the beam_width
+    candidates with the best cumulative score. Paths that reach a terminal
+    vertex leave the beam, and the search ends once no paths remain.
+
+    When groups are given and the model provides encode_roots() and
+    forward_encoded(), the model encodes one root of each group once, before
+    the search, and scores every vertex against the encoding of its root's
+    group. For example, the roots decoding the same TSP instance from different
+    start nodes share a single encoding of its graph.
+
+    Args:
+        model: Model used to score vertices. Only its forward_vertex() method is
+            used, or its encode_roots() and forward_encoded() methods with
+            groups, so any object providing them can be passed.
+        roots: Vertices to start from, typically one per problem instance.
+        beam_width: Number of paths kept per instance. A width of 1 gives the
+            greedy decoding of the model. Defaults to 4.
+        scoring: How candidates are ranked. "log_prob" sums the log-softmax of
+            the action weights over each vertex's children, ranking paths by
+            their likelihood under the policy. "value" ranks a candidate by the
+            rewards collected so far plus the model's value of the candidate.
+            Defaults to "log_prob".
+        max_steps: Optional limit on the number of steps. Unfinished paths are
+            returned if it is reached first.
+        groups: Optional group of each root, such as the problem instance it
+            belongs to, letting the roots of a group share their encoding.
+
+    Raises:
+        ValueError: If the scoring is not one of SCORINGS.
+
+    Returns:
+        For each root, the (path of vertices from the root, total reward) of the
+        finished path with the highest total reward.
+    """
+    if scoring not in SCORINGS:
+        raise ValueError(f"Unknown scoring {scoring}, expected one of {SCORINGS}")
+
+    # Each path is (vertex, history, score, total reward), with history a linked
+    # list of (parent history, vertex) pairs
+    finished: List[List[Tuple]] = [[] for _ in roots]
+    beams: List[List[Tuple]] = [[] for _ in roots]
+    for instance, root in enumerate(roots):
+        path = (root, (None, root), 0.0, 0.0)
+        (finished if root.terminal else beams)[instance].append(path)
+
+    encodings = None
+    if groups is not None and hasattr(model, "encode_roots"):
+        _, first, root_group = np.unique(groups, return_index=True, return_inverse=True)
+        encodings = model.encode_roots(
+            space_util.stack_observations(
+                roots[0].observation_space, [roots[i].observation for i in first]
+            )
+        )
+
+    step = 0
+    while any(beams) and (max_steps is None or step < max_steps):
+        step += 1
+        parents = [path for beam in beams for path in beam]
+        parent_instance = np.repeat(np.arange(len(beams)), [len(b) for b in beams])
+        children = [path[0].children for path in parents]
+
+        counts = np.array([len(c) for c in children], dtype=np.int64)
+        expandable = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[expandable]
+        segments = np.repeat(np.arange(len(parents)), counts)
+        candidates = [child for c in children for child in c]
+        if not candidates:
+            break
+
+        space = candidates[0].observation_space
+        observations = space_util.stack_observations(
+            space, [child.observation for child in candidates]
+        )
+        if encodings is None:
+            values, weights = model.forward_vertex(observations)
+        else:
+            group = root_group[parent_instance[segments]]
+            values, weights = model.forward_encoded(encodings, group, observations)
+        values = np.asarray(values, dtype=float).reshape(-1)
+        weights = np.asarray(weights, dtype=float).reshape(-1)
+
+        parent_score = np.array([path[2] for path in parents])
+        parent_total = np.array([path[3] for path in parents])
+        rewards = None
+        if scoring == "log_prob":
+            runs = (np.cumsum(expandable) - 1)[segments]
+            log_probs = _segment_log_softmax(weights, starts, runs)
+            scores = parent_score[segments] + log_probs
+        else:
+            rewards = np.array([child.reward for child in candidates], dtype=float)
+            scores = parent_total[segments] + rewards + values
+
+        # Rank candidates by score within each instance and keep the best
+        instance = parent_instance[segments]
+        order = np.lexsort((-scores, instance))
+        first = np.searchsorted(instance[order], np.arange(len(beams)))
+        rank = np.arange(len(order)) - first[instance[order]]
+        keep = order[rank < beam_width]
+
+        beams = [[] for _ in roots]
+        for k in keep:
+            child, parent = candidates[k], parents[segments[k]]
+            reward = child.reward if rewards is None else rewards[k]
+            path = (child, (parent[1], child), scores[k], parent[3] + reward)
+            (finished if child.terminal else beams)[instance[k]].append(path)
+
+        logger.debug(
+            f"beam search step {step}: {len(candidates)} candidates, "
+            f"{sum(len(f) for f in finished)} finished"
+        )
+
+    results = []
+    for instance_finished, beam in zip(finished, beams):
+        best = max(instance_finished or beam, key=lambda path: path[3])
+        results.append((_unroll(best[1]), best[3]))
+    return results
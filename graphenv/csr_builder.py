@@ -0,0 +1,215 @@
+"""Out-of-core construction of CSRGraph arrays from edge lists.
+
+build_csr() streams an edge list in chunks and writes the CSR arrays straight
+to .npy files with an external distribution sort. The first pass counts the
+children of each vertex, which gives the row offsets. Those split the vertices
+into buckets, runs of consecutive vertices with about bucket_size edges in
+total. The second pass appends each chunk's edges to a temporary file per
+bucket. Finally each bucket is sorted in memory and written to its contiguous
+rows of the indices file. Every file is read and written sequentially, and only
+the edge chunks, one bucket and a few per-vertex arrays are held in memory, so
+graphs with more edges than fit in RAM can be built and then walked with
+ArrayGraphVertex from the memory-mapped result.
+"""
+import itertools
+import logging
+import os
+import tempfile
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from graphenv.csr_graph import CSRGraph
+
+logger = logging.getLogger(__name__)
+
+
+def read_chunks(
+    path: str, chunk_size: int = 1 << 20, dtype: Optional[np.dtype] = None
+) -> Iterator[np.ndarray]:
+    """Reads the rows of a 2-d array file in chunks, without loading the file.
+
+    Args:
+        path: .npy file, read memory-mapped, or whitespace-delimited text file
+            with one row per line and lines starting with "#" ignored.
+        chunk_size: Number of rows per chunk.
+        dtype: Type of the returned chunks. Defaults to the type of the .npy
+            file, or float for text files.
+
+    Yields:
+        (rows, columns) arrays of consecutive rows.
+    """
+    if path.endswith(".npy"):
+        array = np.load(path, mmap_mode="r")
+        for start in range(0, len(array), chunk_size):
+            yield np.array(array[start : start + chunk_size], dtype=dtype, ndmin=2)
+        return
+
+    with open(path) as file:
+        lines = (line for line in file if line.strip() and not line.startswith("#"))
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                return
+            yield np.loadtxt(chunk, dtype=dtype or float, ndmin=2)
+
+
+def _open(path: str, name: str, shape, dtype) -> np.memmap:
+    return np.lib.format.open_memmap(
+        os.path.join(path, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape
+    )
+
+
+def build_csr(
+    path: str,
+    edges: Union[str, Callable[[], Iterable[np.ndarray]]],
+    num_vertices: Optional[int] = None,
+    features: Union[str, Iterable[np.ndarray], None] = None,
+    rewards: Optional[np.ndarray] = None,
+    terminal: Optional[np.ndarray] = None,
+    chunk_size: int = 1 << 20,
+    bucket_size: int = 1 << 24,
+) -> CSRGraph:
+    """Builds a CSRGraph on disk from an edge list streamed in chunks.
+
+    The children of each vertex keep the order of its edges in the edge list.
+
+    Args:
+        path: Directory to write the graph to, as CSRGraph.save() would.
+        edges: Edge list file read with read_chunks(), or a function returning
+            a new iterable of (k, 2) integer arrays of (parent, child) edges
+            each time it is called. The edges are read twice.
+        num_vertices: Number of vertices. Defaults to one more than the largest
+            vertex index in the edges.
+        features: Optional per-vertex features, in vertex order, as a file read
+            with read_chunks() or an iterable of (k, num_features) arrays.
+        rewards: Optional per-vertex rewards. Defaults to zeros.
+        terminal: Optional per-vertex terminal flags. Defaults to the vertices
+            without children.
+        chunk_size: Number of rows per chunk when reading files.
+        bucket_size: Number of edges per bucket sorted in memory. Buckets of
+            several vertices hold at most about twice as many, and a vertex
+            with more children than bucket_size gets a bucket of its own, which
+            is copied without sorting.
+
+    Raises:
+        ValueError: If the edges reference vertices beyond num_vertices, or if
+            the features do not have one row per vertex.
+
+    Returns:
+        The graph, with its arrays memory-mapped from path.
+    """
+    if isinstance(edges, str):
+        edge_path = edges
+
+        def edges() -> Iterator[np.ndarray]:
+            return read_chunks(edge_path, chunk_size, np.int64)
+
+    os.makedirs(path, exist_ok=True)
+
+    # First pass: count the children of each vertex
+    degree = np.zeros(num_vertices or 0, dtype=np.int64)
+    for chunk in edges():
+        if len(chunk) == 0:
+            continue
+        size = int(chunk.max()) + 1
+        if size > len(degree):
+            degree = np.concatenate([degree, np.zeros(size - len(degree), np.int64)])
+        degree += np.bincount(chunk[:, 0], minlength=len(degree))
+
+    if num_vertices is None:
+        num_vertices = len(degree)
+    elif len(degree) > num_vertices:
+        raise ValueError(f"Edges reference vertices beyond {num_vertices}")
+
+    indptr = _open(path, "indptr", (num_vertices + 1,), np.int64)
+    indptr[0] = 0
+    np.cumsum(degree, out=indptr[1:])
+    logger.debug(f"counted {indptr[-1]} edges of {num_vertices} vertices")
+
+    # Buckets start where the row offsets enter a new multiple of bucket_size,
+    # and at the vertices with more than bucket_size children and after them
+    large = degree > bucket_size
+    window = np.asarray(indptr[:-1]) // bucket_size
+    new_bucket = np.diff(window, prepend=-1) != 0
+    new_bucket |= large
+    new_bucket[1:] |= large[:-1]
+    bucket_starts = np.append(np.flatnonzero(new_bucket), num_vertices)
+    logger.debug(f"sorting the edges in {len(bucket_starts) - 1} buckets")
+
+    indices = _open(path, "indices", (int(indptr[-1]),), np.int64)
+    with tempfile.TemporaryDirectory(dir=path) as bucket_dir:
+
+        def bucket_path(bucket: int) -> str:
+            return os.path.join(bucket_dir, f"{bucket}.bin")
+
+        # Second pass: append the edges to their buckets, in edge list order
+        for chunk in edges():
+            if len(chunk) == 0:
+                continue
+            chunk = np.asarray(chunk, dtype=np.int64)
+            buckets = np.searchsorted(bucket_starts, chunk[:, 0], side="right") - 1
+            order = np.argsort(buckets, kind="stable")
+            unique, starts = np.unique(buckets[order], return_index=True)
+            for bucket, group in zip(unique, np.split(order, starts[1:])):
+                with open(bucket_path(bucket), "ab") as file:
+                    file.write(chunk[group].tobytes())
+
+        # Sort each bucket by parent, keeping the edge list order of the
+        # children, into its rows of the indices
+        for bucket in range(len(bucket_starts) - 1):
+            first, last = bucket_starts[bucket], bucket_starts[bucket + 1]
+            start, stop = int(indptr[first]), int(indptr[last])
+            if start == stop:
+                continue
+            pairs = np.memmap(bucket_path(bucket), dtype=np.int64, mode="r")
+            pairs = pairs.reshape(-1, 2)
+            if last - first == 1:
+                for offset in range(0, stop - start, chunk_size):
+                    rows = pairs[offset : offset + chunk_size, 1]
+                    indices[start + offset : start + offset + len(rows)] = rows
+            else:
+                pairs = np.array(pairs)
+                order = np.argsort(pairs[:, 0], kind="stable")
+                indices[start:stop] = pairs[order, 1]
+            del pairs
+            os.remove(bucket_path(bucket))
+
+    indptr.flush()
+    indices.flush()
+    del indptr, indices
+
+    if rewards is None:
+        rewards = np.zeros(num_vertices)
+    if terminal is None:
+        terminal = degree == 0
+    np.save(os.path.join(path, "rewards.npy"), np.asarray(rewards, dtype=float))
+    np.save(os.path.join(path, "terminal.npy"), np.asarray(terminal, dtype=bool))
+
+    if features is not None:
+        if isinstance(features, str):
+            features = read_chunks(features, chunk_size)
+        _write_features(path, features, num_vertices)
+
+    return CSRGraph.load(path, mmap_mode="r")
+
+
+def _write_features(
+    path: str, chunks: Iterable[np.ndarray], num_vertices: int
+) -> None:
+    """Streams feature chunks into a memory-mapped features.npy file."""
+    output = None
+    start = 0
+    for chunk in chunks:
+        if output is None:
+            shape = (num_vertices, *chunk.shape[1:])
+            output = _open(path, "features", shape, chunk.dtype)
+        if start + len(chunk) > num_vertices:
+            raise ValueError(f"More than {num_vertices} rows of features")
+        output[start : start + len(chunk)] = chunk
+        start += len(chunk)
+
+    if start != num_vertices:
+        raise ValueError(f"{start} rows of features for {num_vertices} vertices")
+    if output is not None:
+        output.flush()
@@ -0,0 +1,329 @@
+import logging
+import os
+from concurrent.futures import Executor
+from typing import Callable, Hashable, List, Optional, Sequence, Tuple
+
+import networkx as nx
+import numpy as np
+
+from graphenv.vertex import V
+
+logger = logging.getLogger(__name__)
+
+CSR_ARRAYS = ("indptr", "indices", "rewards", "terminal")
+OPTIONAL_ARRAYS = ("features",)
+
+
+class CSRGraph:
+    """An explicit directed graph stored as compressed sparse row (CSR) arrays.
+
+    The children of vertex i are indices[indptr[i]:indptr[i + 1]], in the order
+    of the corresponding actions. Rewards and terminal flags are stored per
+    vertex: rewards[i] is the reward received on moving to vertex i.
+
+    Attributes:
+        indptr: (num_vertices + 1,) int array of row offsets into indices
+        indices: (num_edges,) int array of child vertex indices
+        rewards: (num_vertices,) float array of per-vertex rewards
+        terminal: (num_vertices,) bool array of terminal flags
+        vertices: optional list of the Vertex objects, indexed like the arrays
+        features: optional (num_vertices, num_features) array of per-vertex
+            features, observed by graphenv.array_graph_vertex.ArrayGraphVertex
+    """
+
+    def __init__(
+        self,
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        rewards: np.ndarray,
+        terminal: np.ndarray,
+        vertices: Optional[List[V]] = None,
+        features: Optional[np.ndarray] = None,
+    ) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.rewards = rewards
+        self.terminal = terminal
+        self.vertices = vertices
+        self.features = features
+
+    @classmethod
+    def from_networkx(
+        cls,
+        G: nx.Graph,
+        feature_key: str = "features",
+        reward_key: str = "reward",
+        terminal_key: str = "terminal",
+    ) -> "CSRGraph":
+        """Builds a graph from a networkx graph, whose vertices are the nodes of
+        G in the order of G.nodes, and whose children are the successors of
+        each node, or its neighbors if G is undirected.
+
+        Args:
+            G: Graph to convert.
+            feature_key: Node attribute holding each node's feature vector. The
+                graph has no features if the attribute is missing.
+            reward_key: Node attribute holding each node's reward, defaulting
+                to 0 for nodes without it.
+            terminal_key: Node attribute flagging terminal nodes, defaulting to
+                nodes without successors.
+
+        Returns:
+            The converted graph.
+        """
+        index = {node: i for i, node in enumerate(G.nodes)}
+        rows = [[index[child] for child in G.neighbors(node)] for node in G.nodes]
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=indptr[1:])
+        indices = np.fromiter(
+            (j for row in rows for j in row), dtype=np.int64, count=indptr[-1]
+        )
+
+        data = [G.nodes[node] for node in G.nodes]
+        features = None
+        if data and all(feature_key in d for d in data):
+            features = np.stack([np.asarray(d[feature_key]) for d in data])
+        return cls(
+            indptr,
+            indices,
+            np.array([d.get(reward_key, 0.0) for d in data], dtype=float),
+            np.array(
+                [d.get(terminal_key, len(row) == 0) for d, row in zip(data, rows)],
+                dtype=bool,
+            ),
+            features=features,
+        )
+
+    @classmethod
+    def from_scipy(
+        cls,
+        adjacency,
+        features: Optional[np.ndarray] = None,
+        rewards: Optional[np.ndarray] = None,
+        terminal: Optional[np.ndarray] = None,
+    ) -> "CSRGraph":
+        """Builds a graph from a SciPy sparse adjacency matrix, where a nonzero
+        entry (i, j) makes vertex j a child of vertex i. Children keep the
+        column order of each row.
+
+        Args:
+            adjacency: Square SciPy sparse matrix or array.
+            features: Optional per-vertex feature matrix.
+            rewards: Optional per-vertex rewards. Defaults to zeros.
+            terminal: Optional per-vertex terminal flags. Defaults to the
+                vertices without children.
+
+        Returns:
+            The converted graph.
+        """
+        import scipy.sparse
+
+        adjacency = scipy.sparse.csr_matrix(adjacency)
+        adjacency.eliminate_zeros()
+        indptr = adjacency.indptr.astype(np.int64)
+        num_vertices = len(indptr) - 1
+        if rewards is None:
+            rewards = np.zeros(num_vertices)
+        if terminal is None:
+            terminal = np.diff(indptr) == 0
+        return cls(
+            indptr,
+            adjacency.indices.astype(np.int64),
+            np.asarray(rewards, dtype=float),
+            np.asarray(terminal, dtype=bool),
+            features=features,
+        )
+
+    @property
+    def num_vertices(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.indices)
+
+    @property
+    def degree(self) -> np.ndarray:
+        """
+        Returns:
+            (num_vertices,) array with the number of children of each vertex.
+        """
+        return np.diff(self.indptr)
+
+    def children(self, vertex: int) -> np.ndarray:
+        """Gets the children of a vertex.
+
+        Args:
+            vertex: index of the vertex
+
+        Returns:
+            Array of child vertex indices.
+        """
+        return self.indices[self.indptr[vertex] : self.indptr[vertex + 1]]
+
+    def share(self) -> "CSRGraph":
+        """Copies the graph arrays into shared memory, so that pickling the
+        graph, or the ArrayGraphVertex instances referencing it, only
+        references the arrays. The vertex objects, if any, are not copied. See
+        graphenv.shared_arrays.
+
+        Returns:
+            The graph with shared arrays.
+        """
+        from graphenv.shared_arrays import share_array
+
+        arrays = {
+            name: share_array(getattr(self, name))
+            for name in CSR_ARRAYS + OPTIONAL_ARRAYS
+            if getattr(self, name) is not None
+        }
+        return self.__class__(**arrays)
+
+    def save(self, path: str) -> None:
+        """Saves the graph arrays as .npy files in a directory, including the
+        features if there are any. The vertex objects, if any, are not saved.
+
+        Args:
+            path: Directory to save to. Created if it does not exist.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in CSR_ARRAYS + OPTIONAL_ARRAYS:
+            array = getattr(self, name)
+            if array is not None:
+                np.save(os.path.join(path, f"{name}.npy"), array)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> "CSRGraph":
+        """Loads a graph saved with save().
+
+        Args:
+            path: Directory the graph was saved to.
+            mmap_mode: Passed to np.load, e.g. "r" to memory-map the arrays
+                rather than reading them into memory. Defaults to None.
+
+        Returns:
+            The loaded graph.
+        """
+        optional = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in OPTIONAL_ARRAYS
+            if os.path.exists(os.path.join(path, f"{name}.npy"))
+        }
+        return cls(
+            *(
+                np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+                for name in CSR_ARRAYS
+            ),
+            **optional,
+        )
+
+
+def _expand(
+    vertices: Sequence[V], key: Callable[[V], Hashable]
+) -> List[Tuple[List[Hashable], List[V], List[float], List[bool]]]:
+    """Expands a chunk of vertices, returning the keys, vertices, rewards and
+    terminal flags of each vertex's children."""
+    results = []
+    for vertex in vertices:
+        children = vertex.children
+        results.append(
+            (
+                [key(child) for child in children],
+                children,
+                [child.reward for child in children],
+                [child.terminal for child in children],
+            )
+        )
+    return results
+
+
+def enumerate_graph(
+    root: V,
+    key: Callable[[V], Hashable],
+    executor: Optional[Executor] = None,
+    chunk_size: int = 64,
+    max_vertices: Optional[int] = None,
+) -> CSRGraph:
+    """Enumerates every vertex reachable from root, walking Vertex.children
+    breadth-first, and stores the result as a CSRGraph.
+
+    Vertices are deduplicated by key, so graphs with cycles or converging paths
+    are enumerated once per distinct vertex. Rewards are treated as a property
+    of the vertex and read once, when a vertex is first reached. Terminal
+    vertices are not expanded.
+
+    Args:
+        root: Vertex to start from. It is vertex 0 of the returned graph.
+        key: Function mapping a vertex to a hashable identity, e.g.
+            ``lambda v: v.cur_pos`` for HallwayState.
+        executor: Optional executor used to expand each breadth-first level in
+            parallel, in chunks. With a ProcessPoolExecutor, vertices and key
+            must be picklable. Defaults to expanding in this thread.
+        chunk_size: Number of vertices expanded per executor task.
+        max_vertices: Optional limit on the number of vertices. Raises a
+            RuntimeError if the reachable graph is larger.
+
+    Raises:
+        RuntimeError: If more than max_vertices vertices are reachable.
+
+    Returns:
+        CSRGraph with the reachable vertices, including the vertex objects.
+    """
+    index = {key(root): 0}
+    vertices = [root]
+    rewards = [root.reward]
+    terminal = [root.terminal]
+    rows: List[List[int]] = [[]]
+
+    frontier = [0]
+    while frontier:
+        frontier = [i for i in frontier if not terminal[i]]
+        chunks = [
+            [vertices[i] for i in frontier[start : start + chunk_size]]
+            for start in range(0, len(frontier), chunk_size)
+        ]
+        if executor is None:
+            results = (_expand(chunk, key) for chunk in chunks)
+        else:
+            results = executor.map(_expand, chunks, [key] * len(chunks))
+
+        expanded = (result for chunk in results for result in chunk)
+        next_frontier = []
+        for i, (child_keys, children, child_rewards, child_terminal) in zip(
+            frontier, expanded
+        ):
+            row = rows[i]
+            for child_key, child, reward, is_terminal in zip(
+                child_keys, children, child_rewards, child_terminal
+            ):
+                j = index.get(child_key)
+                if j is None:
+                    j = len(vertices)
+                    index[child_key] = j
+                    vertices.append(child)
+                    rewards.append(reward)
+                    terminal.append(is_terminal)
+                    rows.append([])
+                    next_frontier.append(j)
+                row.append(j)
+
+            if max_vertices is not None and len(vertices) > max_vertices:
+                raise RuntimeError(
+                    f"More than {max_vertices} vertices reachable from {root}"
+                )
+
+        logger.debug(f"enumerated {len(vertices)} vertices")
+        frontier = next_frontier
+
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = np.fromiter(
+        (j for row in rows for j in row), dtype=np.int64, count=indptr[-1]
+    )
+    return CSRGraph(
+        indptr,
+        indices,
+        np.array(rewards, dtype=float),
+        np.array(terminal, dtype=bool),
+        vertices=vertices,
+    )
@@ -3,11 +3,8 @@ from typing import Dict, Sequence
 
 import gym
 import numpy as np
-from graphenv import tf
 from graphenv.vertex import Vertex
 
-layers = tf.keras.layers
-
 
 class HallwayState(Vertex):
     """Example Vertex implementation of a simple hallway process graph.
@@ -16,6 +13,8 @@ class HallwayState(Vertex):
     opposite end. The length is configurable.
     """
 
+    __slots__ = ("end_pos", "cur_pos")
+
     def __init__(
         self,
         corridor_length: int,
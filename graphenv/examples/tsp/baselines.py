@@ -0,0 +1,232 @@
+"""Fast construction heuristics for Euclidean TSP instances.
+
+These operate directly on an (N, 2) array of node positions, as stored in the
+"pos" node attribute of graphs built by
+:func:`graphenv.examples.tsp.graph_utils.make_complete_planar_graph`, so they
+avoid both the networkx adjacency structure and a dense N x N distance matrix.
+All tours are returned as closed cycles, i.e. the start node is repeated at the
+end, matching the tours produced by ``TSPState`` and ``random_tsp``.
+"""
+from typing import Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+def tour_cost(pos: np.ndarray, tour: np.ndarray) -> float:
+    """Returns the total Euclidean length of a tour.
+
+    Args:
+        pos: (N, 2) array of node positions.
+        tour: Sequence of node indices in visitation order. Closed cycles should
+            repeat the first node at the end.
+
+    Returns:
+        Sum of the distances between consecutive nodes in the tour.
+    """
+    path = pos[np.asarray(tour)]
+    return float(np.sqrt(((path[1:] - path[:-1]) ** 2).sum(axis=-1)).sum())
+
+
+def _close_tour(tour: np.ndarray, source: int) -> np.ndarray:
+    """Rotates a Hamiltonian path so it begins at source and closes the cycle."""
+    start = int(np.flatnonzero(tour == source)[0])
+    tour = np.roll(tour, -start)
+    return np.append(tour, tour[0])
+
+
+def nearest_neighbor_tour(
+    pos: np.ndarray, source: int = 0, num_neighbors: int = 10
+) -> Tuple[np.ndarray, float]:
+    """Builds a tour by repeatedly moving to the closest unvisited node.
+
+    Each node's ``num_neighbors`` nearest neighbors are found up front with a
+    single KD-tree query. A step only falls back to a vectorized scan over the
+    remaining nodes when all of those candidates have already been visited.
+
+    Args:
+        pos: (N, 2) array of node positions.
+        source: Node at which the tour starts and ends. Defaults to 0.
+        num_neighbors: Number of precomputed nearest-neighbor candidates per
+            node. Defaults to 10.
+
+    Returns:
+        (closed tour as an int array of length N + 1, tour cost)
+    """
+    num_nodes = len(pos)
+    k = min(num_neighbors, num_nodes - 1) + 1
+    candidates = cKDTree(pos).query(pos, k)[1][:, 1:].tolist() if k > 1 else []
+
+    # Unvisited nodes are kept in a compact array, shrunk with a swap-remove.
+    remaining = np.arange(num_nodes)
+    slot = list(range(num_nodes))
+    visited = [False] * num_nodes
+    size = num_nodes
+
+    tour = np.empty(num_nodes + 1, dtype=np.int64)
+    cur = source
+    for i in range(num_nodes):
+        tour[i] = cur
+        visited[cur] = True
+        size -= 1
+        last = int(remaining[size])
+        remaining[slot[cur]] = last
+        slot[last] = slot[cur]
+        if size == 0:
+            break
+
+        for nbr in candidates[cur]:
+            if not visited[nbr]:
+                cur = nbr
+                break
+        else:
+            delta = pos[remaining[:size]] - pos[cur]
+            cur = int(remaining[np.argmin(np.einsum("ij,ij->i", delta, delta))])
+
+    tour[num_nodes] = source
+    return tour, tour_cost(pos, tour)
+
+
+def greedy_edge_tour(
+    pos: np.ndarray, source: int = 0, num_neighbors: int = 10
+) -> Tuple[np.ndarray, float]:
+    """Builds a tour with the greedy edge (greedy matching) heuristic.
+
+    Candidate edges are restricted to each node's ``num_neighbors`` nearest
+    neighbors and added shortest-first whenever they keep every node at degree
+    at most two and do not close a premature cycle. The resulting path
+    fragments are then chained together by nearest free endpoint.
+
+    Args:
+        pos: (N, 2) array of node positions.
+        source: Node at which the tour starts and ends. Defaults to 0.
+        num_neighbors: Number of nearest neighbors used as candidate edges for
+            each node. Defaults to 10.
+
+    Returns:
+        (closed tour as an int array of length N + 1, tour cost)
+    """
+    num_nodes = len(pos)
+    if num_nodes < 3:
+        return nearest_neighbor_tour(pos, source)
+
+    k = min(num_neighbors, num_nodes - 1) + 1
+    dist, nbrs = cKDTree(pos).query(pos, k)
+    src = np.repeat(np.arange(num_nodes), k - 1)
+    dst = nbrs[:, 1:].ravel()
+    lo, hi = np.minimum(src, dst), np.maximum(src, dst)
+    _, unique = np.unique(lo * num_nodes + hi, return_index=True)
+    order = unique[np.argsort(dist[:, 1:].ravel()[unique], kind="stable")]
+
+    # Greedily accept candidate edges, tracking fragments with union-find.
+    links = np.full((num_nodes, 2), -1, dtype=np.int64)
+    degree = [0] * num_nodes
+    parent = list(range(num_nodes))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    num_edges = 0
+    for a, b in zip(lo[order].tolist(), hi[order].tolist()):
+        if degree[a] == 2 or degree[b] == 2:
+            continue
+        ra, rb = find(a), find(b)
+        if ra == rb:
+            continue
+        parent[ra] = rb
+        links[a, degree[a]] = b
+        links[b, degree[b]] = a
+        degree[a] += 1
+        degree[b] += 1
+        num_edges += 1
+        if num_edges == num_nodes - 1:
+            break
+
+    # Chain the fragments together, always jumping to the nearest free endpoint.
+    endpoints = np.flatnonzero(np.array(degree) < 2)
+    available = np.ones(num_nodes, dtype=bool)
+    tour = np.empty(num_nodes, dtype=np.int64)
+    size = 0
+    cur = int(endpoints[0])
+    while True:
+        prev = -1
+        while True:
+            tour[size] = cur
+            size += 1
+            available[cur] = False
+            nxt = links[cur, 0] if links[cur, 0] != prev else links[cur, 1]
+            if nxt == -1:
+                break
+            prev, cur = cur, int(nxt)
+
+        endpoints = endpoints[available[endpoints]]
+        if len(endpoints) == 0:
+            break
+        delta = pos[endpoints] - pos[cur]
+        cur = int(endpoints[np.argmin(np.einsum("ij,ij->i", delta, delta))])
+
+    tour = _close_tour(tour, source)
+    return tour, tour_cost(pos, tour)
+
+
+def _hilbert_index(x: np.ndarray, y: np.ndarray, order: int) -> np.ndarray:
+    """Vectorized distance along a Hilbert curve of the given order for integer
+    grid coordinates in [0, 2 ** order)."""
+    x, y = x.copy(), y.copy()
+    side = 1 << order
+    d = np.zeros(len(x), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx.astype(np.int64)) ^ ry.astype(np.int64))
+
+        flip = ~ry & rx
+        x[flip] = side - 1 - x[flip]
+        y[flip] = side - 1 - y[flip]
+        swap = ~ry
+        x[swap], y[swap] = y[swap], x[swap]
+        s >>= 1
+
+    return d
+
+
+def hilbert_order(pos: np.ndarray, order: int = 16) -> np.ndarray:
+    """Sorts positions along a Hilbert curve through their bounding box, so
+    that consecutive positions are spatially close.
+
+    Args:
+        pos: (N, 2) array of positions.
+        order: Resolution of the Hilbert curve, which uses a 2 ** order square
+            grid. Defaults to 16.
+
+    Returns:
+        (N,) int array of position indices in curve order.
+    """
+    low = pos.min(axis=0)
+    scale = (pos.max(axis=0) - low).max()
+    scale = scale if scale > 0 else 1.0
+    grid = ((pos - low) / scale * ((1 << order) - 1)).astype(np.int64)
+    return np.argsort(_hilbert_index(grid[:, 0], grid[:, 1], order), kind="stable")
+
+
+def space_filling_curve_tour(
+    pos: np.ndarray, source: int = 0, order: int = 16
+) -> Tuple[np.ndarray, float]:
+    """Builds a tour by visiting nodes in the order of a Hilbert curve through
+    the bounding box of the positions.
+
+    Args:
+        pos: (N, 2) array of node positions.
+        source: Node at which the tour starts and ends. Defaults to 0.
+        order: Resolution of the Hilbert curve, which uses a 2 ** order square
+            grid. Defaults to 16.
+
+    Returns:
+        (closed tour as an int array of length N + 1, tour cost)
+    """
+    tour = _close_tour(hilbert_order(pos, order), source)
+    return tour, tour_cost(pos, tour)
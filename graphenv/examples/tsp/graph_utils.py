@@ -20,11 +20,23 @@ def make_complete_planar_graph(N, seed: int = None) -> nx.Graph:
     """
 
     np.random.seed(seed)
+    return complete_planar_graph(np.random.rand(N, 2))
+
+
+def complete_planar_graph(pos: np.ndarray) -> nx.Graph:
+    """Returns a fully connected graph on the given xy node positions, with
+    edge weights equal to pairwise distances.
+
+    Args:
+        pos: (N, 2) array of node positions.
+
+    Returns:
+        Networkx complete graph with Euclidean distance weights.
+    """
+    N = len(pos)
 
     # Complete graph on points in xy-plane with pairwise distances as edge weights
     G = nx.complete_graph(N)
-
-    pos = np.random.rand(N, 2)
     d = distance_matrix(pos, pos)
 
     for ei, ej in G.edges:
@@ -36,6 +48,19 @@ def make_complete_planar_graph(N, seed: int = None) -> nx.Graph:
     return G
 
 
+def get_positions(G: nx.Graph) -> np.ndarray:
+    """Returns the xy positions of the nodes in a planar graph.
+
+    Args:
+        G: networkx graph with a "pos" attribute on every node, such as one
+            returned by make_complete_planar_graph.
+
+    Returns:
+        (N, 2) array of node positions, in node order.
+    """
+    return np.array([G.nodes[n]["pos"] for n in G.nodes], dtype=float)
+
+
 def plot_network(G, path: list = None) -> Tuple[any, any]:
     """Plots the network and a path if specified.
 
@@ -100,12 +125,6 @@ def random_tsp(G, weight="weight", source=None, seed=None):
         neighbor = next(G.neighbors(source))
         return [source, neighbor, source]
 
-    nodeset = set(G)
-    nodeset.remove(source)
-    cycle = [source]
-    while nodeset:
-        next_node = random.choice(list(nodeset))
-        cycle.append(next_node)
-        nodeset.remove(next_node)
-    cycle.append(cycle[0])
-    return cycle
+    nodes = [n for n in G if n != source]
+    random.shuffle(nodes)
+    return [source, *nodes, source]
@@ -0,0 +1,183 @@
+"""Exact TSP solutions for small instances with Held-Karp dynamic programming.
+
+The dynamic program is vectorized over bitmask subsets: all subsets with the
+same number of visited nodes are updated together with NumPy, so solving an
+instance takes O(2^N * N^2) work in O(N) Python-level passes per layer. The
+full table of optimal costs-to-go is kept, which lets :class:`HeldKarp` score
+any partial tour, and therefore any TSPState, exactly.
+"""
+from typing import List, Sequence, Tuple
+
+import numpy as np
+from graphenv.examples.tsp.tsp_state import TSPState
+
+MAX_NUM_NODES = 24
+
+
+def _popcount(masks: np.ndarray, num_bits: int) -> np.ndarray:
+    counts = np.zeros(len(masks), dtype=np.int64)
+    for bit in range(num_bits):
+        counts += (masks >> bit) & 1
+    return counts
+
+
+class HeldKarp:
+    """Held-Karp solver holding the optimal cost-to-go of every TSP state.
+
+    Nodes other than the start are numbered 0..N-2, and a state is a bitmask of
+    the visited non-start nodes plus the current node. cost_to_go[mask, k] is the
+    length of the shortest path that starts at non-start node k, having visited
+    the nodes in mask (which includes k), visits every remaining node and returns
+    to the start.
+
+    Attributes:
+        distances: (N, N) matrix of pairwise distances
+        start: node at which tours start and end
+        cost_to_go: (2 ** (N - 1), N - 1) table of optimal costs-to-go
+        cost: length of the optimal tour
+    """
+
+    def __init__(self, distances: np.ndarray, start: int = 0) -> None:
+        """Solves the instance given by a distance matrix.
+
+        Args:
+            distances: (N, N) matrix of pairwise distances, such as
+                TSPState.distance_matrix.
+            start: Node at which tours start and end. Defaults to 0.
+
+        Raises:
+            ValueError: If the instance has more than MAX_NUM_NODES nodes.
+        """
+        distances = np.asarray(distances, dtype=float)
+        num_nodes = len(distances)
+        if num_nodes > MAX_NUM_NODES:
+            raise ValueError(
+                f"Held-Karp needs O(2^N * N) memory, N={num_nodes} exceeds "
+                f"{MAX_NUM_NODES} nodes"
+            )
+
+        self.distances = distances
+        self.start = start
+        self._others = np.array(
+            [n for n in range(num_nodes) if n != start], dtype=np.int64
+        )
+        self._index = np.full(num_nodes, -1, dtype=np.int64)
+        self._index[self._others] = np.arange(len(self._others))
+
+        num_others = len(self._others)
+        between = distances[np.ix_(self._others, self._others)]
+        to_start = distances[self._others, start]
+
+        masks = np.arange(1 << num_others, dtype=np.int64)
+        counts = _popcount(masks, num_others)
+        cost_to_go = np.full((len(masks), num_others), np.inf)
+        cost_to_go[-1] = to_start
+
+        # Sweep from the full set down, extending each set by one more node k
+        for count in range(num_others - 1, 0, -1):
+            layer = masks[counts == count]
+            best = cost_to_go[layer]
+            for k in range(num_others):
+                missing = (layer >> k) & 1 == 0
+                extended = layer[missing] | (1 << k)
+                candidate = between[:, k] + cost_to_go[extended, k][:, np.newaxis]
+                best[missing] = np.minimum(best[missing], candidate)
+            cost_to_go[layer] = best
+
+        self.cost_to_go = cost_to_go
+        self.cost = self._best_step(0, start)[1]
+
+    @classmethod
+    def from_state(cls, state: TSPState) -> "HeldKarp":
+        """Solves the instance of a TSPState, starting at its tour's first node.
+
+        Args:
+            state: Any state of the instance.
+
+        Returns:
+            Solver for the state's instance.
+        """
+        return cls(state.distance_matrix, start=state.tour[0])
+
+    def _mask(self, tour: Sequence[int]) -> int:
+        mask = 0
+        for node in tour[1:]:
+            if node != self.start:
+                mask |= 1 << int(self._index[node])
+        return mask
+
+    def remaining_cost(self, tour: Sequence[int]) -> float:
+        """Returns the optimal cost to complete a partial tour.
+
+        Args:
+            tour: Partial tour in visitation order, beginning at the start node.
+
+        Raises:
+            ValueError: If the tour does not begin at the start node.
+
+        Returns:
+            Length of the shortest completion that visits every remaining node
+            and returns to the start, or 0 for a completed tour.
+        """
+        if tour[0] != self.start:
+            raise ValueError(f"Tour {tour} does not begin at node {self.start}")
+        if len(tour) == 1:
+            return self.cost
+        if tour[-1] == self.start:
+            return 0.0
+        return float(self.cost_to_go[self._mask(tour), self._index[tour[-1]]])
+
+    def value(self, state: TSPState) -> float:
+        """Returns the exact optimal value of a TSPState: the sum of the rewards
+        collected from this state onward under an optimal policy.
+
+        Args:
+            state: A state of the solved instance.
+
+        Returns:
+            Negative optimal remaining tour length.
+        """
+        return -self.remaining_cost(state.tour)
+
+    def _best_step(self, mask: int, node: int) -> Tuple[int, float]:
+        """Returns the best non-start node to visit next from node, having
+        visited mask, and the resulting cost-to-go (-1 and the distance back to
+        the start once every node is visited)."""
+        missing = np.flatnonzero((mask >> np.arange(len(self._others))) & 1 == 0)
+        if len(missing) == 0:
+            return -1, float(self.distances[node, self.start])
+        total = (
+            self.distances[node, self._others[missing]]
+            + self.cost_to_go[mask | (1 << missing), missing]
+        )
+        best = int(np.argmin(total))
+        return int(missing[best]), float(total[best])
+
+    @property
+    def tour(self) -> List[int]:
+        """
+        Returns:
+            An optimal closed tour, beginning and ending at the start node.
+        """
+        tour = [self.start]
+        mask = 0
+        for _ in range(len(self._others)):
+            k = self._best_step(mask, tour[-1])[0]
+            mask |= 1 << k
+            tour.append(int(self._others[k]))
+        tour.append(self.start)
+        return tour
+
+
+def held_karp(distances: np.ndarray, start: int = 0) -> Tuple[List[int], float]:
+    """Returns an optimal tour and its cost.
+
+    Args:
+        distances: (N, N) matrix of pairwise distances.
+        start: Node at which the tour starts and ends. Defaults to 0.
+
+    Returns:
+        (closed optimal tour as a list of nodes, tour cost)
+    """
+    solver = HeldKarp(distances, start)
+    return solver.tour, solver.cost
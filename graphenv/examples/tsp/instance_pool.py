@@ -0,0 +1,236 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from graphenv.examples.tsp.graph_utils import complete_planar_graph
+
+POSITIONS_FILE = "positions.npy"
+EDGE_WEIGHTS_FILE = "edge_weights.npy"
+CONNECTIVITY_FILE = "connectivity.npy"
+
+
+def _instance_positions(entropy: int, index: int, num_nodes: int) -> np.ndarray:
+    """Draws the node positions of one instance. Each instance has its own seed
+    sequence, so the pool contents do not depend on how work is split."""
+    seed_sequence = np.random.SeedSequence(entropy, spawn_key=(index,))
+    return np.random.default_rng(seed_sequence).random((num_nodes, 2))
+
+
+def _preprocess(positions: np.ndarray, max_num_neighbors: Optional[int]) -> Dict:
+    from graphenv.examples.tsp.tsp_preprocessor import TSPPreprocessor
+
+    G = complete_planar_graph(positions)
+    return TSPPreprocessor(max_num_neighbors=max_num_neighbors)(G)
+
+
+def _generate_chunk(
+    path: str,
+    start: int,
+    stop: int,
+    entropy: int,
+    preprocess: bool,
+    max_num_neighbors: Optional[int],
+) -> None:
+    """Generates instances [start, stop) of a pool, writing them in place into
+    the pool's memory-mapped arrays."""
+    positions = np.load(os.path.join(path, POSITIONS_FILE), mmap_mode="r+")
+    if preprocess:
+        edge_weights = np.load(os.path.join(path, EDGE_WEIGHTS_FILE), mmap_mode="r+")
+        connectivity = np.load(os.path.join(path, CONNECTIVITY_FILE), mmap_mode="r+")
+
+    for index in range(start, stop):
+        positions[index] = _instance_positions(entropy, index, positions.shape[1])
+        if preprocess:
+            graph_inputs = _preprocess(positions[index], max_num_neighbors)
+            edge_weights[index] = graph_inputs["edge_weights"]
+            connectivity[index] = graph_inputs["connectivity"]
+
+    positions.flush()
+    if preprocess:
+        edge_weights.flush()
+        connectivity.flush()
+
+
+class TSPInstancePool:
+    """A pool of pre-generated TSP instances stored in memory-mapped arrays.
+
+    Node positions, and optionally the preprocessed graph_inputs used by
+    TSPNFPState, are stored as .npy files in a directory and opened read-only
+    with memory-mapping. Drawing an instance is an index into those arrays, so
+    TSPState.root can switch instances on every reset at no construction cost.
+
+    Pickling a pool only records its path, seed and spawn key, so each process
+    it is sent to (e.g. each rllib rollout worker) re-opens the same files and
+    shares the data through the OS page cache rather than holding its own copy.
+    Unpickling a seeded pool reproduces its stream of instances, so processes
+    that should draw different instances each open a stream of their own with
+    spawn(), e.g. keyed by rllib's EnvContext.worker_index and vector_index.
+
+    Attributes:
+        path: directory holding the pool's arrays
+        seed: seed of the generator used to draw instances, unrelated to the
+            seed the instances were generated from
+        spawn_key: key of the generator's stream among those of the same seed
+        positions: (M, N, 2) memory-mapped array of node positions
+    """
+
+    def __init__(
+        self, path: str, seed: Optional[int] = None, spawn_key: Tuple[int, ...] = ()
+    ) -> None:
+        """Opens an existing pool.
+
+        Args:
+            path: Directory the pool was generated into.
+            seed: Seed for the random generator used by sample(). Defaults to
+                None, which draws a fresh seed in every process.
+            spawn_key: Key of the generator's stream among those of the same
+                seed. Defaults to (), the stream of the seed itself.
+        """
+        self.path = path
+        self.seed = seed
+        self.spawn_key = tuple(spawn_key)
+        self.rng = np.random.default_rng(
+            np.random.SeedSequence(seed, spawn_key=spawn_key)
+        )
+        self.positions = np.load(os.path.join(path, POSITIONS_FILE), mmap_mode="r")
+
+        self._edge_weights = None
+        self._connectivity = None
+        if os.path.exists(os.path.join(path, EDGE_WEIGHTS_FILE)):
+            self._edge_weights = np.load(
+                os.path.join(path, EDGE_WEIGHTS_FILE), mmap_mode="r"
+            )
+            self._connectivity = np.load(
+                os.path.join(path, CONNECTIVITY_FILE), mmap_mode="r"
+            )
+
+    @classmethod
+    def generate(
+        cls,
+        path: str,
+        num_instances: int,
+        num_nodes: int,
+        seed: Optional[int] = None,
+        preprocess: bool = False,
+        max_num_neighbors: Optional[int] = None,
+        num_workers: Optional[int] = None,
+    ) -> "TSPInstancePool":
+        """Generates a new pool of random planar instances in parallel.
+
+        Args:
+            path: Directory to write the pool to. Created if it does not exist.
+            num_instances: Number of instances in the pool.
+            num_nodes: Number of nodes in each instance.
+            seed: Seed used to generate the instances. Defaults to None. It
+                does not seed sample(), which draws a fresh seed in every
+                process unless the pool is opened with a seed of its own.
+            preprocess: Whether to also store the TSPPreprocessor graph_inputs
+                needed by TSPNFPState. Defaults to False.
+            max_num_neighbors: max_num_neighbors passed to the TSPPreprocessor.
+            num_workers: Number of worker processes. Defaults to os.cpu_count().
+
+        Returns:
+            The newly generated pool.
+        """
+        os.makedirs(path, exist_ok=True)
+        entropy = np.random.SeedSequence(seed).entropy
+
+        np.lib.format.open_memmap(
+            os.path.join(path, POSITIONS_FILE),
+            mode="w+",
+            dtype=np.float64,
+            shape=(num_instances, num_nodes, 2),
+        )
+        if preprocess:
+            # Preprocess the first instance to find the size of the edge arrays
+            example = _preprocess(
+                _instance_positions(entropy, 0, num_nodes), max_num_neighbors
+            )
+            for filename, key in [
+                (EDGE_WEIGHTS_FILE, "edge_weights"),
+                (CONNECTIVITY_FILE, "connectivity"),
+            ]:
+                np.lib.format.open_memmap(
+                    os.path.join(path, filename),
+                    mode="w+",
+                    dtype=example[key].dtype,
+                    shape=(num_instances, *example[key].shape),
+                )
+
+        num_workers = num_workers or os.cpu_count() or 1
+        chunk_size = max(1, -(-num_instances // num_workers))
+        with ProcessPoolExecutor(num_workers) as executor:
+            futures = [
+                executor.submit(
+                    _generate_chunk,
+                    path,
+                    start,
+                    min(start + chunk_size, num_instances),
+                    entropy,
+                    preprocess,
+                    max_num_neighbors,
+                )
+                for start in range(0, num_instances, chunk_size)
+            ]
+            for future in futures:
+                future.result()
+
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def num_nodes(self) -> int:
+        """
+        Returns:
+            Number of nodes in each instance.
+        """
+        return self.positions.shape[1]
+
+    def sample(self) -> int:
+        """
+        Returns:
+            Index of a uniformly drawn instance.
+        """
+        return int(self.rng.integers(len(self)))
+
+    def spawn(self, *key: int) -> "TSPInstancePool":
+        """Opens the pool again with a stream of instances of its own, derived
+        deterministically from this pool's seed and spawn key.
+
+        Args:
+            key: Integers identifying the new stream, such as the index of the
+                rollout worker and of the env within it.
+
+        Returns:
+            The pool, drawing instances from the new stream.
+        """
+        return self.__class__(self.path, self.seed, self.spawn_key + key)
+
+    def graph_inputs(self, index: int) -> Dict[str, np.ndarray]:
+        """Gets the preprocessed graph inputs of an instance.
+
+        Args:
+            index: Index of the instance.
+
+        Raises:
+            ValueError: If the pool was generated without preprocessing.
+
+        Returns:
+            Dictionary of "edge_weights" and "connectivity" arrays, as returned
+            by TSPPreprocessor.
+        """
+        if self._edge_weights is None:
+            raise ValueError(f"Instance pool {self.path} was not preprocessed.")
+        return {
+            "edge_weights": self._edge_weights[index],
+            "connectivity": self._connectivity[index],
+        }
+
+    def __getstate__(self) -> Dict:
+        return {"path": self.path, "seed": self.seed, "spawn_key": self.spawn_key}
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(**state)
@@ -0,0 +1,288 @@
+"""Vectorized 2-opt and Or-opt local search for Euclidean TSP tours.
+
+Moves are evaluated for every tour in a batch at once. Candidate moves are
+restricted to each node's nearest neighbors, so an improvement pass over T tours
+of N nodes costs O(T * N * num_neighbors) vectorized distance evaluations. Every
+pass applies, per tour, a set of improving moves that touch disjoint stretches
+of the tour, so they can be applied together without re-evaluation.
+
+Tours follow the convention of :mod:`graphenv.examples.tsp.baselines`: closed
+cycles with the start node repeated at the end. The start node is never moved.
+"""
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from graphenv.examples.tsp.baselines import tour_cost
+
+
+def neighbor_lists(pos: np.ndarray, num_neighbors: int = 10) -> np.ndarray:
+    """Returns the nearest neighbors of every node, closest first.
+
+    Args:
+        pos: (N, 2) array of node positions.
+        num_neighbors: Number of neighbors per node. Defaults to 10.
+
+    Returns:
+        (N, min(num_neighbors, N - 1)) int array of neighbor indices.
+    """
+    k = min(num_neighbors, len(pos) - 1)
+    return cKDTree(pos).query(pos, k + 1)[1][:, 1:].reshape(len(pos), k)
+
+
+class _Batch:
+    """Gathers positions and neighbor lists for a batch of tours that either
+    share one instance, or each have their own instance."""
+
+    def __init__(self, pos: np.ndarray, num_tours: int, num_neighbors: int):
+        if pos.ndim == 2:
+            pos = pos[np.newaxis]
+            self.rows = np.zeros(num_tours, dtype=np.int64)
+        else:
+            self.rows = np.arange(num_tours)
+
+        self.num_nodes = pos.shape[1]
+        self.x, self.y = pos[..., 0].ravel(), pos[..., 1].ravel()
+        self.nbrs = np.stack([neighbor_lists(p, num_neighbors) for p in pos])
+        self.nbr_dist = np.stack(
+            [
+                np.hypot(*(p[nbrs] - p[:, np.newaxis]).transpose(2, 0, 1))
+                for p, nbrs in zip(pos, self.nbrs)
+            ]
+        )
+
+    def offsets(self, active: np.ndarray, ndim: int) -> np.ndarray:
+        """Returns the flat index offset of each active tour's instance, shaped
+        to broadcast against ndim-dimensional node index arrays."""
+        offsets = self.rows[active] * self.num_nodes
+        return offsets.reshape((-1,) + (1,) * (ndim - 1))
+
+    def dist(self, active: np.ndarray, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+        offsets = self.offsets(active, max(u.ndim, v.ndim))
+        u, v = u + offsets, v + offsets
+        return np.hypot(self.x[u] - self.x[v], self.y[u] - self.y[v])
+
+    def neighbors(self, active: np.ndarray, u: np.ndarray) -> Tuple[np.ndarray, ...]:
+        """Returns the neighbor lists of the nodes in u, and the distances to
+        them, each with a trailing neighbor axis."""
+        rows = self.rows[active].reshape((-1,) + (1,) * (u.ndim - 1))
+        return self.nbrs[rows, u], self.nbr_dist[rows, u]
+
+
+def _take(t: np.ndarray, idx: np.ndarray) -> np.ndarray:
+    """Gathers t[row, idx[row, ...]] for every row of a (T, N) array."""
+    rows = np.arange(len(t)).reshape((-1,) + (1,) * (idx.ndim - 1))
+    return t[rows, idx % t.shape[1]]
+
+
+def _two_opt_moves(
+    batch: _Batch,
+    active: np.ndarray,
+    t: np.ndarray,
+    inv: np.ndarray,
+    edges: np.ndarray,
+):
+    """Evaluates every 2-opt move that connects a node to one of its neighbors.
+
+    Returns (delta, lo, hi) arrays of shape (T, N * K); the move reverses tour
+    positions lo + 1 through hi.
+    """
+    num_nodes = t.shape[1]
+    a = t[:, :, np.newaxis]
+    b = np.roll(t, -1, axis=1)[:, :, np.newaxis]
+    c, dist_ac = batch.neighbors(active, t)
+    j = _take(inv, c)
+    d = _take(t, j + 1)
+
+    delta = dist_ac + batch.dist(active, b, d) - edges[:, :, np.newaxis]
+    delta -= _take(edges, j)
+    delta[(c == b) | (d == a)] = np.inf
+
+    i = np.arange(num_nodes)[np.newaxis, :, np.newaxis]
+    lo, hi = np.minimum(i, j), np.maximum(i, j)
+    shape = (len(t), -1)
+    return delta.reshape(shape), lo.reshape(shape), hi.reshape(shape)
+
+
+def _or_opt_moves(
+    batch: _Batch,
+    active: np.ndarray,
+    t: np.ndarray,
+    inv: np.ndarray,
+    edges: np.ndarray,
+    length: int,
+):
+    """Evaluates moving every segment of the given length next to a neighbor of
+    its first node, in either orientation.
+
+    Returns (delta, start, insert, reverse) arrays of shape (T, M * K * 2). The
+    segment at positions [start, start + length) is moved onto the tour edge
+    starting at position insert, reversed if reverse is set.
+    """
+    num_nodes = t.shape[1]
+    start = np.arange(1, num_nodes - length + 1)
+    if num_nodes < length + 3:
+        empty = np.zeros((len(t), 0))
+        return empty, empty.astype(int), empty.astype(int), empty.astype(bool)
+
+    s1 = t[:, start]
+    s_end = t[:, start + length - 1]
+    nxt = _take(t, np.broadcast_to(start + length, s1.shape))
+    removal = (
+        edges[:, start - 1]
+        + edges[:, start + length - 1]
+        - batch.dist(active, t[:, start - 1], nxt)
+    )[..., np.newaxis]
+
+    c, dist_c = batch.neighbors(active, s1)
+    s_end = s_end[..., np.newaxis]
+    jc = _take(inv, c)
+    lo = start[np.newaxis, :, np.newaxis] - 1
+    hi = start[np.newaxis, :, np.newaxis] + length - 1
+
+    # Insert between c and its successor e, keeping the orientation: c, s1..sL, e
+    e = _take(t, jc + 1)
+    forward = dist_c + batch.dist(active, s_end, e) - _take(edges, jc) - removal
+    forward[(jc >= lo) & (jc <= hi)] = np.inf
+
+    # Insert between c's predecessor f and c, reversed: f, sL..s1, c
+    jf = (jc - 1) % num_nodes
+    f = _take(t, jf)
+    backward = dist_c + batch.dist(active, f, s_end) - _take(edges, jf) - removal
+    backward[(jf >= lo) & (jf <= hi)] = np.inf
+
+    delta = np.stack([forward, backward], axis=-1)
+    insert = np.stack([jc, jf], axis=-1)
+    reverse = np.broadcast_to(np.array([False, True]), delta.shape)
+    seg = np.broadcast_to(start[np.newaxis, :, np.newaxis, np.newaxis], delta.shape)
+    shape = (len(t), -1)
+    return (
+        delta.reshape(shape),
+        seg.reshape(shape),
+        insert.reshape(shape),
+        reverse.reshape(shape),
+    )
+
+
+def _apply_or_opt(
+    tour: np.ndarray, start: int, length: int, insert: int, reverse: bool
+) -> np.ndarray:
+    segment = tour[start : start + length]
+    if reverse:
+        segment = segment[::-1]
+    head = tour[: start if insert >= start else insert + 1]
+    if insert >= start:
+        middle = tour[start + length : insert + 1]
+        tail = tour[insert + 1 :]
+        return np.concatenate([head, middle, segment, tail])
+    middle = tour[insert + 1 : start]
+    tail = tour[start + length :]
+    return np.concatenate([head, segment, middle, tail])
+
+
+def improve_tours(
+    pos: np.ndarray,
+    tours: Sequence[Sequence[int]],
+    num_neighbors: int = 10,
+    or_opt_lengths: Sequence[int] = (1, 2, 3),
+    time_budget: Optional[float] = None,
+    max_iterations: Optional[int] = None,
+    max_moves_per_iteration: int = 64,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Improves a batch of tours with 2-opt and Or-opt moves until they reach a
+    local optimum, or the time or iteration budget runs out.
+
+    Args:
+        pos: (N, 2) positions shared by every tour, or (T, N, 2) positions giving
+            each tour its own instance.
+        tours: (T, N + 1) closed tours, or a single closed tour of length N + 1.
+        num_neighbors: Size of the neighbor lists restricting candidate moves.
+            Defaults to 10.
+        or_opt_lengths: Segment lengths considered for Or-opt moves. Pass an
+            empty sequence for pure 2-opt. Defaults to (1, 2, 3).
+        time_budget: Optional wall-clock budget in seconds.
+        max_iterations: Optional limit on the number of improvement passes.
+        max_moves_per_iteration: Maximum number of improving moves considered
+            for each tour per pass. Defaults to 64.
+
+    Returns:
+        (improved closed tours as a (T, N + 1) int array, (T,) tour costs)
+    """
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+    pos = np.asarray(pos, dtype=float)
+    tours = np.array(tours, dtype=np.int64)
+    single = tours.ndim == 1
+    tours = np.atleast_2d(tours)
+
+    num_tours, num_nodes = tours.shape[0], tours.shape[1] - 1
+    current: List[np.ndarray] = [tour[:-1] for tour in tours]
+    active = np.arange(num_tours) if num_nodes > 3 else np.arange(0)
+    batch = _Batch(pos, num_tours, num_neighbors) if len(active) else None
+
+    iteration = 0
+    while len(active) > 0:
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+        if max_iterations is not None and iteration >= max_iterations:
+            break
+        iteration += 1
+
+        t = np.stack([current[i] for i in active])
+        inv = np.empty_like(t)
+        np.put_along_axis(inv, t, np.arange(num_nodes)[np.newaxis], axis=1)
+
+        edges = batch.dist(active, t, np.roll(t, -1, axis=1))
+
+        # Each candidate move is (delta, kind, a, b, c). Kind 0 is a 2-opt
+        # reversal of positions a + 1..b, kind L > 0 is an Or-opt move of the
+        # length-L segment starting at a onto the edge at b, reversed if c.
+        delta, lo, hi = _two_opt_moves(batch, active, t, inv, edges)
+        moves = [(delta, np.zeros_like(lo), lo, hi, np.zeros_like(lo))]
+        for length in or_opt_lengths:
+            delta, start, insert, reverse = _or_opt_moves(
+                batch, active, t, inv, edges, length
+            )
+            moves.append((delta, np.full_like(start, length), start, insert, reverse))
+        delta, kind, a, b, c = (np.concatenate(m, axis=1) for m in zip(*moves))
+
+        k = min(max_moves_per_iteration, delta.shape[1])
+        top = np.argpartition(delta, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(
+            top, np.argsort(np.take_along_axis(delta, top, axis=1), axis=1), axis=1
+        )
+
+        improved = np.zeros(len(active), dtype=bool)
+        for row, tour_index in enumerate(active):
+            tour = t[row]
+            taken: List[Tuple[int, int]] = []
+            for m in top[row]:
+                if not delta[row, m] < -1e-10:
+                    break
+                length, ma, mb = int(kind[row, m]), int(a[row, m]), int(b[row, m])
+                if length == 0:
+                    span = (ma, mb + 1)
+                else:
+                    span = (min(ma - 1, mb), max(ma + length, mb + 1))
+                if any(span[0] <= hi and lo <= span[1] for lo, hi in taken):
+                    continue
+                taken.append(span)
+
+                if length == 0:
+                    tour = tour.copy()
+                    tour[ma + 1 : mb + 1] = tour[ma + 1 : mb + 1][::-1]
+                else:
+                    tour = _apply_or_opt(tour, ma, length, mb, bool(c[row, m]))
+
+            improved[row] = len(taken) > 0
+            current[tour_index] = tour
+
+        active = active[improved]
+
+    result = np.stack([np.append(tour, tour[0]) for tour in current])
+    pos_b = pos if pos.ndim == 3 else np.broadcast_to(pos, (num_tours,) + pos.shape)
+    costs = np.array([tour_cost(p, tour) for p, tour in zip(pos_b, result)])
+    if single:
+        return result[0], costs[0]
+    return result, costs
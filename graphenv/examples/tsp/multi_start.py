@@ -0,0 +1,93 @@
+"""POMO-style multi-start decoding of TSP tours.
+
+A tour is a cycle, so it can be decoded starting from any node. Decoding from
+many start nodes at once and keeping the shortest tour exploits this symmetry:
+the rollouts of every start node of every instance advance together, with their
+candidate verticies evaluated in one batched model call per step, so the best of
+N starts costs about the latency of a single batched rollout. Models providing
+encode_roots() and forward_encoded(), such as the shared TSP GNN models, also
+encode each instance's graph only once for all of its starts.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from graphenv.beam_search import beam_search
+from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.graph_model import GraphModel
+
+
+def multi_start_roots(
+    state: TSPState,
+    num_starts: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> List[TSPState]:
+    """Creates root states beginning at different nodes of a state's instance.
+
+    The roots are created with state.new(), so they share the instance data,
+    such as the positions and TSPNFPState's preprocessed graph inputs.
+
+    Args:
+        state: Any state of the instance.
+        num_starts: Number of start nodes, drawn at random without replacement.
+            Defaults to None, which starts from every node.
+        seed: Seed for drawing the start nodes.
+
+    Returns:
+        One root state per start node.
+    """
+    starts = np.arange(state.num_nodes)
+    if num_starts is not None and num_starts < state.num_nodes:
+        starts = np.random.default_rng(seed).choice(starts, num_starts, replace=False)
+    return [state.new([int(start)]) for start in starts]
+
+
+def _rotate(tour: List[int], start: int) -> List[int]:
+    """Rotates a closed tour so it begins and ends at start."""
+    cycle = tour[:-1]
+    k = cycle.index(start)
+    return cycle[k:] + cycle[:k] + [start]
+
+
+def multi_start_tours(
+    model: GraphModel,
+    states: Sequence[TSPState],
+    num_starts: Optional[int] = None,
+    beam_width: int = 1,
+    seed: Optional[int] = None,
+) -> List[Tuple[List[int], float]]:
+    """Decodes tours for a batch of instances from many start nodes at once,
+    keeping the shortest tour of each instance.
+
+    The starts of an instance are a group of the beam search, so models
+    providing encode_roots() and forward_encoded() encode each instance once.
+
+    Args:
+        model: Model used to score verticies, see graphenv.beam_search.
+        states: One state per instance, e.g. TSPState(G).root.
+        num_starts: Number of start nodes per instance. Defaults to None, which
+            starts from every node.
+        beam_width: Beam width of each start's decoding. Defaults to 1, greedy
+            decoding.
+        seed: Seed for drawing the start nodes.
+
+    Returns:
+        For each instance, the (closed tour, tour cost) of the best decoded
+        tour, rotated to begin at the first node of the instance's state.
+    """
+    roots = [multi_start_roots(state, num_starts, seed) for state in states]
+    results = beam_search(
+        model,
+        [root for instance in roots for root in instance],
+        beam_width,
+        groups=np.repeat(np.arange(len(roots)), [len(r) for r in roots]),
+    )
+
+    best = []
+    offset = 0
+    for state, instance in zip(states, roots):
+        path, total = max(
+            results[offset : offset + len(instance)], key=lambda result: result[1]
+        )
+        offset += len(instance)
+        best.append((_rotate(path[-1].tour, state.tour[0]), -total))
+    return best
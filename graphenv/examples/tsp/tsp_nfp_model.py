@@ -35,6 +35,38 @@ class BaseTSPGNNModel(GraphModel):
             shape=[None, 2], dtype=tf.int32, name="connectivity"
         )
 
+        node_state = BaseTSPGNNModel._encode_graph(
+            node_visited, edge_weights, connectivity, num_messages, embed_dim
+        )
+
+        current_node_embedding = nfp.layers.Gather()([node_state, current_node])
+        current_node_embedding = layers.Flatten()(current_node_embedding)
+
+        reshaped_distance = layers.Reshape((1,))(distance)
+        action_values, action_weights = BaseTSPGNNModel._output_layers(
+            current_node_embedding, reshaped_distance
+        )
+
+        return tf.keras.Model(
+            [current_node, distance, node_visited, edge_weights, connectivity],
+            [action_values, action_weights],
+            name="policy_model",
+        )
+
+    @staticmethod
+    def _encode_graph(
+        node_visited: tf.Tensor,
+        edge_weights: tf.Tensor,
+        connectivity: tf.Tensor,
+        num_messages: int = 3,
+        embed_dim: int = 32,
+    ) -> tf.Tensor:
+        """Embeds every node of the graph with num_messages rounds of message
+        passing.
+
+        Returns:
+            Node state tensor of shape (batch, num_nodes, embed_dim)
+        """
         node_state = layers.Embedding(
             3, embed_dim, name="node_embedding", mask_zero=True
         )(node_visited)
@@ -50,16 +82,26 @@ class BaseTSPGNNModel(GraphModel):
             new_node_state = nfp.NodeUpdate()([node_state, edge_state, connectivity])
             node_state = layers.Add()([node_state, new_node_state])
 
-        current_node_embedding = nfp.layers.Gather()([node_state, current_node])
-        current_node_embedding = layers.Flatten()(current_node_embedding)
+        return node_state
+
+    @staticmethod
+    def _output_layers(
+        node_embedding: tf.Tensor, distance: tf.Tensor
+    ) -> Tuple[tf.Tensor, tf.Tensor]:
+        """Computes action values and weights from the embedding of a vertex's
+        current node and the distance travelled to reach it. Both inputs have a
+        trailing feature dimension.
 
+        Returns:
+            (action values, action weights)
+        """
         action_values = layers.Dense(
             1,
             name="action_value_output",
             kernel_initializer=tf.keras.initializers.RandomNormal(
                 mean=0.0, stddev=1e-6, seed=None
             ),
-        )(current_node_embedding)
+        )(node_embedding)
 
         action_weights = layers.Dense(
             1,
@@ -67,23 +109,88 @@ class BaseTSPGNNModel(GraphModel):
             kernel_initializer=tf.keras.initializers.RandomNormal(
                 mean=0.0, stddev=1e-6, seed=None
             ),
-        )(current_node_embedding)
+        )(node_embedding)
 
-        reshaped_distance = layers.Reshape((1,))(distance)
         distance_values = layers.Dense(
             1,
             name="distance_values",
             kernel_initializer=tf.keras.initializers.Constant(-20),
-        )(reshaped_distance)
+        )(distance)
 
         distance_weights = layers.Dense(
             1,
             name="distance__weights",
             kernel_initializer=tf.keras.initializers.Constant(-20),
-        )(reshaped_distance)
+        )(distance)
 
         action_values = layers.Add()([distance_values, action_values])
         action_weights = layers.Add()([distance_weights, action_weights])
+        return action_values, action_weights
+
+    def forward_vertex(
+        self,
+        input_dict: GraphModelObservation,
+    ) -> Tuple[tf.Tensor, tf.Tensor]:
+        return tuple(self.base_model(input_dict))
+
+
+class BaseTSPSharedGNNModel(BaseTSPGNNModel):
+    """A variant of BaseTSPGNNModel that runs message passing once per
+    observation rather than once per vertex.
+
+    Every child of a TSPNFPState shares the parent's graph and differs only in
+    its current node, the distance travelled to reach it, and a single visited
+    flag. This model therefore encodes the graph of the current (parent) vertex
+    once, gathers the embedding of each vertex's current node from it, and
+    combines it with that vertex's distance, cutting the message passing work
+    by a factor of 1 + max_num_children.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encoder = self.base_model.get_layer("graph_encoder")
+        self.head = self.base_model.get_layer("vertex_head")
+
+    @staticmethod
+    def _create_base_model(
+        num_messages: int = 3, embed_dim: int = 32
+    ) -> tf.keras.Model:
+
+        node_visited = layers.Input(shape=[None], dtype=tf.int32, name="node_visited")
+        edge_weights = layers.Input(shape=[None], dtype=tf.float32, name="edge_weights")
+        connectivity = layers.Input(
+            shape=[None, 2], dtype=tf.int32, name="connectivity"
+        )
+        encoder = tf.keras.Model(
+            [node_visited, edge_weights, connectivity],
+            BaseTSPGNNModel._encode_graph(
+                node_visited, edge_weights, connectivity, num_messages, embed_dim
+            ),
+            name="graph_encoder",
+        )
+
+        # Scores verticies from the embedding of their current node and distance
+        node_embedding = layers.Input(shape=[None, embed_dim], name="node_embedding")
+        vertex_distance = layers.Input(shape=[None, 1], name="vertex_distance")
+        head = tf.keras.Model(
+            [node_embedding, vertex_distance],
+            BaseTSPGNNModel._output_layers(node_embedding, vertex_distance),
+            name="vertex_head",
+        )
+
+        current_node = layers.Input(shape=[None], dtype=tf.int32, name="current_node")
+        distance = layers.Input(shape=[None], dtype=tf.float32, name="distance")
+        node_state = encoder([node_visited, edge_weights, connectivity])
+
+        # (batch, num_vertices, embed_dim) embeddings of each vertex's current node
+        current_node_embedding = layers.Lambda(
+            lambda x: tf.gather(x[0], x[1], batch_dims=1), name="gather_nodes"
+        )([node_state, current_node])
+
+        reshaped_distance = layers.Reshape((-1, 1))(distance)
+        action_values, action_weights = head(
+            [current_node_embedding, reshaped_distance]
+        )
 
         return tf.keras.Model(
             [current_node, distance, node_visited, edge_weights, connectivity],
@@ -91,11 +198,88 @@ class BaseTSPGNNModel(GraphModel):
             name="policy_model",
         )
 
+    def _forward_vertices(
+        self,
+        vertex_observations: GraphModelObservation,
+    ) -> Tuple[tf.Tensor, tf.Tensor]:
+        """Encodes the graph of each observation's current vertex (index 0) and
+        scores all of its verticies against it.
+
+        Args:
+            vertex_observations: stacked per-vertex observations
+
+        Returns:
+            (value tensor, weight tensor) in flattened vertex order
+        """
+        inputs = {
+            "current_node": vertex_observations["current_node"],
+            "distance": vertex_observations["distance"],
+            "node_visited": vertex_observations["node_visited"][:, 0],
+            "edge_weights": vertex_observations["edge_weights"][:, 0],
+            "connectivity": vertex_observations["connectivity"][:, 0],
+        }
+        return tuple(tf.reshape(x, [-1, 1]) for x in self.base_model(inputs))
+
     def forward_vertex(
         self,
         input_dict: GraphModelObservation,
     ) -> Tuple[tf.Tensor, tf.Tensor]:
-        return tuple(self.base_model(input_dict))
+        """Evaluates independent verticies, each against its own graph.
+
+        Args:
+            input_dict: per-vertex observations
+
+        Returns:
+            (value tensor, weight tensor) for the given observations
+        """
+        inputs = dict(input_dict)
+        inputs["current_node"] = tf.expand_dims(inputs["current_node"], 1)
+        inputs["distance"] = tf.expand_dims(inputs["distance"], 1)
+        return tuple(tf.reshape(x, [-1, 1]) for x in self.base_model(inputs))
+
+    def encode_roots(self, root_observations: GraphModelObservation) -> tf.Tensor:
+        """Encodes the graph of each given root, for multi-start decoding with
+        graphenv.beam_search. Every node is encoded as unvisited, so the
+        encoding is the same for every start node of an instance.
+
+        Args:
+            root_observations: stacked observations of one root per instance
+
+        Returns:
+            Node state tensor of shape (num_roots, num_nodes, embed_dim)
+        """
+        return self.encoder(
+            [
+                tf.ones_like(root_observations["node_visited"]),
+                root_observations["edge_weights"],
+                root_observations["connectivity"],
+            ]
+        )
+
+    def forward_encoded(
+        self,
+        encodings: tf.Tensor,
+        roots: tf.Tensor,
+        input_dict: GraphModelObservation,
+    ) -> Tuple[tf.Tensor, tf.Tensor]:
+        """Scores verticies by gathering the embedding of their current node from
+        the encoding of their root, without message passing.
+
+        Args:
+            encodings: node states returned by encode_roots()
+            roots: index into encodings of each vertex's root
+            input_dict: per-vertex observations
+
+        Returns:
+            (value tensor, weight tensor) for the given observations
+        """
+        node_state = tf.gather(encodings, roots)
+        current_node = tf.expand_dims(input_dict["current_node"], 1)
+        node_embedding = tf.gather(node_state, current_node, batch_dims=1)
+        distance = tf.reshape(tf.cast(input_dict["distance"], tf.float32), [-1, 1, 1])
+        return tuple(
+            tf.reshape(x, [-1, 1]) for x in self.head([node_embedding, distance])
+        )
 
 
 class TSPGNNModel(BaseTSPGNNModel, TFModelV2):
@@ -110,3 +294,17 @@ class TSPGNNQModelBellman(
     GraphModelBellmanMixin, BaseTSPGNNModel, DistributionalQTFModel
 ):
     pass
+
+
+class TSPSharedGNNModel(BaseTSPSharedGNNModel, TFModelV2):
+    pass
+
+
+class TSPSharedGNNQModel(BaseTSPSharedGNNModel, DistributionalQTFModel):
+    pass
+
+
+class TSPSharedGNNQModelBellman(
+    GraphModelBellmanMixin, BaseTSPSharedGNNModel, DistributionalQTFModel
+):
+    pass
@@ -1,29 +1,77 @@
 from math import sqrt
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
 
 import gym
 import networkx as nx
 import numpy as np
+from graphenv.examples.tsp.graph_utils import complete_planar_graph
 from graphenv.examples.tsp.tsp_preprocessor import TSPPreprocessor
 from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.vertex import ChildrenBatch
+
+if TYPE_CHECKING:
+    from graphenv.examples.tsp.instance_pool import TSPInstancePool
 
 
 class TSPNFPState(TSPState):
+    __slots__ = ("graph_inputs",)
+
     def __init__(
         self,
-        G: nx.Graph,
+        G: Optional[nx.Graph] = None,
         graph_inputs: Optional[Dict] = None,
         max_num_neighbors: Optional[int] = None,
         tour: List[int] = [0],
+        positions: Optional[np.ndarray] = None,
+        instance_pool: Optional["TSPInstancePool"] = None,
     ) -> None:
-        super().__init__(G, tour)
+        super().__init__(G, tour, positions=positions, instance_pool=instance_pool)
         if graph_inputs is None:
+            if G is None:
+                G = complete_planar_graph(self.positions)
             graph_inputs = TSPPreprocessor(max_num_neighbors=max_num_neighbors)(G)
         self.graph_inputs = graph_inputs
-        self.num_edges = len(graph_inputs["edge_weights"])
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.graph_inputs["edge_weights"])
+
+    @classmethod
+    def from_instance_pool(
+        cls,
+        instance_pool: "TSPInstancePool",
+        index: Optional[int] = None,
+        tour: List[int] = [0],
+    ) -> "TSPNFPState":
+        if index is None:
+            index = instance_pool.sample()
+        return cls(
+            graph_inputs=instance_pool.graph_inputs(index),
+            tour=tour,
+            positions=instance_pool.positions[index],
+            instance_pool=instance_pool,
+        )
 
     def new(self, tour: List[int] = [0]):
-        return self.__class__(self.G, graph_inputs=self.graph_inputs, tour=tour)
+        return self.__class__(
+            self.G,
+            graph_inputs=self.graph_inputs,
+            tour=tour,
+            positions=self.positions,
+            instance_pool=self.instance_pool,
+        )
+
+    def share(self) -> "TSPNFPState":
+        from graphenv.shared_arrays import share_array
+
+        return self.__class__(
+            graph_inputs={
+                key: share_array(value) for key, value in self.graph_inputs.items()
+            },
+            tour=list(self.tour),
+            positions=share_array(self.positions),
+            instance_pool=self.instance_pool,
+        )
 
     @property
     def observation_space(self) -> gym.spaces.Dict:
@@ -62,6 +110,32 @@ class TSPNFPState(TSPState):
             }
         )
 
+    def _get_children_batch(self) -> ChildrenBatch:
+        nbrs = self._next_nodes()
+        num_children = len(nbrs)
+
+        node_visited = np.ones((num_children, self.num_nodes), dtype=np.int64)
+        node_visited[:, self.tour] += 1
+        node_visited[np.arange(num_children), nbrs] = 2
+
+        return ChildrenBatch(
+            num_children,
+            {
+                "current_node": nbrs,
+                "distance": self.distances(self.tour[-1])[nbrs],
+                "node_visited": node_visited,
+                "edge_weights": np.broadcast_to(
+                    self.graph_inputs["edge_weights"],
+                    (num_children, self.num_edges),
+                ),
+                "connectivity": np.broadcast_to(
+                    self.graph_inputs["connectivity"],
+                    (num_children, self.num_edges, 2),
+                ),
+            },
+            fields={"node": nbrs},
+        )
+
     def _make_observation(self) -> Dict[str, np.ndarray]:
         """Return an observation.  The dict returned here needs to match
         both the self.observation_space in this class, as well as the input
@@ -76,7 +150,7 @@ class TSPNFPState(TSPState):
         node_visited[self.tour] += 1
 
         if len(self.tour) > 1:
-            distance = self.G.get_edge_data(self.tour[-2], self.tour[-1])["weight"]
+            distance = -self.reward
         else:
             # First node
             distance = 0.0
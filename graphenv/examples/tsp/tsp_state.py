@@ -1,22 +1,43 @@
-from typing import Dict, List, Sequence
+import math
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
 
 import gym
 import networkx as nx
 import numpy as np
-from graphenv import tf
-from graphenv.vertex import Vertex
+from graphenv.examples.tsp.baselines import hilbert_order
+from graphenv.examples.tsp.graph_utils import (
+    get_positions,
+    make_complete_planar_graph,
+)
+from graphenv.vertex import ChildrenBatch, Vertex
+from scipy.spatial import cKDTree
 
-layers = tf.keras.layers
+if TYPE_CHECKING:
+    from graphenv.examples.tsp.instance_pool import TSPInstancePool
 
 
 class TSPState(Vertex):
-    def __init__(self, G: nx.Graph, tour: List[int] = [0]) -> None:
+    __slots__ = ("G", "positions", "tour", "instance_pool")
+
+    def __init__(
+        self,
+        G: Optional[nx.Graph] = None,
+        tour: List[int] = [0],
+        positions: Optional[np.ndarray] = None,
+        instance_pool: Optional["TSPInstancePool"] = None,
+    ) -> None:
         """Create a TSP vertex that defines the graph search problem.
 
         Args:
-            G: A fully connected networkx graph.
+            G: A fully connected networkx graph with a "pos" attribute on every
+                node. Edge weights are taken to be the Euclidean distances
+                between node positions. May be omitted if positions is given.
             tour: A list of nodes in visitation order that led to this
                 state. Defaults to [0] which begins the tour at node 0.
+            positions: (N, 2) array of node positions. Defaults to the "pos"
+                attributes of G.
+            instance_pool: Optional pool of pre-generated instances. If given,
+                each call to root draws a new instance from the pool.
 
 
         Notes:
@@ -27,9 +48,100 @@ class TSPState(Vertex):
 
         super().__init__()
 
+        if positions is None:
+            positions = get_positions(G)
+
         self.G = G
-        self.num_nodes = self.G.number_of_nodes()
+        self.positions = positions
         self.tour = tour
+        self.instance_pool = instance_pool
+
+    def __getstate__(self) -> Dict[str, any]:
+        # The networkx graph is only read for its positions when the state is
+        # created, so pickles keep the positions and tour but not the graph
+        state = super().__getstate__()
+        state["G"] = None
+        return state
+
+    @property
+    def num_nodes(self) -> int:
+        """
+        Returns:
+            Number of nodes in the graph.
+        """
+        return len(self.positions)
+
+    @classmethod
+    def from_seed(cls, N: int, seed: Optional[int] = None, **kwargs) -> "TSPState":
+        """Creates a state on a random planar instance, as registered under
+        "tsp" in graphenv.state_registry, so each rollout worker can build the
+        instance itself from a few arguments.
+
+        Args:
+            N: Number of nodes.
+            seed: Seed of the instance.
+            **kwargs: Other arguments of the state's constructor.
+
+        Returns:
+            New TSP state.
+        """
+        return cls(make_complete_planar_graph(N=N, seed=seed), **kwargs)
+
+    @classmethod
+    def from_instance_pool(
+        cls,
+        instance_pool: "TSPInstancePool",
+        index: Optional[int] = None,
+        tour: List[int] = [0],
+    ) -> "TSPState":
+        """Creates a state on an instance of a pre-generated pool, without
+        building a networkx graph.
+
+        Args:
+            instance_pool: Pool of pre-generated instances.
+            index: Index of the instance to use. Defaults to a random instance.
+            tour: List of visited nodes. Defaults to [0].
+
+        Returns:
+            New TSP state referencing the pool's memory-mapped arrays.
+        """
+        if index is None:
+            index = instance_pool.sample()
+        return cls(
+            tour=tour,
+            positions=instance_pool.positions[index],
+            instance_pool=instance_pool,
+        )
+
+    def distances(self, node: int) -> np.ndarray:
+        """Returns the distances from a node to every node in the graph.
+
+        Args:
+            node: Index of the node.
+
+        Returns:
+            (N,) array of Euclidean distances.
+        """
+        return np.sqrt(((self.positions - self.positions[node]) ** 2).sum(axis=-1))
+
+    @property
+    def distance_matrix(self) -> np.ndarray:
+        """
+        Returns:
+            (N, N) array of pairwise distances between all nodes.
+        """
+        delta = self.positions[:, np.newaxis] - self.positions[np.newaxis]
+        return np.sqrt((delta**2).sum(axis=-1))
+
+    @property
+    def unvisited(self) -> np.ndarray:
+        """
+        Returns:
+            Sorted array of the nodes not yet on the tour.
+        """
+        mask = np.ones(self.num_nodes, dtype=bool)
+        mask[self.tour] = False
+        return np.flatnonzero(mask)
 
     @property
     def observation_space(self) -> gym.spaces.Dict:
@@ -60,8 +172,11 @@ class TSPState(Vertex):
         """Returns the root node of the graph env.
 
         Returns:
-            Node with node 0 as the starting point of the tour.
+            Node with node 0 as the starting point of the tour, on a newly drawn
+            instance if this state has an instance pool.
         """
+        if self.instance_pool is not None:
+            return self.from_instance_pool(self.instance_pool)
         return self.new([0])
 
     @property
@@ -78,7 +193,8 @@ class TSPState(Vertex):
         else:
             # Otherwise, reward is negative distance between last two nodes.
             src, dst = self.tour[-2:]
-            rew = -self.G[src][dst]["weight"]
+            delta = self.positions[src] - self.positions[dst]
+            rew = -float(np.sqrt((delta**2).sum()))
 
         return rew
 
@@ -92,36 +208,66 @@ class TSPState(Vertex):
         Returns:
             New TSP state.
         """
-        return self.__class__(self.G, tour)
+        return self.__class__(
+            self.G, tour, positions=self.positions, instance_pool=self.instance_pool
+        )
+
+    def share(self) -> "TSPState":
+        """Copies this state with its instance arrays in shared memory and
+        without the networkx graph, so that pickling it, e.g. in an rllib
+        env_config, only references the arrays. See graphenv.shared_arrays.
+
+        Returns:
+            New TSP state on the same tour.
+        """
+        from graphenv.shared_arrays import share_array
+
+        return self.__class__(
+            tour=list(self.tour),
+            positions=share_array(self.positions),
+            instance_pool=self.instance_pool,
+        )
 
     @property
     def info(self) -> Dict:
         return {}
 
-    def _get_children(self) -> Sequence["TSPState"]:
-        """Yields a sequence of TSPState instances associated with the next
-        accessible nodes.
-
-        Yields:
-            New instance of the TSPState with the next node added to
-            the tour.
+    def _get_num_children(self) -> int:
         """
-        G = self.G
-        cur_node = self.tour[-1]
+        Returns:
+            Number of unvisited nodes, or 1 to return to the first node once
+            every node is visited, or 0 once the tour is closed.
+        """
+        if len(self.tour) < self.num_nodes:
+            return self.num_nodes - len(self.tour)
+        return 1 if len(self.tour) == self.num_nodes else 0
 
+    def _next_nodes(self) -> np.ndarray:
+        """Returns the nodes that can be visited next, in the order of the
+        children."""
         # Look at neighbors not already on the path.
-        nbrs = [n for n in G.neighbors(cur_node) if n not in self.tour]
+        nbrs = self.unvisited
 
         # Go back to the first node if we've visited every other already.
         if len(nbrs) == 0 and len(self.tour) == self.num_nodes:
-            nbrs = [self.tour[0]]
+            nbrs = np.array(self.tour[:1])
 
         # Conditions for completing the circuit.
         if len(nbrs) == 0 and len(self.tour) == self.num_nodes + 1:
-            nbrs = []
+            nbrs = np.array([], dtype=int)
+
+        return nbrs
+
+    def _get_children(self) -> Sequence["TSPState"]:
+        """Yields a sequence of TSPState instances associated with the next
+        accessible nodes.
 
+        Yields:
+            New instance of the TSPState with the next node added to
+            the tour.
+        """
         # Loop over the neighbors and update paths.
-        for nbr in nbrs:
+        for nbr in self._next_nodes().tolist():
 
             # Update the node path with next node.
             tour = self.tour.copy()
@@ -129,6 +275,88 @@ class TSPState(Vertex):
 
             yield self.new(tour)
 
+    def _get_children_batch(self) -> ChildrenBatch:
+        """Observes every child at once from arrays of the next nodes, rather
+        than creating and observing each child.
+
+        Returns:
+            Batch of the children's stacked observations, with the next node of
+            each child in the "node" field.
+        """
+        nbrs = self._next_nodes()
+        unvisited = self.unvisited
+
+        # The nbr_dist of the child visiting a node is the distance from that
+        # node to its nearest other unvisited node
+        nbr_dist = np.zeros(len(nbrs))
+        if len(unvisited) > 1:
+            nbr_pos = self.positions[unvisited]
+            nbr_dist = cKDTree(nbr_pos).query(nbr_pos, k=2)[0][:, 1]
+
+        return ChildrenBatch(
+            len(nbrs),
+            {
+                "node_obs": np.array(self.positions[nbrs], dtype=float),
+                "node_idx": nbrs[:, np.newaxis],
+                "parent_dist": self.distances(self.tour[-1])[nbrs, np.newaxis],
+                "nbr_dist": nbr_dist[:, np.newaxis],
+            },
+            fields={"node": nbrs},
+        )
+
+    def _get_child_scores(self) -> np.ndarray:
+        """Scores the children by how close their node is to the current one,
+        so GraphEnv's preselect_children keeps the nearest unvisited nodes.
+
+        Returns:
+            Negative distance from the current node to each next node.
+        """
+        return -self.distances(self.tour[-1])[self._next_nodes()]
+
+    def _get_children_subset(self, indices: Sequence[int]) -> Sequence["TSPState"]:
+        nbrs = self._next_nodes()[indices]
+        return [self.new(self.tour + [nbr]) for nbr in nbrs.tolist()]
+
+    def _get_child_clusters(self, max_size: int) -> Optional[List[np.ndarray]]:
+        """Clusters the next nodes into spatially compact groups of about the
+        square root of their number, by cutting their order along a Hilbert
+        curve into consecutive runs. Each cluster is represented by its node
+        nearest to the current one, and clusters are ordered by the distance to
+        their representative.
+
+        Args:
+            max_size: Maximum number of clusters and of nodes per cluster.
+
+        Raises:
+            ValueError: If there are more than max_size**2 next nodes, which
+                cannot be split into at most max_size clusters of at most
+                max_size nodes.
+
+        Returns:
+            Child positions of each cluster, or None if there are at most
+            max_size next nodes.
+        """
+        nbrs = self._next_nodes()
+        if len(nbrs) <= max_size:
+            return None
+        if len(nbrs) > max_size**2:
+            raise ValueError(
+                f"Cannot cluster {len(nbrs)} next nodes into at most {max_size} "
+                f"clusters of at most {max_size} nodes, max_num_children must be "
+                f"at least {math.ceil(math.sqrt(len(nbrs)))}"
+            )
+
+        size = max(math.ceil(math.sqrt(len(nbrs))), math.ceil(len(nbrs) / max_size))
+        order = hilbert_order(self.positions[nbrs], order=10)
+        dist = self.distances(self.tour[-1])[nbrs]
+
+        clusters = []
+        for start in range(0, len(order), size):
+            cluster = order[start : start + size]
+            clusters.append(cluster[np.argsort(dist[cluster], kind="stable")])
+        clusters.sort(key=lambda cluster: dist[cluster[0]])
+        return clusters
+
     def _make_observation(self) -> Dict[str, np.ndarray]:
         """Return an observation.  The dict returned here needs to match
         both the self.observation_space in this class, as well as the input
@@ -140,20 +368,21 @@ class TSPState(Vertex):
         """
 
         cur_node = self.tour[-1]
-        cur_pos = np.array(self.G.nodes[cur_node]["pos"], dtype=float).squeeze()
+        cur_pos = np.array(self.positions[cur_node], dtype=float).squeeze()
+        dist = self.distances(cur_node)
 
         # Compute distance to parent node, or 0 if this is the root.
         if len(self.tour) == 1:
             parent_dist = 0.0
         else:
-            parent_dist = self.G[cur_node][self.tour[-2]]["weight"]
+            parent_dist = dist[self.tour[-2]]
 
         # Get list of all neighbors that are unvisited.  If none, then the only
         # remaining neighbor is the root so dist is 0.
-        nbrs = [n for n in self.G.neighbors(cur_node) if n not in self.tour]
+        nbrs = self.unvisited
         nbr_dist = 0.0
         if len(nbrs) > 0:
-            nbr_dist = np.min([self.G[cur_node][n]["weight"] for n in nbrs])
+            nbr_dist = np.min(dist[nbrs])
 
         return {
             "node_obs": cur_pos,
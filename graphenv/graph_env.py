@@ -1,13 +1,20 @@
 import logging
+import time
 import warnings
-from typing import Dict, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
 import gym
 import numpy as np
-from ray.rllib.env.env_context import EnvContext
 
 import graphenv.space_util as space_util
-from graphenv.vertex import V
+from graphenv.async_vertex import AsyncVertex, gather_observations
+from graphenv.state_registry import make_state
+from graphenv.vertex import V, Vertex
+
+if TYPE_CHECKING:
+    from ray.rllib.env.env_context import EnvContext
+
+    from graphenv.observation_pool import ObservationPool
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +30,34 @@ class GraphEnv(gym.Env):
     Attributes:
         state: current vertex
         max_num_children: maximum number of actions considered at a time
+        preselect_children: whether only the top max_num_children children of
+            each vertex, by the vertex's heuristic child scores, are actions
+        hierarchical_actions: whether choosing among clustered children is split
+            into a cluster choice and a within-cluster choice
+        max_concurrency: maximum number of AsyncVertex observations awaited at
+            once by the async methods, or None for no limit
+        observation_workers: number of worker processes observing children, or
+            None to observe them in this process
+        observation_chunk_size: number of children sent to a worker at a time
+        _observation_pool: pool of worker processes, started on first use
+        step_time_budget: seconds each step may spend observing children, or
+            None for no budget
+        num_observations: number of observations of the current state made
+            with a step_time_budget
+        num_truncated_observations: number of those observations that masked
+            out children left unobserved at the deadline
+        _step_start: time the current step started, until it is observed
+        _num_observed_actions: number of actions of the current state left
+            valid by its last observation
+        _cluster_children: children of the cluster chosen at the current state,
+            while waiting for the within-cluster choice
+        _streamed_children: verticies the actions of the current state lead to,
+            kept from streaming them into its last observation, or from
+            observing them in the observation pool, so that the action taken
+            moves to the vertex that was observed
+        _pooled_observations: stacked vertex observations of the current state
+            made by the observation pool, so that the action taken keeps the
+            observation of the vertex it moves to
         _action_mask_key: key under which the action mask is stored in the root
             observation space dict
         _vertex_observation_key: key under which the per-action vertex observations are
@@ -31,28 +66,105 @@ class GraphEnv(gym.Env):
 
     state: V
     max_num_children: int
+    preselect_children: bool
+    hierarchical_actions: bool
+    max_concurrency: Optional[int]
+    observation_workers: Optional[int]
+    observation_chunk_size: int
+    _observation_pool: Optional["ObservationPool"]
+    step_time_budget: Optional[float]
+    num_observations: int
+    num_truncated_observations: int
+    _step_start: Optional[float]
+    _num_observed_actions: Optional[int]
+    _cluster_children: Optional[List[V]]
+    _streamed_children: Optional[List[V]]
+    _pooled_observations: Optional[Any]
     _action_mask_key: str
     _vertex_observation_key: str
 
-    def __init__(self, env_config: EnvContext) -> None:
+    def __init__(self, env_config: "EnvContext") -> None:
         """Initializes a GraphEnv instance.
 
         Args:
             env_config (dict): A dictionary of parameters, required to conform with
                 rllib's environment initialization. Should contain the following keys:
-                state (N): Current vertex
+                state (N): Current vertex. May be omitted if state_factory is given.
+                state_factory (str, optional): name of a state factory building
+                    the state in each process instead, see
+                    graphenv.state_registry.
+                state_config (dict, optional): keyword arguments of the state
+                    factory.
                 max_num_children (int): maximum number of children considered at a time
                 action_mask_key (str, optional): key under which the action mask is
                     stored in the root observation space dict. Defaults to "action_mask"
                 vertex_observation_key (str, optional): key under which the per-action
                     vertex observations are stored in the root observation space dict.
                     Defaults to "vertex_observations".
+                preselect_children (bool, optional): if True, the actions of a
+                    vertex are only its max_num_children most promising children,
+                    as scored by Vertex._get_child_scores(), so verticies may
+                    have more children than max_num_children. Defaults to False.
+                hierarchical_actions (bool, optional): if True, verticies that
+                    cluster their children with Vertex._get_child_clusters() are
+                    left in two steps: the first chooses a cluster, observing one
+                    representative child per cluster, and the second chooses a
+                    child within that cluster. The first step returns a reward of
+                    0 and stays on the same vertex. The children of the initial
+                    state are clustered when the env is created, raising a
+                    ValueError if they need more than max_num_children clusters
+                    or children per cluster. Defaults to False.
+                max_concurrency (int, optional): maximum number of AsyncVertex
+                    observations awaited at once by the async methods, such as
+                    make_observation_async(). Defaults to None, no limit.
+                observation_workers (int, optional): if given, the children of
+                    verticies with more than observation_chunk_size of them are
+                    observed in this many worker processes, see
+                    graphenv.observation_pool. Defaults to None, observing the
+                    children in this process.
+                observation_chunk_size (int, optional): number of children sent
+                    to a worker process at a time. Defaults to 16.
+                step_time_budget (float, optional): if given, the number of
+                    seconds each step() or reset() may spend observing the
+                    children of the new state one at a time. Children left
+                    unobserved at the deadline are masked out of the actions,
+                    keeping at least one. The state must count its children
+                    without creating them, with Vertex._get_num_children(), else
+                    a ValueError is raised: children created to be counted would
+                    all be created before the deadline is first checked. Only
+                    verticies streaming their children, see
+                    Vertex.iter_children(), create them within the budget.
+                    Defaults to None, no budget.
+
+        Raises:
+            ValueError: If a step_time_budget is given for a state that cannot
+                count its children without creating them, or if the children of
+                a hierarchical_actions state cannot be clustered.
         """
         super().__init__()
 
         logger.debug("entering graphenv construction")
-        self.state = env_config["state"]
+        if "state" in env_config:
+            self.state = env_config["state"]
+        else:
+            self.state = make_state(
+                env_config["state_factory"], env_config.get("state_config")
+            )
         self.max_num_children = env_config["max_num_children"]
+        self.preselect_children = env_config.get("preselect_children", False)
+        self.hierarchical_actions = env_config.get("hierarchical_actions", False)
+        self.max_concurrency = env_config.get("max_concurrency", None)
+        self.observation_workers = env_config.get("observation_workers", None)
+        self.observation_chunk_size = env_config.get("observation_chunk_size", 16)
+        self._observation_pool = None
+        self.step_time_budget = env_config.get("step_time_budget", None)
+        self.num_observations = 0
+        self.num_truncated_observations = 0
+        self._step_start = None
+        self._num_observed_actions = None
+        self._cluster_children = None
+        self._streamed_children = None
+        self._pooled_observations = None
 
         try:
             self._action_mask_key = env_config["action_mask_key"]
@@ -74,6 +186,19 @@ class GraphEnv(gym.Env):
             }
         )
         self.action_space = gym.spaces.Discrete(self.max_num_children)
+        state_class = type(self.state)
+        if (
+            self.step_time_budget is not None
+            and state_class._get_num_children is Vertex._get_num_children
+        ):
+            raise ValueError(
+                f"A step_time_budget needs {state_class.__name__} to count its "
+                "children without creating them, with _get_num_children()"
+            )
+        if self.hierarchical_actions:
+            # Raises a ValueError now, rather than at the first step, if the
+            # children cannot be clustered within max_num_children
+            self.state.cluster_representatives(self.max_num_children)
         logger.debug("leaving graphenv construction")
 
     def reset(self) -> Dict[str, np.ndarray]:
@@ -83,9 +208,27 @@ class GraphEnv(gym.Env):
         Returns:
             Dict[str, np.ndarray]: Observation of the root vertex.
         """
+        self._step_start = time.perf_counter()
         self.state = self.state.root
+        self._cluster_children = None
+        self._streamed_children = None
+        self._pooled_observations = None
         return self.make_observation()
 
+    async def reset_async(self) -> Dict[str, np.ndarray]:
+        """Resets the state like reset(), observing the root vertex with
+        make_observation_async().
+
+        Returns:
+            Dict[str, np.ndarray]: Observation of the root vertex.
+        """
+        self._step_start = time.perf_counter()
+        self.state = self.state.root
+        self._cluster_children = None
+        self._streamed_children = None
+        self._pooled_observations = None
+        return await self.make_observation_async()
+
     def step(self, action: int) -> Tuple[Dict[str, np.ndarray], float, bool, dict]:
         """Steps the envirionment to a new state by taking an action. In the
         case of GraphEnv, the action specifies which next vertex to move to and
@@ -105,21 +248,82 @@ class GraphEnv(gym.Env):
                 a dictionary of debugging information related to this call
         """
 
-        if len(self.state.children) > self.max_num_children:
-            raise RuntimeError(
-                f"State {self.state} has {len(self.state.children)} children "
-                f"(> {self.max_num_children})"
-            )
+        if not self._take_action(action):
+            return self.make_observation(), 0.0, False, self._step_info()
+        return self._step_result(self.make_observation())
+
+    async def step_async(
+        self, action: int
+    ) -> Tuple[Dict[str, np.ndarray], float, bool, dict]:
+        """Steps the environment like step(), observing the new state with
+        make_observation_async().
+
+        Args:
+            action (int): The index of the child vertex of self.state to move to.
+
+        Raises:
+            RuntimeError: When action is an invalid index.
+
+        Returns:
+            Tuple[Dict[str, np.ndarray], float, bool, dict]: Same as step().
+        """
+        if not self._take_action(action):
+            observation = await self.make_observation_async()
+            return observation, 0.0, False, self._step_info()
+        return self._step_result(await self.make_observation_async())
+
+    def _take_action(self, action: int) -> bool:
+        """Moves the state to the vertex an action leads to, or records the
+        chosen cluster of a hierarchical action.
+
+        Args:
+            action (int): The index of the child vertex of self.state to move to.
+
+        Raises:
+            RuntimeError: When action is an invalid index.
+
+        Returns:
+            bool: False if the action chose a cluster and the state stays on the
+                same vertex until a child of the cluster is chosen, else True.
+        """
+        self._step_start = time.perf_counter()
+        num_actions = self._check_num_actions(self.state)
 
         if action not in self.action_space:
             raise RuntimeError(
                 f"Action {action} outside the action space of state {self.state}: "
-                f"{len(self.state.children)} max children"
+                f"{num_actions} max children"
             )
 
         try:
+            if (
+                self._num_observed_actions is not None
+                and action >= self._num_observed_actions
+            ):
+                raise IndexError(f"Action {action} was masked at the deadline")
+
+            if self._is_choosing_cluster():
+                cluster_children = self.state.cluster_children(action)
+                if len(cluster_children) > 1:
+                    # Stay on this vertex until a child of the cluster is chosen
+                    self._cluster_children = cluster_children
+                    self._streamed_children = None
+                    self._pooled_observations = None
+                    return False
+
             # Move the state to the next action
-            self.state = self.state.children[action]
+            pooled = self._pooled_observations
+            self.state = self._get_action_vertex(self.state, action)
+            self._cluster_children = None
+            self._streamed_children = None
+            self._pooled_observations = None
+            if pooled is not None and self.state._observation is None:
+                # Keep the observation a worker made of the new state
+                self.state._observation = space_util.read_observation(
+                    self.observation_space[self._vertex_observation_key],
+                    pooled,
+                    action + 1,
+                )
 
         except IndexError:
             warnings.warn(
@@ -130,19 +334,168 @@ class GraphEnv(gym.Env):
                 RuntimeWarning,
             )
 
+        return True
+
+    def _step_result(
+        self, observation: Dict[str, np.ndarray]
+    ) -> Tuple[Dict[str, np.ndarray], float, bool, dict]:
         result = (
-            self.make_observation(),
+            observation,
             self.state.reward,
             self.state.terminal,
-            self.state.info,
+            self._step_info(),
         )
         logger.debug(
             f"{type(self)}: {result[1]} {result[2]}, {result[3]},"
-            f" {len(self.state.children)}"
+            f" {self._num_actions(self.state)}"
         )
         return result
 
-    def make_observation(self) -> Dict[str, any]:
+    def _step_info(self) -> dict:
+        """
+        Returns:
+            dict: The state's info, with the number of children masked out at
+                the deadline under "truncated_children" if there is a
+                step_time_budget.
+        """
+        info = self.state.info
+        if self.step_time_budget is None:
+            return info
+        num_truncated = self._num_actions(self.state) - self._num_observed_actions
+        return {**info, "truncated_children": num_truncated}
+
+    @property
+    def truncation_rate(self) -> float:
+        """
+        Returns:
+            float: Fraction of the observations made with a step_time_budget
+                that masked out children left unobserved at the deadline.
+        """
+        return self.num_truncated_observations / max(self.num_observations, 1)
+
+    def close(self) -> None:
+        """Stops the observation worker processes, if any were started."""
+        if self._observation_pool is not None:
+            self._observation_pool.close()
+            self._observation_pool = None
+
+    def _get_observation_pool(self) -> "ObservationPool":
+        if self._observation_pool is None:
+            # Imported here as multiprocessing.shared_memory needs Python 3.8
+            from graphenv.observation_pool import ObservationPool
+
+            self._observation_pool = ObservationPool(
+                self.observation_space[self._vertex_observation_key],
+                self.observation_workers,
+                self.observation_chunk_size,
+            )
+        return self._observation_pool
+
+    def _get_deadline(self, vertex: V) -> Optional[float]:
+        """Gets the time by which the children of a vertex should be observed,
+        counting from the start of the current step for the current state, or
+        else from now.
+
+        Returns:
+            Optional[float]: time.perf_counter() deadline, or None if there is
+                no step_time_budget.
+        """
+        if self.step_time_budget is None:
+            return None
+        start = time.perf_counter()
+        if vertex is self.state and self._step_start is not None:
+            start = self._step_start
+            self._step_start = None
+        return start + self.step_time_budget
+
+    def _get_selected_children(self, vertex: V) -> Optional[List[V]]:
+        """Gets the verticies that the actions of a vertex lead to when they are
+        not simply its children: the representatives of its child clusters if
+        hierarchical_actions is set, the children of the chosen cluster while
+        completing a hierarchical action, or only the most promising children if
+        preselect_children is set.
+
+        Args:
+            vertex (V): vertex to get the actions of
+
+        Returns:
+            Optional[List[V]]: verticies indexed by action, or None if the
+                actions lead to the vertex's children
+        """
+        if self._cluster_children is not None and vertex is self.state:
+            return self._cluster_children
+        if self.hierarchical_actions:
+            representatives = vertex.cluster_representatives(self.max_num_children)
+            if representatives is not None:
+                return representatives
+        if self.preselect_children:
+            return vertex.top_children(self.max_num_children)
+        return None
+
+    def _get_action_vertices(self, vertex: V) -> List[V]:
+        """Gets the verticies that the actions of a vertex lead to.
+
+        Args:
+            vertex (V): vertex to get the actions of
+
+        Returns:
+            List[V]: verticies indexed by action
+        """
+        selected = self._get_selected_children(vertex)
+        return vertex.children if selected is None else selected
+
+    def _get_action_vertex(self, vertex: V, action: int) -> V:
+        """Gets the vertex a single action leads to, without creating the other
+        children where the vertex supports it.
+
+        Raises:
+            IndexError: When the action does not lead to a vertex.
+        """
+        streamed = self._streamed_children
+        if vertex is self.state and streamed is not None and action < len(streamed):
+            return streamed[action]
+        selected = self._get_selected_children(vertex)
+        return vertex.child(action) if selected is None else selected[action]
+
+    def _iter_action_vertices(self, vertex: V) -> Iterator[V]:
+        """Iterates over the verticies that the actions of a vertex lead to,
+        streaming them from the vertex when it is not memoizing its children."""
+        selected = self._get_selected_children(vertex)
+        return vertex.iter_children() if selected is None else iter(selected)
+
+    def _num_actions(self, vertex: V) -> int:
+        """Counts the valid actions of a vertex, without creating the children
+        where the vertex can count them cheaply."""
+        selected = self._get_selected_children(vertex)
+        return vertex.num_children if selected is None else len(selected)
+
+    def _check_num_actions(self, vertex: V) -> int:
+        """Counts the valid actions of a vertex.
+
+        Raises:
+            RuntimeError: When there are more than max_num_children of them.
+        """
+        num_actions = self._num_actions(vertex)
+        if num_actions > self.max_num_children:
+            raise RuntimeError(
+                f"State {vertex} has {num_actions} children "
+                f"(> {self.max_num_children})"
+            )
+        return num_actions
+
+    def _is_choosing_cluster(self) -> bool:
+        """
+        Returns:
+            bool: True if the actions of the current state choose among clusters
+                of its children.
+        """
+        return (
+            self.hierarchical_actions
+            and self._cluster_children is None
+            and self.state.cluster_representatives(self.max_num_children) is not None
+        )
+
+    def make_observation(self, vertex: Optional[V] = None) -> Dict[str, any]:
         """
         Makes an observation for this state which includes observations of
         each possible action, and the current state.
@@ -156,6 +509,11 @@ class GraphEnv(gym.Env):
         The current state is the 0th entry in these arrays, and the children
         are offset by one index to accomodate that.
 
+        Args:
+            vertex (V, optional): vertex to observe in place of the current
+                state, as when evaluating verticies during a search. Defaults to
+                self.state.
+
         Returns:
             Dict[str, any] : Dictionary consisting of {self._action_mask_key : bool
                 action mask Numpy array, self._vertex_observation_key : stacked vertex
@@ -163,18 +521,102 @@ class GraphEnv(gym.Env):
 
         """
 
-        num_children = 1 + self.max_num_children
-        action_mask = np.zeros(num_children, dtype=bool)
-        action_observations = [self.state.observation] * num_children
+        if vertex is None:
+            vertex = self.state
+        if vertex is self.state:
+            self._streamed_children = None
+            self._pooled_observations = None
+
+        num_actions = self._check_num_actions(vertex)
+
+        # Write the observations straight into the stacked arrays, all at once
+        # for verticies describing their children as a batch, in worker
+        # processes for wide expansions if configured, with the arrays in
+        # shared memory, or else streaming them child by child. Masked rows
+        # repeat the vertex's own observation.
+        space = self.observation_space[self._vertex_observation_key]
+        batch = None
+        if num_actions > 0 and self._get_selected_children(vertex) is None:
+            batch = vertex.children_batch
+        pooled = (
+            batch is None
+            and self.observation_workers is not None
+            and num_actions > self.observation_chunk_size
+        )
 
-        for i, successor in enumerate(self.state.children):
-            action_observations[i + 1] = successor.observation
-            action_mask[i + 1] = True
+        if pooled:
+            shared_buffer = self._get_observation_pool().create_buffer()
+            vertex_observations = shared_buffer.arrays
+        else:
+            vertex_observations = space_util.create_buffer(space)
+        space_util.write_observation(space, vertex_observations, 0, vertex.observation)
+
+        if batch is not None:
+            rows = slice(1, num_actions + 1)
+            space_util.write_observation(
+                space, vertex_observations, rows, batch.observations
+            )
+        elif pooled:
+            successors = self._get_action_vertices(vertex)
+            self._get_observation_pool().observe(successors, shared_buffer, offset=1)
+            if vertex is self.state:
+                self._streamed_children = list(successors)
+                self._pooled_observations = vertex_observations
+        else:
+            deadline = self._get_deadline(vertex)
+            streamed = []
+            for i, successor in enumerate(self._iter_action_vertices(vertex)):
+                if deadline is not None and i > 0 and time.perf_counter() > deadline:
+                    num_actions = i
+                    break
+                space_util.write_observation(
+                    space, vertex_observations, i + 1, successor.observation
+                )
+                streamed.append(successor)
+            if vertex is self.state:
+                self._streamed_children = streamed
+        for i in range(num_actions + 1, 1 + self.max_num_children):
+            space_util.write_observation(
+                space, vertex_observations, i, vertex.observation
+            )
+
+        action_mask = np.zeros(1 + self.max_num_children, dtype=bool)
+        action_mask[1 : num_actions + 1] = True
+
+        if vertex is self.state and self.step_time_budget is not None:
+            self._num_observed_actions = num_actions
+            self.num_observations += 1
+            if num_actions < self._num_actions(vertex):
+                self.num_truncated_observations += 1
 
         return {
             self._action_mask_key: action_mask,
-            self._vertex_observation_key: space_util.stack_observations(
-                self.observation_space[self._vertex_observation_key],
-                action_observations,
-            ),
+            self._vertex_observation_key: vertex_observations,
         }
+
+    async def make_observation_async(
+        self, vertex: Optional[V] = None
+    ) -> Dict[str, any]:
+        """
+        Makes the same observation as make_observation(), first awaiting the
+        children and the observations of verticies that are AsyncVertex
+        instances. The observations of the vertex and all of its action
+        verticies are awaited concurrently, at most max_concurrency at a time.
+
+        Args:
+            vertex (V, optional): vertex to observe in place of the current
+                state. Defaults to self.state.
+
+        Returns:
+            Dict[str, any] : Same as make_observation()
+        """
+        if vertex is None:
+            vertex = self.state
+
+        if isinstance(vertex, AsyncVertex):
+            await vertex.children_async()
+        self._check_num_actions(vertex)
+        await gather_observations(
+            [vertex, *self._get_action_vertices(vertex)], self.max_concurrency
+        )
+        return self.make_observation(vertex)
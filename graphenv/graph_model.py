@@ -102,10 +102,9 @@ class GraphModel:
         observation = input_dict["obs"]
 
         vertex_observations = observation[self._vertex_observation_key]
-        flattened_observations = space_util.flatten_first_dim(vertex_observations)
 
         # flat_values is structured like this: (vertex values, vertex weights)
-        flat_values = self.forward_vertex(flattened_observations)
+        flat_values = self._forward_vertices(vertex_observations)
 
         action_mask = observation[self._action_mask_key]
 
@@ -164,6 +163,29 @@ class GraphModel:
         """
         pass
 
+    def _forward_vertices(
+        self,
+        vertex_observations: GraphModelObservation,
+    ) -> Tuple[tf.Tensor, tf.Tensor]:
+        """Forward method evaluating every vertex of a batch of observations, as
+        laid out by GraphEnv: a batch dimension followed by the current vertex and
+        its max_num_children action verticies.
+
+        The default implementation flattens the first two dimensions and evaluates
+        each vertex independently with forward_vertex(). Subclasses can override
+        this to share work between the verticies of a single observation, for
+        example by encoding a graph common to all of them only once.
+
+        Args:
+            vertex_observations: stacked per-vertex observations
+
+        Returns:
+            (value tensor, weight tensor) holding one entry per vertex, in
+            flattened (batch * (1 + max_num_children)) order
+        """
+        flattened_observations = space_util.flatten_first_dim(vertex_observations)
+        return self.forward_vertex(flattened_observations)
+
     def _forward_total_value(self):
         """Forward method computing the value assesment of the current state,
         as returned by the value_function() method.
@@ -0,0 +1,278 @@
+import logging
+import math
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import graphenv.space_util as space_util
+from graphenv import tf
+from graphenv.graph_env import GraphEnv
+from graphenv.graph_model import GraphModel
+from graphenv.vertex import V
+
+logger = logging.getLogger(__name__)
+
+
+class _Node:
+    """Search statistics of a vertex in the tree. The tree follows the
+    memoized children (the action verticies of GraphEnv) of each expanded
+    vertex, so child nodes are created only once they are visited.
+
+    Attributes:
+        vertex: the vertex
+        actions: verticies the actions of the vertex lead to
+        children: child nodes, None until the child is first visited
+        prior: policy prior of each child
+        rewards: reward of moving to each child
+        visits: visit count of each child
+        value_sum: sum of the returns backed up through each child
+        virtual_visits: in-flight simulations through each child
+        pending: whether the vertex is waiting to be evaluated
+    """
+
+    def __init__(self, vertex: V) -> None:
+        self.vertex = vertex
+        self.actions: Optional[List[V]] = None
+        self.children: Optional[List[Optional["_Node"]]] = None
+        self.prior: Optional[np.ndarray] = None
+        self.rewards: Optional[np.ndarray] = None
+        self.visits: Optional[np.ndarray] = None
+        self.value_sum: Optional[np.ndarray] = None
+        self.virtual_visits: Optional[np.ndarray] = None
+        self.pending = False
+
+    @property
+    def expanded(self) -> bool:
+        return self.children is not None
+
+    def expand(self, actions: List[V], prior: np.ndarray) -> None:
+        self.actions = actions
+        self.children = [None] * len(actions)
+        self.prior = prior
+        self.rewards = np.array([child.reward for child in actions], dtype=float)
+        self.visits = np.zeros(len(actions))
+        self.value_sum = np.zeros(len(actions))
+        self.virtual_visits = np.zeros(len(actions))
+
+    def child(self, action: int) -> "_Node":
+        if self.children[action] is None:
+            self.children[action] = _Node(self.actions[action])
+        return self.children[action]
+
+
+class _MinMax:
+    """Tracks the range of action values seen in a tree, used to normalize
+    them into [0, 1] regardless of the scale of the rewards."""
+
+    def __init__(self) -> None:
+        self.minimum = np.inf
+        self.maximum = -np.inf
+
+    def update(self, value: float) -> None:
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def normalize(self, values: np.ndarray) -> np.ndarray:
+        if self.maximum > self.minimum:
+            return (values - self.minimum) / (self.maximum - self.minimum)
+        return values
+
+
+class MCTS:
+    """AlphaZero-style Monte Carlo tree search over verticies, guided by a
+    GraphModel.
+
+    Leaves are evaluated with the model's forward() on GraphEnv observations:
+    the softmax of the action_weights gives the priors of the leaf's children,
+    and value_function() gives the leaf value, so models using
+    GraphModelBellmanMixin back up the max over the children's values.
+
+    Simulations are run in rounds. In each round, batch_size simulations descend
+    every tree, with virtual loss steering concurrent simulations of a tree
+    apart, and all the leaves they reach, across all trees, are evaluated in a
+    single forward pass of the model.
+
+    Attributes:
+        env: environment defining the observation layout
+        model: model evaluating the leaves
+        num_simulations: simulations per search
+        batch_size: simulations per tree evaluated together
+        c_puct: exploration constant
+        gamma: discount factor
+        virtual_loss: normalized value penalty of an in-flight simulation
+    """
+
+    def __init__(
+        self,
+        env: GraphEnv,
+        model: GraphModel,
+        num_simulations: int = 64,
+        batch_size: int = 8,
+        c_puct: float = 1.25,
+        gamma: float = 1.0,
+        virtual_loss: float = 1.0,
+    ) -> None:
+        """Initializes an MCTS planner.
+
+        Args:
+            env: GraphEnv whose observation space and max_num_children define
+                the observations passed to the model.
+            model: GraphModel used to evaluate leaves.
+            num_simulations: Number of simulations per search. Defaults to 64.
+            batch_size: Number of simulations of each tree whose leaves are
+                evaluated together. Defaults to 8.
+            c_puct: Weight of the prior-driven exploration term. Defaults to
+                1.25.
+            gamma: Discount factor. Defaults to 1.0.
+            virtual_loss: Penalty, in normalized value units, applied to each
+                in-flight simulation through an action. Defaults to 1.0.
+        """
+        self.env = env
+        self.model = model
+        self.num_simulations = num_simulations
+        self.batch_size = batch_size
+        self.c_puct = c_puct
+        self.gamma = gamma
+        self.virtual_loss = virtual_loss
+
+    def _evaluate(self, nodes: Sequence[_Node]) -> np.ndarray:
+        """Expands a batch of nodes with a single model forward pass, returning
+        their values."""
+        actions = [self.env._get_action_vertices(node.vertex) for node in nodes]
+        for node, node_actions in zip(nodes, actions):
+            if len(node_actions) > self.env.max_num_children:
+                raise RuntimeError(
+                    f"State {node.vertex} has {len(node_actions)} children "
+                    f"(> {self.env.max_num_children})"
+                )
+
+        observations = space_util.stack_observations(
+            self.env.observation_space,
+            [self.env.make_observation(node.vertex) for node in nodes],
+        )
+        self.model.forward(
+            {"obs": tf.nest.map_structure(tf.convert_to_tensor, observations)},
+            [],
+            None,
+        )
+        weights = np.asarray(self.model.action_weights, dtype=float)
+        values = np.asarray(self.model.value_function(), dtype=float).reshape(-1)
+
+        for node, node_actions, node_weights in zip(nodes, actions, weights):
+            node_weights = node_weights[: len(node_actions)]
+            prior = np.exp(node_weights - node_weights.max(initial=-np.inf))
+            node.expand(node_actions, prior / max(prior.sum(), np.finfo(float).tiny))
+            node.pending = False
+        return values
+
+    def _select(self, node: _Node, bounds: _MinMax) -> int:
+        visits = node.visits + node.virtual_visits
+        q = np.zeros(len(visits))
+        visited = node.visits > 0
+        q[visited] = bounds.normalize(node.value_sum[visited] / node.visits[visited])
+        q = np.divide(
+            node.visits * q - self.virtual_loss * node.virtual_visits,
+            visits,
+            out=np.zeros_like(q),
+            where=visits > 0,
+        )
+        u = self.c_puct * node.prior * math.sqrt(max(visits.sum(), 1)) / (1 + visits)
+        return int(np.argmax(q + u))
+
+    def _descend(
+        self, root: _Node, bounds: _MinMax
+    ) -> Tuple[List[Tuple[_Node, int]], _Node]:
+        """Walks down from root to a leaf, adding virtual visits along the way."""
+        path = []
+        node = root
+        while node.expanded and not node.vertex.terminal:
+            action = self._select(node, bounds)
+            node.virtual_visits[action] += 1
+            path.append((node, action))
+            node = node.child(action)
+        return path, node
+
+    def _backup(
+        self, path: List[Tuple[_Node, int]], value: float, bounds: _MinMax
+    ) -> None:
+        for node, action in reversed(path):
+            value = node.rewards[action] + self.gamma * value
+            node.virtual_visits[action] -= 1
+            node.visits[action] += 1
+            node.value_sum[action] += value
+            bounds.update(value)
+
+    def search(self, roots: Sequence[V]) -> List[np.ndarray]:
+        """Runs num_simulations simulations from each root.
+
+        Args:
+            roots: Verticies to search from, e.g. the current states of several
+                environments.
+
+        Returns:
+            For each root, the visit count of each of its children, empty for
+            terminal roots.
+        """
+        trees = [_Node(root) for root in roots]
+        bounds = [_MinMax() for _ in roots]
+        expandable = [tree for tree in trees if not tree.vertex.terminal]
+        if expandable:
+            self._evaluate(expandable)
+
+        num_rounds = -(-self.num_simulations // self.batch_size)
+        for i in range(num_rounds):
+            round_size = min(
+                self.batch_size, self.num_simulations - i * self.batch_size
+            )
+            leaves, paths = [], []
+            for tree, tree_bounds in zip(trees, bounds):
+                if tree.vertex.terminal:
+                    continue
+                for _ in range(round_size):
+                    path, leaf = self._descend(tree, tree_bounds)
+                    if leaf.vertex.terminal:
+                        self._backup(path, 0.0, tree_bounds)
+                        continue
+                    if not leaf.pending:
+                        leaf.pending = True
+                        leaves.append(leaf)
+                    paths.append((path, leaf, tree_bounds))
+
+            if leaves:
+                values = dict(zip(map(id, leaves), self._evaluate(leaves)))
+                for path, leaf, tree_bounds in paths:
+                    self._backup(path, values[id(leaf)], tree_bounds)
+
+            logger.debug(f"mcts round {i}: evaluated {len(leaves)} leaves")
+
+        return [
+            tree.visits if tree.expanded else np.zeros(0, dtype=float)
+            for tree in trees
+        ]
+
+    def act(self, roots: Sequence[V], temperature: float = 0.0) -> List[int]:
+        """Searches from each root and picks an action for each.
+
+        Args:
+            roots: Verticies to act from.
+            temperature: Sampling temperature over the visit counts. Defaults to
+                0, which picks the most visited action.
+
+        Raises:
+            ValueError: If a root is terminal, with no actions to choose from.
+
+        Returns:
+            The chosen action (child index) of each root.
+        """
+        terminal = [i for i, root in enumerate(roots) if root.terminal]
+        if terminal:
+            raise ValueError(f"Cannot act from terminal roots {terminal}")
+
+        actions = []
+        for visits in self.search(roots):
+            if temperature == 0:
+                actions.append(int(np.argmax(visits)))
+            else:
+                probs = visits ** (1 / temperature)
+                actions.append(int(np.random.choice(len(probs), p=probs / probs.sum())))
+        return actions
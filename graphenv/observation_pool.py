@@ -0,0 +1,176 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Sequence, Tuple
+
+import gym
+import numpy as np
+
+import graphenv.space_util as space_util
+from graphenv.shared_arrays import SharedArray, _attach
+from graphenv.vertex import Vertex
+
+
+class SharedObservationBuffer:
+    """Buffer from space_util.create_buffer() whose arrays live in shared
+    memory, one block per array. Pickling the buffer only sends the space and
+    the names of the blocks, and unpickling it attaches to the same blocks, so
+    observations written by another process are visible without copies.
+
+    The arrays of a new buffer are plain arrays, pickled by value, that keep
+    their blocks alive: the blocks are freed once the arrays are garbage
+    collected, so a buffer can be returned as an observation and outlive the
+    pool that filled it.
+
+    Attributes:
+        space: space the buffer was created for
+        arrays: the buffer, with the structure of create_buffer(space)
+    """
+
+    def __init__(self, space: gym.spaces.Space, names: Optional[List[str]] = None):
+        """Creates new shared memory blocks for a space, or attaches to
+        existing ones.
+
+        Args:
+            space (gym.spaces.Space): space to create the buffer for
+            names (List[str], optional): names of the blocks to attach to, as
+                given by the names property of the buffer that created them.
+                Defaults to None, which creates new blocks.
+        """
+        self.space = space
+        self._owner = names is None
+        self._blocks: List[SharedMemory] = []
+        block_names = iter(names or [])
+
+        def allocate(shape: Tuple[int], dtype: np.dtype) -> np.ndarray:
+            if self._owner:
+                shared = SharedArray(shape, dtype)
+                self._blocks.append(shared._block)
+                return shared.view(np.ndarray)
+            block = _attach(next(block_names))
+            self._blocks.append(block)
+            return np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+        self.arrays = space_util.create_buffer(space, allocate)
+
+    @property
+    def names(self) -> List[str]:
+        """
+        Returns:
+            List[str]: Names of the shared memory blocks, in allocation order.
+        """
+        return [block.name for block in self._blocks]
+
+    def __reduce__(self):
+        return self.__class__, (self.space, self.names)
+
+    def close(self) -> None:
+        """Detaches from the shared memory blocks of a buffer attached to them.
+        The blocks of a new buffer are freed once its arrays are no longer
+        referenced."""
+        self.arrays = None
+        if not self._owner:
+            for block in self._blocks:
+                block.close()
+        self._blocks = []
+
+
+# Space of the buffers observed into by each worker process, set when the worker
+# starts, and the buffer the worker is attached to
+_worker_space: Optional[gym.spaces.Space] = None
+_worker_buffer: Optional[SharedObservationBuffer] = None
+
+
+def _start_worker(space: gym.spaces.Space) -> None:
+    global _worker_space
+    _worker_space = space
+
+
+def _observe_chunk(names: List[str], start: int, vertices: Sequence[Vertex]) -> None:
+    global _worker_buffer
+    if _worker_buffer is None or _worker_buffer.names != names:
+        if _worker_buffer is not None:
+            _worker_buffer.close()
+        _worker_buffer = SharedObservationBuffer(_worker_space, names)
+    for i, vertex in enumerate(vertices):
+        space_util.write_observation(
+            _worker_space, _worker_buffer.arrays, start + i, vertex.observation
+        )
+
+
+class ObservationPool:
+    """Observes verticies in a pool of worker processes, for verticies whose
+    _make_observation() is CPU-bound. The verticies are sent to the workers in
+    chunks, and the workers write their observations straight into the rows of
+    a buffer in shared memory, laid out from the broadcast observation space, so
+    only the verticies are pickled and the observations are neither pickled nor
+    copied.
+
+    Observations made in the workers are not memoized on the verticies of the
+    calling process, though they can be read back from the buffer with
+    space_util.read_observation().
+    """
+
+    def __init__(
+        self,
+        space: gym.spaces.Space,
+        num_workers: Optional[int] = None,
+        chunk_size: int = 16,
+        mp_context: Optional[str] = None,
+    ) -> None:
+        """Starts the worker processes.
+
+        Args:
+            space (gym.spaces.Space): broadcast observation space, with one row
+                per observation, as given by space_util.broadcast_space()
+            num_workers (int, optional): number of worker processes. Defaults
+                to None, one per CPU.
+            chunk_size (int, optional): number of verticies sent to a worker at
+                a time. Defaults to 16.
+            mp_context (str, optional): multiprocessing start method of the
+                workers. Defaults to None, the platform's default.
+        """
+        self.space = space
+        self.chunk_size = chunk_size
+        self._executor = ProcessPoolExecutor(
+            num_workers,
+            mp_context=multiprocessing.get_context(mp_context),
+            initializer=_start_worker,
+            initargs=(space,),
+        )
+
+    def create_buffer(self) -> SharedObservationBuffer:
+        """Creates a buffer in shared memory for observe() to write into.
+
+        Returns:
+            SharedObservationBuffer: A new buffer for the pool's space.
+        """
+        return SharedObservationBuffer(self.space)
+
+    def observe(
+        self, vertices: Sequence[Vertex], buffer: SharedObservationBuffer, offset=0
+    ) -> None:
+        """Observes verticies into consecutive rows of a buffer.
+
+        Args:
+            vertices (Sequence[Vertex]): verticies to observe
+            buffer (SharedObservationBuffer): buffer from create_buffer() to
+                write the observations into
+            offset (int, optional): row of the first vertex. Defaults to 0.
+        """
+        names = buffer.names
+        futures = [
+            self._executor.submit(
+                _observe_chunk,
+                names,
+                offset + start,
+                list(vertices[start : start + self.chunk_size]),
+            )
+            for start in range(0, len(vertices), self.chunk_size)
+        ]
+        for future in futures:
+            future.result()
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+        self._executor.shutdown()
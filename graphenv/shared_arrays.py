@@ -0,0 +1,129 @@
+"""Arrays in POSIX shared memory that are pickled by reference.
+
+Vertices and env_config entries are pickled to every worker process, e.g. to
+every rllib rollout worker, and each worker would hold its own copy of the
+graph data they reference. Publishing that data once with share_array() gives
+arrays that pickle as the name of their shared memory block, so unpickling them
+in another process on the same machine maps the same memory without copying it,
+and per-worker memory stays flat as the number of workers grows.
+
+multiprocessing.shared_memory needs Python 3.8, so other graphenv modules only
+import this module in the methods that share arrays.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import weakref
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+# Names of the blocks created by this process
+_created = set()
+_attach_lock = threading.Lock()
+
+
+def _attach(name: str) -> SharedMemory:
+    """Attaches to a shared memory block without registering it with this
+    process's resource tracker, which would free the block when this process
+    exits, as only the creating process may free it.
+
+    Before Python 3.13, attaching always registers the block, so it is
+    unregistered again unless the tracker is that of the creating process:
+    when this process created the block, or is a multiprocessing child, such
+    as an ObservationPool worker, sharing the tracker of the parent that did.
+    """
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    with _attach_lock:
+        block = SharedMemory(name=name)
+        if (
+            os.name == "posix"
+            and name not in _created
+            and multiprocessing.parent_process() is None
+        ):
+            resource_tracker.unregister(block._name, "shared_memory")
+    return block
+
+
+def _unlink(block: SharedMemory) -> None:
+    _created.discard(block.name)
+    block.unlink()
+
+
+class SharedArray(np.ndarray):
+    """An array backed by a shared memory block, pickled as a reference to
+    that block.
+
+    Only the array created on a block is pickled by reference. Arrays derived
+    from it, such as slices or the results of arithmetic, are pickled by value
+    like any other array.
+
+    The process that creates a block frees it once the array it created is
+    garbage collected, or when that process exits, so the creating process
+    should keep the array alive while other processes may still attach to it.
+    """
+
+    def __new__(
+        cls, shape: Tuple[int, ...], dtype: np.dtype, name: Optional[str] = None
+    ) -> "SharedArray":
+        """Creates a zero-filled array in a new shared memory block, or
+        attaches to an existing block.
+
+        Args:
+            shape (Tuple[int, ...]): shape of the array
+            dtype (np.dtype): type of the array
+            name (str, optional): name of the block to attach to. Defaults to
+                None, which creates a new block.
+
+        Returns:
+            SharedArray: the array
+        """
+        dtype = np.dtype(dtype)
+        if name is None:
+            size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            block = SharedMemory(create=True, size=size)
+            _created.add(block.name)
+        else:
+            block = _attach(name)
+
+        array = super().__new__(cls, shape, dtype, buffer=block.buf)
+        array._block = block
+        if name is None:
+            weakref.finalize(array, _unlink, block)
+        return array
+
+    def __array_finalize__(self, obj) -> None:
+        self._block = None
+
+    def __reduce_ex__(self, protocol):
+        if self._block is None:
+            return np.asarray(self).__reduce_ex__(protocol)
+        return SharedArray, (self.shape, self.dtype.str, self._block.name)
+
+    @property
+    def name(self) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: Name of the shared memory block, or None for arrays
+                derived from a shared array.
+        """
+        return None if self._block is None else self._block.name
+
+
+def share_array(array: np.ndarray) -> SharedArray:
+    """Copies an array into a new shared memory block.
+
+    Args:
+        array (np.ndarray): array to copy
+
+    Returns:
+        SharedArray: the shared copy
+    """
+    shared = SharedArray(np.shape(array), np.asarray(array).dtype)
+    shared[...] = array
+    return shared
@@ -1,12 +1,11 @@
 import collections
-from functools import singledispatch
-from typing import Tuple
+import sys
+from functools import lru_cache, singledispatch
+from typing import Callable, Tuple, Union
 
 import gym.spaces as spaces
 import numpy as np
 
-from graphenv import tf
-
 
 @singledispatch
 def broadcast_space(target: spaces.Space, prefix_shape: Tuple[int]):
@@ -124,6 +123,129 @@ def _(space: spaces.Dict, space_values):
     }
 
 
+def _zeros(shape: Tuple[int], dtype: np.dtype) -> np.ndarray:
+    return np.zeros(shape, dtype=dtype)
+
+
+@singledispatch
+def create_buffer(
+    space: spaces.Space,
+    allocate: Callable[[Tuple[int], np.dtype], np.ndarray] = _zeros,
+):
+    """Allocates zero-filled arrays matching the structure, shape and dtype of a
+    space, for instance a space from broadcast_space(), so that observations can
+    be written into them row by row with write_observation().
+
+    Args:
+        space (spaces.Space): space to allocate a buffer for
+        allocate (Callable, optional): function allocating an array given its
+            shape and dtype, for instance in shared memory. Defaults to
+            allocating zero-filled arrays.
+
+    Raises:
+        NotImplementedError: If the space is or contains an unsupported type.
+
+    Returns:
+        A recursively allocated buffer matching the space.
+    """
+    raise NotImplementedError(f"Unsupported space, {space}.")
+
+
+@create_buffer.register(spaces.Box)
+@create_buffer.register(spaces.MultiBinary)
+@create_buffer.register(spaces.MultiDiscrete)
+def _(space, allocate=_zeros):
+    return allocate(space.shape, space.dtype)
+
+
+@create_buffer.register(spaces.Tuple)
+def _(space: spaces.Tuple, allocate=_zeros):
+    return tuple((create_buffer(s, allocate) for s in space.spaces))
+
+
+@create_buffer.register(spaces.Dict)
+def _(space: spaces.Dict, allocate=_zeros):
+    return {k: create_buffer(s, allocate) for k, s in space.spaces.items()}
+
+
+@singledispatch
+def write_observation(
+    space: spaces.Space, buffer, index: Union[int, slice], value
+) -> None:
+    """Writes a single observation into one row of a buffer from create_buffer(),
+    so that writing every row gives the same result as stack_observations().
+    Given a slice, writes already stacked observations into a range of rows.
+
+    Args:
+        space (spaces.Space): space the buffer was created for
+        buffer: buffer to write into
+        index (Union[int, slice]): row, or range of rows, to write
+        value: observation to write, matching the unbroadcast space, or stacked
+            observations with one entry per row of the slice
+
+    Raises:
+        NotImplementedError: If the space is or contains an unsupported type.
+    """
+    raise NotImplementedError(f"Unsupported space, {space}.")
+
+
+@write_observation.register(spaces.Box)
+@write_observation.register(spaces.MultiBinary)
+@write_observation.register(spaces.MultiDiscrete)
+def _(space, buffer, index: Union[int, slice], value) -> None:
+    buffer[index] = value
+
+
+@write_observation.register(spaces.Tuple)
+def _(space: spaces.Tuple, buffer, index: Union[int, slice], value) -> None:
+    for i, s in enumerate(space.spaces):
+        write_observation(s, buffer[i], index, value[i])
+
+
+@write_observation.register(spaces.Dict)
+def _(space: spaces.Dict, buffer, index: Union[int, slice], value) -> None:
+    for k, s in space.spaces.items():
+        write_observation(s, buffer[k], index, value[k])
+
+
+@singledispatch
+def read_observation(space: spaces.Space, buffer, index: int):
+    """Copies a single observation out of one row of a buffer from
+    create_buffer(), the inverse of write_observation().
+
+    Args:
+        space (spaces.Space): space the buffer was created for
+        buffer: buffer to read from
+        index (int): row to read
+
+    Raises:
+        NotImplementedError: If the space is or contains an unsupported type.
+
+    Returns:
+        The observation, with the dtypes of the buffer.
+    """
+    raise NotImplementedError(f"Unsupported space, {space}.")
+
+
+@read_observation.register(spaces.Box)
+@read_observation.register(spaces.MultiBinary)
+@read_observation.register(spaces.MultiDiscrete)
+def _(space, buffer, index: int):
+    return buffer[index].copy()
+
+
+@read_observation.register(spaces.Tuple)
+def _(space: spaces.Tuple, buffer, index: int):
+    return tuple(
+        read_observation(s, buffer[i], index) for i, s in enumerate(space.spaces)
+    )
+
+
+@read_observation.register(spaces.Dict)
+def _(space: spaces.Dict, buffer, index: int):
+    return {k: read_observation(s, buffer[k], index) for k, s in space.spaces.items()}
+
+
 @singledispatch
 def flatten_first_dim(target: any):
     r"""
@@ -144,11 +266,39 @@ def flatten_first_dim(target: any):
     Returns:
         A recursively reshaped value object.
     """
+    if _is_tensor(target):
+        return _flatten_tensor_first_dim()(target)
     raise NotImplementedError(f"Unsupported target, {target}.")
 
 
+def _is_tensor(target: any) -> bool:
+    """Checks for TensorFlow tensors without importing TensorFlow, which is
+    necessarily imported already if target is a tensor."""
+    tf = sys.modules.get("tensorflow")
+    return tf is not None and isinstance(target, tf.Tensor)
+
+
+@lru_cache(maxsize=None)
+def _flatten_tensor_first_dim():
+    from graphenv import tf
+
+    @tf.function
+    def flatten(target: tf.Tensor):
+        shape = tf.shape(target)
+        dest_shape = [shape[0] * shape[1]]
+        for i in range(2, len(shape)):
+            dest_shape += [shape[i]]
+
+        return tf.reshape(target, dest_shape)
+
+    return flatten
+
+
 @flatten_first_dim.register(collections.abc.Iterable)
 def _(target: collections.abc.Iterable):
+    # Tensors are iterable, but are reshaped like arrays
+    if _is_tensor(target):
+        return _flatten_tensor_first_dim()(target)
     return [flatten_first_dim(e) for e in target]
 
 
@@ -159,17 +309,6 @@ def _(target: collections.abc.Mapping):
     )
 
 
-@flatten_first_dim.register(tf.Tensor)
-@tf.function
-def _(target: tf.Tensor):
-    shape = tf.shape(target)
-    dest_shape = [shape[0] * shape[1]]
-    for i in range(2, len(shape)):
-        dest_shape += [shape[i]]
-
-    return tf.reshape(target, dest_shape)
-
-
 @flatten_first_dim.register(np.ndarray)
 def _(target: np.ndarray):
     shape = np.shape(target)
@@ -0,0 +1,127 @@
+"""Registry of state factories, so that GraphEnv can build its state from a
+factory name and a few arguments.
+
+Passing env_config["state"] sends a constructed vertex, with its graph, from
+the driver to every rollout worker. Passing env_config["state_factory"] and
+env_config["state_config"] instead only sends a name and the factory's
+arguments, such as a number of nodes and a seed, and each worker builds its
+own state, once per process and arguments. Every env gets a copy of that state,
+sharing its instance data but not the children or observations it memoizes.
+
+Factories are registered with register_state(), or named by their import path
+as "module:attribute", which workers can resolve without registering them.
+"""
+import copy
+import importlib
+import inspect
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional, Union
+
+from graphenv.vertex import Vertex
+
+logger = logging.getLogger(__name__)
+
+_factories: Dict[str, Union[str, Callable[..., Vertex]]] = {
+    "hallway": "graphenv.examples.hallway.hallway_state:HallwayState",
+    "tsp": "graphenv.examples.tsp.tsp_state:TSPState.from_seed",
+    "tsp_nfp": "graphenv.examples.tsp.tsp_nfp_state:TSPNFPState.from_seed",
+}
+_cache: Dict[Hashable, Vertex] = {}
+
+
+def register_state(name: str, factory: Callable[..., Vertex]) -> None:
+    """Registers a state factory under a name.
+
+    Args:
+        name (str): name of the factory
+        factory (Callable[..., Vertex]): function building a state from the
+            keyword arguments of env_config["state_config"]
+    """
+    _factories[name] = factory
+
+
+def _resolve(path: str) -> Callable[..., Vertex]:
+    module_name, _, attributes = path.partition(":")
+    factory = importlib.import_module(module_name)
+    for attribute in attributes.split("."):
+        factory = getattr(factory, attribute)
+    return factory
+
+
+def get_state_factory(name: str) -> Callable[..., Vertex]:
+    """Gets a registered state factory, or the factory at an import path.
+
+    Args:
+        name (str): registered name, or "module:attribute" import path
+
+    Raises:
+        ValueError: If the name is neither registered nor an import path.
+
+    Returns:
+        Callable[..., Vertex]: The state factory.
+    """
+    factory = _factories.get(name, name)
+    if isinstance(factory, str):
+        if ":" not in factory:
+            raise ValueError(f"Unknown state factory {name}")
+        factory = _resolve(factory)
+    return factory
+
+
+def _is_deterministic(factory: Callable[..., Vertex], config: Dict[str, Any]) -> bool:
+    """Returns whether a factory builds the same state on every call with the
+    given arguments: it takes no seed argument, or is given a seed."""
+    if config.get("seed") is not None:
+        return True
+    if "seed" in config:
+        return False
+    try:
+        parameter = inspect.signature(factory).parameters.get("seed")
+    except (TypeError, ValueError):  # no signature, e.g. some builtins
+        return True
+    return parameter is None or parameter.default is not None
+
+
+def make_state(
+    name: str, config: Optional[Dict[str, Any]] = None, cache: bool = True
+) -> Vertex:
+    """Builds a state with a state factory.
+
+    Args:
+        name (str): registered name, or "module:attribute" import path, of the
+            factory
+        config (Dict[str, Any], optional): keyword arguments of the factory.
+            Defaults to None, no arguments.
+        cache (bool, optional): whether to copy the state built by an earlier
+            call with the same name and arguments in this process, rather than
+            building it again. Copies share the instance data of the cached
+            state, such as its graph, but none of the children or observations
+            it memoizes. Only arguments with hashable values are cached, and
+            states built with a seed of None are not, as each call draws a new
+            instance. Defaults to True.
+
+    Raises:
+        ValueError: If the factory is unknown.
+
+    Returns:
+        Vertex: The state.
+    """
+    config = config or {}
+    factory = get_state_factory(name)
+    key = None
+    if cache and _is_deterministic(factory, config):
+        try:
+            key = (name, frozenset(config.items()))
+            hash(key)
+        except TypeError:
+            key = None
+
+    if key is not None and key in _cache:
+        return copy.copy(_cache[key])
+
+    logger.debug(f"building state {name} with {config}")
+    state = factory(**config)
+    if key is not None:
+        _cache[key] = state
+        state = copy.copy(state)
+    return state
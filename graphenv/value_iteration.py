@@ -0,0 +1,72 @@
+import logging
+from typing import Tuple
+
+import numpy as np
+
+from graphenv.csr_graph import CSRGraph
+
+logger = logging.getLogger(__name__)
+
+
+def value_iteration(
+    graph: CSRGraph,
+    gamma: float = 1.0,
+    tol: float = 1e-9,
+    max_iterations: int = 10000,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Computes optimal vertex values and a greedy optimal policy for an
+    explicit graph with vectorized value iteration.
+
+    The value of a vertex is the best sum of discounted rewards collected by
+    moving to successive children until a terminal vertex is reached:
+    ``V[i] = max_c rewards[c] + gamma * V[c]`` over the children c of i, with
+    terminal vertices and vertices without children worth 0. These are the
+    quantities estimated by GraphModel (and by GraphModelBellmanMixin, which
+    takes the max over the children's values).
+
+    Args:
+        graph: The graph, e.g. from graphenv.csr_graph.enumerate_graph.
+        gamma: Discount factor. Defaults to 1.0.
+        tol: Convergence threshold on the largest value change. Defaults to
+            1e-9.
+        max_iterations: Maximum number of sweeps. Defaults to 10000.
+
+    Returns:
+        (values, policy) arrays of length num_vertices. policy[i] is the action,
+        i.e. the position among vertex i's children, of an optimal move, or -1
+        for vertices without a move.
+    """
+    degree = graph.degree
+    expandable = (degree > 0) & ~np.asarray(graph.terminal)
+    starts = np.asarray(graph.indptr[:-1])[degree > 0]
+    indices = np.asarray(graph.indices)
+    child_rewards = np.asarray(graph.rewards)[indices]
+
+    values = np.zeros(graph.num_vertices)
+    q_values = child_rewards
+    for iteration in range(max_iterations):
+        q_values = child_rewards + gamma * values[indices]
+        best = np.zeros(graph.num_vertices)
+        if len(starts):
+            best[degree > 0] = np.maximum.reduceat(q_values, starts)
+        best[~expandable] = 0.0
+
+        delta = np.max(np.abs(best - values), initial=0.0)
+        values = best
+        if delta <= tol:
+            break
+    else:
+        logger.warning(f"value iteration did not converge: max change {delta}")
+
+    logger.debug(f"value iteration finished after {iteration + 1} sweeps")
+
+    # The policy picks the first child attaining the best value of its parent
+    parents = np.repeat(np.arange(graph.num_vertices), degree)
+    is_best = np.isclose(q_values, values[parents], rtol=0.0, atol=max(tol, 1e-12))
+    is_best &= expandable[parents]
+    edges = np.flatnonzero(is_best)
+    best_parents, first = np.unique(parents[edges], return_index=True)
+
+    policy = np.full(graph.num_vertices, -1, dtype=np.int64)
+    policy[best_parents] = edges[first] - np.asarray(graph.indptr)[best_parents]
+    return values, policy
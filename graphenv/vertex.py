@@ -1,26 +1,221 @@
+import functools
+import threading
 from abc import abstractmethod
-from typing import Dict, Generic, List, Optional, Sequence, TypeVar
+from typing import (
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
 
 import gym
+import numpy as np
 
 V = TypeVar("V")
 
+# Memoized values of thread-safe verticies are published under a fixed pool of
+# locks shared by all verticies, rather than a lock per vertex, to keep
+# verticies small. The locks are never held while a hook runs.
+NUM_LOCK_STRIPES = 64
+_lock_stripes = [threading.Lock() for _ in range(NUM_LOCK_STRIPES)]
+
+
+def _lock_for(vertex: "Vertex") -> threading.Lock:
+    """Returns the lock stripe guarding the memoized values of a vertex."""
+    return _lock_stripes[(id(vertex) >> 4) % NUM_LOCK_STRIPES]
+
+
+class _Computation:
+    """A memoized value being computed by a thread, which other threads
+    needing the same value wait for by acquiring its lock, held until the
+    computation is done."""
+
+    __slots__ = ("thread", "done")
+
+    def __init__(self) -> None:
+        self.thread = threading.get_ident()
+        self.done = threading.Lock()
+        self.done.acquire()
+
+
+# Computations in progress of thread-safe verticies, by vertex id and slot,
+# guarded by the vertex's stripe
+_computations: Dict[Tuple[int, str], _Computation] = {}
+
+
+def _is_set(memo: any) -> bool:
+    return memo is not None
+
+
+def _memoize(
+    vertex: "Vertex",
+    slot: str,
+    compute: Callable[[], any],
+    is_valid: Callable[[any], bool] = _is_set,
+) -> any:
+    """Computes and memoizes a value in a slot of a vertex, called once the
+    value was found missing without a lock.
+
+    Unless the vertex is thread_safe, the value is simply computed and stored.
+    Otherwise the first thread needing the value computes it, without holding
+    any lock so that hooks may read the memoized values of other verticies
+    without deadlocking, and the other threads wait for that computation.
+
+    Args:
+        vertex (Vertex): vertex holding the value
+        slot (str): name of the slot memoizing the value
+        compute (Callable[[], any]): computes the value to memoize
+        is_valid (Callable[[any], bool], optional): whether the memoized value
+            can be returned. Defaults to checking that it is not None.
+
+    Returns:
+        any: The memoized value.
+    """
+    if not vertex.thread_safe:
+        memo = compute()
+        setattr(vertex, slot, memo)
+        return memo
+
+    key = (id(vertex), slot)
+    lock = _lock_for(vertex)
+    while True:
+        with lock:
+            memo = getattr(vertex, slot)
+            if is_valid(memo):
+                return memo
+            computation = _computations.get(key)
+            if computation is None:
+                computation = _computations[key] = _Computation()
+                break
+        if computation.thread == threading.get_ident():
+            # The hook computing the value needs it itself
+            return compute()
+        # If that computation fails, the next pass computes the value here
+        with computation.done:
+            pass
+
+    try:
+        memo = compute()
+        with lock:
+            setattr(vertex, slot, memo)
+        return memo
+    finally:
+        with lock:
+            del _computations[key]
+        computation.done.release()
+
+
+@functools.lru_cache(maxsize=None)
+def _state_slots(cls: type) -> Tuple[str, ...]:
+    """Returns the slots of a vertex class that are pickled: those declared by
+    its subclasses of Vertex, excluding the memoized values of Vertex."""
+    names = []
+    for base in cls.__mro__:
+        if base is Vertex or base is object:
+            continue
+        slots = base.__dict__.get("__slots__", ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(n for n in slots if n not in ("__dict__", "__weakref__"))
+    return tuple(names)
+
+
+@functools.lru_cache(maxsize=None)
+def _streams_children(cls: type) -> bool:
+    """Returns whether a vertex class streams its children without memoizing
+    them: it creates chosen children itself by overriding
+    _get_children_subset(), and does not override the children property, so
+    that streamed children are those the children property would give."""
+    return (
+        cls._get_children_subset is not Vertex._get_children_subset
+        and cls.children is Vertex.children
+    )
+
+
+class ChildrenBatch:
+    """Struct-of-arrays description of all the children of a vertex, letting
+    verticies whose children differ in a few values describe them without
+    creating one object and one observation per child.
+
+    Attributes:
+        num_children: number of children
+        observations: the children's observations stacked along a new first
+            axis, as space_util.stack_observations() would stack them
+        fields: optional dictionary of per-child arrays describing the children
+    """
+
+    __slots__ = ("num_children", "observations", "fields")
+
+    def __init__(
+        self,
+        num_children: int,
+        observations: any,
+        fields: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
+        self.num_children = num_children
+        self.observations = observations
+        self.fields = fields if fields is not None else {}
+
 
 class Vertex(Generic[V]):
     """Abstract class defining a vertex in a graph. To implement a graph using
     this class, subclass Vertex and implement the abstract methods below.
 
+    Vertex uses __slots__, so its instances carry no __dict__. Subclasses that
+    declare __slots__ for their own attributes stay compact, while subclasses
+    that do not get a __dict__ as usual.
+
+    Pickling a vertex drops its memoized values, so that a vertex that has been
+    expanded does not carry its explored subtree and observations along. Only
+    the attributes of the subclasses are pickled.
+
+    Reading a memoized value never takes a lock. Subclasses whose verticies are
+    read from several threads, e.g. a root shared by sampling threads, set
+    thread_safe to True: each of their memoized values is then computed by a
+    single thread, while the other threads needing it wait, and no lock is
+    held while a hook such as _get_children() or _make_observation() runs. The
+    default leaves single-threaded users without any locking.
+
     Args:
         Generic (V): The implementing vertex subclass.
 
     Attributes:
         _children (Optional[List]) : memoized list of child vertices
         _observation (Optional[any]) : memoized observation of this vertex
+        _top_children (Optional[Tuple[int, List]]) : memoized result of the last
+            call to top_children()
+        _clusters (Optional[Tuple[int, List, List]]) : memoized child clusters and
+            cluster representatives of the last call to cluster_representatives()
     """
 
+    __slots__ = ("_children", "_observation", "_top_children", "_clusters")
+
+    thread_safe: bool = False
+
     def __init__(self) -> None:
         self._children: Optional[List] = None
         self._observation: Optional[any] = None
+        self._top_children: Optional[Tuple[int, List]] = None
+        self._clusters: Optional[Tuple[int, List, List]] = None
+
+    def __getstate__(self) -> Dict[str, any]:
+        state = {
+            name: getattr(self, name)
+            for name in _state_slots(type(self))
+            if hasattr(self, name)
+        }
+        state.update(getattr(self, "__dict__", {}))
+        return state
+
+    def __setstate__(self, state: Dict[str, any]) -> None:
+        Vertex.__init__(self)
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
 
     @property
     @abstractmethod
@@ -74,6 +269,172 @@ class Vertex(Generic[V]):
         """
         raise NotImplementedError
 
+    def _get_num_children(self) -> Optional[int]:
+        """Gets the number of child verticies without creating them, if this
+        can be done cheaply. Used by num_children and terminal.
+
+        The default implementation returns None, meaning the children have to be
+        created to be counted.
+
+        Returns:
+            Optional[int]: Number of children, or None.
+        """
+        return None
+
+    def _get_children_batch(self) -> Optional[ChildrenBatch]:
+        """Describes all the children at once with arrays, without creating them.
+        Used by GraphEnv to observe the children; a child object is only created
+        with _get_children_subset() once its action is taken.
+
+        The default implementation returns None, meaning the children are
+        observed one object at a time.
+
+        Returns:
+            Optional[ChildrenBatch]: The children, in the order of
+                _get_children(), or None.
+        """
+        return None
+
+    def _get_child_scores(self) -> Optional[np.ndarray]:
+        """Gets cheap heuristic scores of the child verticies, without creating
+        them. Used by top_children() to only create the most promising children
+        of verticies with many of them.
+
+        The default implementation returns None, meaning no heuristic is
+        available.
+
+        Returns:
+            Optional[np.ndarray]: One score per child, in the order of
+                _get_children(), higher being more promising. Or None.
+        """
+        return None
+
+    def _get_children_subset(self, indices: Sequence[int]) -> Sequence[V]:
+        """Gets a subset of the child verticies. Override this along with
+        _get_child_scores() to create only the requested children. Overriding
+        it also lets iter_children() stream the children without memoizing
+        them, unless the children property is overridden too.
+
+        The default implementation selects from the full list of children.
+
+        Args:
+            indices (Sequence[int]): positions of the children to get, in the
+                order of _get_children()
+
+        Returns:
+            Sequence[N]: The requested child verticies, in the order given.
+        """
+        children = self.children
+        return [children[i] for i in indices]
+
+    def top_children(self, k: int) -> List[V]:
+        """
+        Gets at most k child verticies, keeping those with the highest scores
+        from _get_child_scores(), in order of decreasing score. If the vertex
+        has no heuristic scores, all of its children are returned. Memoizes the
+        result of the last call.
+
+        Args:
+            k (int): maximum number of children to get
+
+        Returns:
+            List[N] : List of the most promising child verticies
+        """
+        top_children = self._top_children
+        if top_children is None or top_children[0] != k:
+            top_children = _memoize(
+                self,
+                "_top_children",
+                lambda: (k, self._select_top_children(k)),
+                lambda memo: memo is not None and memo[0] == k,
+            )
+        return top_children[1]
+
+    def _select_top_children(self, k: int) -> List[V]:
+        scores = self._get_child_scores()
+        if scores is None:
+            return self.children
+        top = np.arange(len(scores))
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return list(self._get_children_subset(top))
+
+    def _get_child_clusters(self, max_size: int) -> Optional[Sequence[Sequence[int]]]:
+        """Groups the child verticies into clusters, so that choosing a child can
+        be split into choosing a cluster and then a child within it. Used by
+        GraphEnv's hierarchical_actions mode.
+
+        The default implementation returns None, meaning the children are not
+        clustered.
+
+        Args:
+            max_size (int): maximum number of clusters, and of children in each
+                cluster
+
+        Returns:
+            Optional[Sequence[Sequence[int]]]: For each cluster, the positions of
+                its children in the order of _get_children(), beginning with the
+                child representing the cluster. Or None to not cluster the
+                children, for instance when there are at most max_size of them.
+        """
+        return None
+
+    def cluster_representatives(self, max_size: int) -> Optional[List[V]]:
+        """
+        Gets the child verticies representing each cluster of children from
+        _get_child_clusters(). Memoizes the result of the last call.
+
+        Args:
+            max_size (int): maximum number of clusters, and of children in each
+                cluster
+
+        Raises:
+            ValueError: If there are more than max_size clusters, or more than
+                max_size children in a cluster.
+
+        Returns:
+            Optional[List[N]] : One child vertex per cluster, or None if the
+                children are not clustered.
+        """
+        memo = self._clusters
+        if memo is None or memo[0] != max_size:
+            memo = _memoize(
+                self,
+                "_clusters",
+                lambda: self._cluster(max_size),
+                lambda memo: memo is not None and memo[0] == max_size,
+            )
+        return memo[2]
+
+    def _cluster(self, max_size: int) -> Tuple[int, Optional[List], Optional[List]]:
+        clusters = self._get_child_clusters(max_size)
+        if clusters is None:
+            return max_size, None, None
+
+        clusters = list(clusters)
+        largest = max(len(cluster) for cluster in clusters)
+        if len(clusters) > max_size or largest > max_size:
+            raise ValueError(
+                f"{type(self).__name__} has {len(clusters)} child clusters of up "
+                f"to {largest} children, more than the maximum of {max_size}"
+            )
+        representatives = self._get_children_subset([c[0] for c in clusters])
+        return max_size, clusters, list(representatives)
+
+    def cluster_children(self, cluster: int) -> List[V]:
+        """
+        Gets the child verticies in a cluster, from the clusters of the last
+        call to cluster_representatives().
+
+        Args:
+            cluster (int): index of the cluster
+
+        Returns:
+            List[N] : Child verticies in the cluster, representative first.
+        """
+        return list(self._get_children_subset(self._clusters[1][cluster]))
+
     @property
     def children(self) -> List[V]:
         """
@@ -85,9 +446,73 @@ class Vertex(Generic[V]):
         Returns:
             List[N] : List of child verticies
         """
+        children = self._children
+        if children is None:
+            if self.thread_safe:
+                children = _memoize(self, "_children", self._list_children)
+            else:
+                children = self._children = list(self._get_children())
+        return children
+
+    def _list_children(self) -> List[V]:
+        return list(self._get_children())
+
+    @property
+    def num_children(self) -> int:
+        """
+        Gets the number of child verticies, from _get_num_children() if it is
+        implemented and the children have not been created yet.
+
+        Returns:
+            int: Number of child verticies
+        """
         if self._children is None:
-            self._children = list(self._get_children())
-        return self._children
+            num_children = self._get_num_children()
+            if num_children is not None:
+                return num_children
+        return len(self.children)
+
+    @property
+    def children_batch(self) -> Optional[ChildrenBatch]:
+        """
+        Gets all children as a struct-of-arrays batch from _get_children_batch(),
+        if implemented. Not memoized.
+
+        Returns:
+            Optional[ChildrenBatch]: The children batch, or None
+        """
+        return self._get_children_batch()
+
+    def iter_children(self) -> Iterator[V]:
+        """
+        Iterates over the child verticies. Subclasses that override
+        _get_children_subset(), to create a chosen child without the others,
+        and not the children property, have their children generated one at a
+        time by _get_children() and not kept, unless they are already memoized,
+        so they can be streamed without holding the full list. Otherwise this
+        iterates over the children property.
+
+        Returns:
+            Iterator[N] : Iterator over the child verticies
+        """
+        if self._children is None and _streams_children(type(self)):
+            return iter(self._get_children())
+        return iter(self.children)
+
+    def child(self, index: int) -> V:
+        """
+        Gets a single child vertex, from the memoized children if available, or
+        else with _get_children_subset().
+
+        Args:
+            index (int): position of the child
+
+        Returns:
+            N : The child vertex
+        """
+        if self._children is not None:
+            return self._children[index]
+        return self._get_children_subset([index])[0]
 
     @property
     def observation(self) -> any:
@@ -100,9 +525,13 @@ class Vertex(Generic[V]):
         Returns:
             Observation of this vertex.
         """
-        if self._observation is None:
-            self._observation = self._make_observation()
-        return self._observation
+        observation = self._observation
+        if observation is None:
+            if self.thread_safe:
+                observation = _memoize(self, "_observation", self._make_observation)
+            else:
+                observation = self._observation = self._make_observation()
+        return observation
 
     @property
     def terminal(self) -> bool:
@@ -110,7 +539,7 @@ class Vertex(Generic[V]):
         Returns:
             True if this is a terminal vertex in the graph.
         """
-        return len(self.children) == 0
+        return self.num_children == 0
 
     @property
     def info(self) -> Dict:
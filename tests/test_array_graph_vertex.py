@@ -0,0 +1,86 @@
+import pickle
+import subprocess
+import sys
+
+import networkx as nx
+import numpy as np
+import pytest
+from graphenv.array_graph_vertex import ArrayGraphVertex
+from graphenv.csr_graph import CSRGraph
+from graphenv.graph_env import GraphEnv
+from graphenv.value_iteration import value_iteration
+
+
+@pytest.fixture
+def G():
+    # A small state machine: 0 -> {1, 2}, 1 -> {3}, 2 -> {3, 0}, 3 terminal
+    G = nx.DiGraph()
+    for node in range(4):
+        G.add_node(node, features=[node, 10.0 * node], reward=-1.0 * (node != 3))
+    G.add_edges_from([(0, 1), (0, 2), (1, 3), (2, 3), (2, 0)])
+    G.nodes[3]["reward"] = 5.0
+    return G
+
+
+def test_from_networkx_and_scipy(G):
+    graph = CSRGraph.from_networkx(G)
+    assert graph.children(0).tolist() == [1, 2]
+    assert graph.children(2).tolist() == [3, 0]
+    assert graph.terminal.tolist() == [False, False, False, True]
+    assert graph.features.shape == (4, 2)
+
+    adjacency = nx.to_scipy_sparse_array(G, nodelist=range(4))
+    other = CSRGraph.from_scipy(
+        adjacency, features=graph.features, rewards=graph.rewards
+    )
+    for name in ["indptr", "terminal", "rewards", "features"]:
+        assert np.array_equal(getattr(graph, name), getattr(other, name))
+    assert sorted(other.children(2).tolist()) == [0, 3]
+
+    values, policy = value_iteration(graph)
+    assert np.allclose(values, [4.0, 5.0, 5.0, 0.0])
+
+
+def test_array_graph_env(G, tmp_path):
+    CSRGraph.from_networkx(G).save(str(tmp_path))
+    graph = CSRGraph.load(str(tmp_path), mmap_mode="r")
+    assert isinstance(graph.features, np.memmap)
+
+    env = GraphEnv({"state": ArrayGraphVertex(graph), "max_num_children": 2})
+    obs = env.reset()
+    assert obs["action_mask"].tolist() == [False, True, True]
+    assert obs["vertex_observations"]["index"][:, 0].tolist() == [0, 1, 2]
+    assert np.array_equal(
+        obs["vertex_observations"]["features"], [[0, 0], [1, 10], [2, 20]]
+    )
+    assert env.state._children is None
+
+    obs, reward, done, _ = env.step(1)
+    assert env.state.index == 2 and reward == -1.0 and not done
+    obs, reward, done, _ = env.step(0)
+    assert env.state.index == 3 and reward == 5.0 and done
+    assert obs["action_mask"].tolist() == [False, False, False]
+
+    # Vertices carry no per-vertex data beyond their index
+    assert not hasattr(env.state, "__dict__")
+    assert [child.index for child in ArrayGraphVertex(graph, 2).children] == [3, 0]
+
+
+def test_share(G):
+    graph = CSRGraph.from_networkx(G).share()
+    vertex = pickle.loads(pickle.dumps(ArrayGraphVertex(graph, 2)))
+    assert vertex.graph.indices.name == graph.indices.name
+    assert [child.index for child in vertex.children] == [3, 0]
+    assert np.array_equal(vertex.observation["features"], [2, 20])
+
+
+def test_share_outlives_attached_processes(G):
+    # Processes attaching to the shared arrays do not free them when they exit
+    graph = CSRGraph.from_networkx(G).share()
+    subprocess.run(
+        [sys.executable, "-c", "import pickle, sys; pickle.load(sys.stdin.buffer)"],
+        input=pickle.dumps(ArrayGraphVertex(graph, 2)),
+        check=True,
+    )
+    vertex = pickle.loads(pickle.dumps(ArrayGraphVertex(graph, 2)))
+    assert [child.index for child in vertex.children] == [3, 0]
@@ -0,0 +1,96 @@
+import asyncio
+import time
+
+import gym
+import numpy as np
+from graphenv.async_vertex import AsyncVertex
+from graphenv.graph_env import GraphEnv
+
+DELAY = 0.05
+
+
+class SlowVertex(AsyncVertex):
+    """A tree of the given depth and width, whose observations wait on a slow
+    evaluator, counting how many evaluations are in flight at once."""
+
+    def __init__(self, depth: int, width: int, stats: dict, index: int = 0) -> None:
+        super().__init__()
+        self.depth = depth
+        self.width = width
+        self.stats = stats
+        self.index = index
+
+    @property
+    def observation_space(self) -> gym.spaces.Space:
+        return gym.spaces.Box(low=0, high=np.inf, shape=(2,))
+
+    @property
+    def root(self) -> "SlowVertex":
+        return SlowVertex(self.depth, self.width, self.stats)
+
+    @property
+    def reward(self) -> float:
+        return float(self.index)
+
+    async def _get_children_async(self):
+        await asyncio.sleep(DELAY)
+        if self.depth == 0:
+            return []
+        return [
+            SlowVertex(self.depth - 1, self.width, self.stats, i)
+            for i in range(self.width)
+        ]
+
+    async def _make_observation_async(self) -> np.ndarray:
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(
+            self.stats["max_in_flight"], self.stats["in_flight"]
+        )
+        await asyncio.sleep(DELAY)
+        self.stats["in_flight"] -= 1
+        return np.array([self.depth, self.index], dtype=np.float32)
+
+
+def make_env(width: int, max_concurrency=None):
+    stats = {"in_flight": 0, "max_in_flight": 0}
+    state = SlowVertex(2, width, stats)
+    env = GraphEnv(
+        {
+            "state": state,
+            "max_num_children": width,
+            "max_concurrency": max_concurrency,
+        }
+    )
+    return env, stats
+
+
+def test_async_observation():
+    width = 8
+    env, stats = make_env(width)
+
+    start = time.perf_counter()
+    obs = asyncio.run(env.reset_async())
+    elapsed = time.perf_counter() - start
+
+    # The children and then all observations each take one round-trip
+    assert elapsed < (width + 2) * DELAY / 2
+    assert stats["max_in_flight"] == width + 1
+    assert obs["action_mask"][1:].all()
+    assert np.array_equal(obs["vertex_observations"][:, 1], [0, *range(width)])
+
+    obs, reward, done, _ = asyncio.run(env.step_async(3))
+    assert reward == 3.0 and not done
+    assert env.state.depth == 1
+
+    # Synchronous access works outside of an event loop
+    sync_env, _ = make_env(width)
+    sync_obs = sync_env.reset()
+    sync_obs, sync_reward, _, _ = sync_env.step(3)
+    assert sync_reward == reward
+    assert np.array_equal(sync_obs["vertex_observations"], obs["vertex_observations"])
+
+
+def test_max_concurrency():
+    env, stats = make_env(6, max_concurrency=2)
+    asyncio.run(env.reset_async())
+    assert stats["max_in_flight"] == 2
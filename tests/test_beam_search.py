@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from graphenv.beam_search import beam_search
+from graphenv.examples.tsp.baselines import nearest_neighbor_tour, tour_cost
+from graphenv.examples.tsp.graph_utils import get_positions, make_complete_planar_graph
+from graphenv.examples.tsp.held_karp import HeldKarp
+from graphenv.examples.tsp.multi_start import multi_start_roots, multi_start_tours
+from graphenv.examples.tsp.tsp_state import TSPState
+
+
+class NearestNeighborModel:
+    """Scores TSP vertices by how close they are to their parent."""
+
+    def __init__(self):
+        self.num_calls = 0
+
+    def forward_vertex(self, input_dict):
+        self.num_calls += 1
+        parent_dist = input_dict["parent_dist"]
+        return np.zeros_like(parent_dist), -10 * parent_dist
+
+
+class EncodingNearestNeighborModel(NearestNeighborModel):
+    """Scores TSP vertices like NearestNeighborModel from an encoding of each
+    group of roots, recording the calls."""
+
+    def __init__(self):
+        super().__init__()
+        self.encoded = []
+        self.groups = []
+
+    def encode_roots(self, root_observations):
+        self.encoded.append(len(root_observations["node_idx"]))
+        return np.arange(len(root_observations["node_idx"]))
+
+    def forward_encoded(self, encodings, roots, input_dict):
+        self.groups.append(encodings[roots])
+        return super().forward_vertex(input_dict)
+
+
+def tour_of(path):
+    return path[-1].tour
+
+
+@pytest.fixture
+def roots():
+    return [TSPState(make_complete_planar_graph(N=8, seed=s)).root for s in range(3)]
+
+
+def test_greedy_beam(roots):
+    model = NearestNeighborModel()
+    results = beam_search(model, roots, beam_width=1)
+
+    # One batched model call per step for all instances
+    assert model.num_calls == 8
+    for root, (path, total) in zip(roots, results):
+        assert path[0] is root
+        assert [v.tour for v in path[1:]] == [
+            tour_of(path)[: i + 2] for i in range(len(path) - 1)
+        ]
+        tour, cost = nearest_neighbor_tour(get_positions(root.G))
+        assert tour_of(path) == tour.tolist()
+        assert np.isclose(total, -cost)
+
+
+@pytest.mark.parametrize("scoring", ["log_prob", "value"])
+def test_wide_beam_is_exact(scoring):
+    # A beam as wide as the number of partial tours searches exhaustively
+    root = TSPState(make_complete_planar_graph(N=6, seed=2)).root
+    [(path, total)] = beam_search(
+        NearestNeighborModel(), [root], beam_width=120, scoring=scoring
+    )
+    assert np.isclose(total, -HeldKarp.from_state(root).cost)
+
+
+def test_beam_search_improves(roots):
+    greedy = beam_search(NearestNeighborModel(), roots, beam_width=1)
+    wide = beam_search(NearestNeighborModel(), roots, beam_width=8)
+    assert all(w[1] >= g[1] - 1e-9 for w, g in zip(wide, greedy))
+
+    partial = beam_search(NearestNeighborModel(), roots, max_steps=3)
+    assert all(len(path) == 4 for path, _ in partial)
+
+    with pytest.raises(ValueError):
+        beam_search(NearestNeighborModel(), roots, scoring="bogus")
+
+
+def test_multi_start(roots):
+    model = NearestNeighborModel()
+    results = multi_start_tours(model, roots)
+
+    assert model.num_calls == 8
+    for root, (tour, cost) in zip(roots, results):
+        pos = get_positions(root.G)
+        assert tour[0] == tour[-1] == 0
+        assert sorted(tour[:-1]) == list(range(8))
+        assert np.isclose(cost, tour_cost(pos, tour))
+        expected = min(nearest_neighbor_tour(pos, source=s)[1] for s in range(8))
+        assert np.isclose(cost, expected)
+
+    starts = multi_start_roots(roots[0], num_starts=3, seed=0)
+    assert len({start.tour[0] for start in starts}) == 3
+    assert all(start.positions is roots[0].positions for start in starts)
+
+
+def test_multi_start_encodes_instances_once(roots):
+    model = EncodingNearestNeighborModel()
+    results = multi_start_tours(model, roots)
+    assert results == multi_start_tours(NearestNeighborModel(), roots)
+
+    # One encoding per instance, shared by the rollouts of its 8 start nodes
+    assert model.encoded == [3]
+    assert len(model.groups) == model.num_calls == 8
+    assert np.array_equal(model.groups[0], np.repeat(np.arange(3), 8 * 7))
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from graphenv.array_graph_vertex import ArrayGraphVertex
+from graphenv.csr_builder import build_csr, read_chunks
+from graphenv.graph_env import GraphEnv
+
+
+@pytest.fixture
+def edges():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 50, size=(400, 2))
+
+
+def test_build_csr(tmp_path, edges):
+    features = np.arange(100, dtype=np.float32).reshape(50, 2)
+    np.savetxt(tmp_path / "edges.txt", edges, fmt="%d", header="parent child")
+    np.save(tmp_path / "features.npy", features)
+
+    graph = build_csr(
+        str(tmp_path / "graph"),
+        str(tmp_path / "edges.txt"),
+        features=str(tmp_path / "features.npy"),
+        chunk_size=37,
+    )
+    assert isinstance(graph.indices, np.memmap)
+    assert graph.num_vertices == edges.max() + 1
+    assert np.array_equal(graph.features, features)
+
+    # Each vertex keeps its children in edge list order
+    for vertex in range(graph.num_vertices):
+        expected = edges[edges[:, 0] == vertex, 1]
+        assert np.array_equal(graph.children(vertex), expected)
+    assert np.array_equal(graph.terminal, graph.degree == 0)
+
+    env = GraphEnv({"state": ArrayGraphVertex(graph), "max_num_children": 30})
+    obs = env.reset()
+    assert obs["action_mask"].sum() == graph.degree[0]
+
+
+def test_build_csr_chunks(tmp_path, edges):
+    def chunks():
+        return (edges[i : i + 64] for i in range(0, len(edges), 64))
+
+    graph = build_csr(str(tmp_path), chunks, num_vertices=60)
+    assert graph.num_vertices == 60
+    assert graph.terminal[50:].all()
+    assert len(list(read_chunks(str(tmp_path / "indices.npy"), 100))) == 4
+
+    with pytest.raises(ValueError):
+        build_csr(str(tmp_path), chunks, num_vertices=10)
+
+
+def test_build_csr_buckets(tmp_path, edges):
+    # Many buckets, and vertex 7 with more children than fit in one
+    rng = np.random.default_rng(1)
+    hub = np.stack([np.full(100, 7), rng.integers(0, 50, 100)], axis=1)
+    edges = np.concatenate([edges[:200], hub, edges[200:]])
+    np.save(tmp_path / "edges.npy", edges)
+
+    graph = build_csr(
+        str(tmp_path / "graph"),
+        str(tmp_path / "edges.npy"),
+        chunk_size=37,
+        bucket_size=16,
+    )
+    for vertex in range(graph.num_vertices):
+        expected = edges[edges[:, 0] == vertex, 1]
+        assert np.array_equal(graph.children(vertex), expected)
+    assert sorted(p.name for p in (tmp_path / "graph").iterdir()) == [
+        "indices.npy",
+        "indptr.npy",
+        "rewards.npy",
+        "terminal.npy",
+    ]
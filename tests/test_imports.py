@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Seconds allowed for importing each module in a fresh interpreter, far below
+# the time TensorFlow alone takes to import
+IMPORT_BUDGET = 2.0
+
+# Modules only imported when used: the heavy optional dependencies, and
+# multiprocessing.shared_memory, which needs Python 3.8
+LAZY_MODULES = ("tensorflow", "ray.rllib", "multiprocessing.shared_memory")
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    "elapsed": elapsed,
+    "modules": [m for m in {lazy_modules} if m in sys.modules],
+}}))
+"""
+
+
+def _import(module: str, lazy_modules=LAZY_MODULES) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module, lazy_modules=lazy_modules)],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["graphenv", "graphenv.vertex", "graphenv.graph_env", "graphenv.space_util"],
+)
+def test_import_budget(module):
+    result = _import(module)
+    assert result["modules"] == []
+    assert result["elapsed"] < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize(
+    "module", ["graphenv.csr_graph", "graphenv.examples.tsp.tsp_state"]
+)
+def test_shared_memory_imported_lazily(module):
+    assert _import(module, ("multiprocessing.shared_memory",))["modules"] == []
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from graphenv import tf
+from graphenv.examples.hallway.hallway_state import HallwayState
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.held_karp import HeldKarp
+from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.graph_env import GraphEnv
+from graphenv.graph_model import GraphModel
+from graphenv.graph_model_bellman_mixin import GraphModelBellmanMixin
+from graphenv.mcts import MCTS
+
+
+class ModelBase:
+    """Stands in for the rllib model base class."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+
+class NearestNeighborModel(GraphModel, ModelBase):
+    """Prefers TSP vertices close to their parent, with no value estimate."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.num_calls = 0
+
+    def forward_vertex(self, input_dict):
+        self.num_calls += 1
+        parent_dist = tf.cast(input_dict["parent_dist"], tf.float32)
+        return tf.zeros_like(parent_dist), -10 * parent_dist
+
+
+class HallwayPositionModel(GraphModelBellmanMixin, GraphModel, ModelBase):
+    """Values hallway verticies by their position."""
+
+    def forward_vertex(self, input_dict):
+        cur_pos = tf.cast(input_dict["cur_pos"], tf.float32)
+        return cur_pos, tf.zeros_like(cur_pos)
+
+
+def make_model(cls, env):
+    return cls(env.observation_space, env.action_space, 1, {}, "model")
+
+
+def test_mcts_tsp_batched():
+    roots = [TSPState(make_complete_planar_graph(N=6, seed=s)).root for s in range(3)]
+    env = GraphEnv({"state": roots[0], "max_num_children": 5})
+    model = make_model(NearestNeighborModel, env)
+    mcts = MCTS(env, model, num_simulations=32, batch_size=8)
+
+    visits = mcts.search(roots)
+    # Roots, then one batched evaluation per round across all trees
+    assert model.num_calls == 1 + 32 // 8
+    for root_visits in visits:
+        assert root_visits.shape == (5,)
+        assert root_visits.sum() == 32
+
+
+@pytest.mark.parametrize("batch_size", [1, 16])
+def test_mcts_tsp_optimal(batch_size):
+    root = TSPState(make_complete_planar_graph(N=5, seed=3)).root
+    env = GraphEnv({"state": root, "max_num_children": 4})
+    model = make_model(NearestNeighborModel, env)
+    mcts = MCTS(env, model, num_simulations=256, batch_size=batch_size)
+
+    env.reset()
+    done, total = False, 0.0
+    while not done:
+        [action] = mcts.act([env.state])
+        _, reward, done, _ = env.step(action)
+        total += reward
+
+    assert np.isclose(total, -HeldKarp.from_state(root).cost)
+
+
+def test_mcts_hallway_bellman():
+    env = GraphEnv({"state": HallwayState(6).root, "max_num_children": 2})
+    mcts = MCTS(env, make_model(HallwayPositionModel, env), num_simulations=16)
+    [action] = mcts.act([env.state.children[0]])
+    assert action == 1  # walk towards the goal
+
+
+def test_mcts_terminal_roots():
+    G = make_complete_planar_graph(N=4, seed=0)
+    env = GraphEnv({"state": TSPState(G), "max_num_children": 3})
+    mcts = MCTS(env, make_model(NearestNeighborModel, env), num_simulations=8)
+    done = TSPState(G, tour=[0, 2, 1, 3, 0])
+
+    assert [len(visits) for visits in mcts.search([done, done])] == [0, 0]
+    visits = mcts.search([done, TSPState(G)])
+    assert len(visits[0]) == 0 and visits[1].sum() == 8
+
+    with pytest.raises(ValueError, match=r"terminal roots \[0\]"):
+        mcts.act([done, TSPState(G)])
@@ -0,0 +1,91 @@
+import gc
+import os
+from multiprocessing.shared_memory import SharedMemory
+
+import gym
+import numpy as np
+import pytest
+from graphenv.graph_env import GraphEnv
+from graphenv.vertex import Vertex
+
+
+class FeaturizedVertex(Vertex):
+    """A star of leaves whose observations record the observing process."""
+
+    def __init__(self, width: int, index: int = -1) -> None:
+        super().__init__()
+        self.width = width
+        self.index = index
+
+    @property
+    def observation_space(self) -> gym.spaces.Dict:
+        return gym.spaces.Dict(
+            {
+                "features": gym.spaces.Box(low=-1, high=np.inf, shape=(3,)),
+                "pid": gym.spaces.Box(low=0, high=np.inf, shape=(), dtype=int),
+            }
+        )
+
+    @property
+    def root(self) -> "FeaturizedVertex":
+        return FeaturizedVertex(self.width)
+
+    @property
+    def reward(self) -> float:
+        return 0.0
+
+    def _get_children(self):
+        if self.index < 0:
+            for i in range(self.width):
+                yield FeaturizedVertex(self.width, i)
+
+    def _make_observation(self):
+        x = float(self.index)
+        return {
+            "features": np.array([x, x**2, np.sqrt(abs(x))], dtype=np.float32),
+            "pid": np.array(os.getpid()),
+        }
+
+
+def test_observation_pool():
+    width = 10
+    config = {"state": FeaturizedVertex(width), "max_num_children": width + 2}
+    serial = GraphEnv(config).reset()
+
+    env = GraphEnv(
+        {**config, "observation_workers": 2, "observation_chunk_size": 3}
+    )
+    pooled = env.reset()
+    try:
+        assert np.array_equal(pooled["action_mask"], serial["action_mask"])
+        obs = pooled["vertex_observations"]
+        assert np.array_equal(
+            obs["features"], serial["vertex_observations"]["features"]
+        )
+
+        # Children were observed in the workers, the rest in this process
+        children_pids = set(obs["pid"][1 : width + 1].tolist())
+        assert os.getpid() not in children_pids
+        assert (obs["pid"][[0, width + 1, width + 2]] == os.getpid()).all()
+        assert env.state._children[0]._observation is None
+
+        # Workers write into the returned arrays, in shared memory, and every
+        # observation gets arrays of its own
+        names = [array.base.name for array in obs.values()]
+        again = env.make_observation()["vertex_observations"]
+        assert not np.shares_memory(again["features"], obs["features"])
+
+        # The new state keeps the observation made in a worker
+        env.step(2)
+        assert env.state.index == 2
+        assert env.state._observation["pid"] in children_pids
+        assert np.array_equal(env.state.observation["features"], obs["features"][3])
+    finally:
+        env.close()
+
+    # The shared memory is freed with the observations
+    del pooled, obs, again
+    gc.collect()
+    for name in names:
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=name)
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from graphenv.examples.hallway.hallway_state import HallwayState
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.tsp_nfp_state import TSPNFPState
+from graphenv.graph_env import GraphEnv
+from graphenv.state_registry import make_state, register_state
+
+
+def test_state_factory():
+    env = GraphEnv(
+        {
+            "state_factory": "tsp_nfp",
+            "state_config": {"N": 6, "seed": 3, "max_num_neighbors": 3},
+            "max_num_children": 6,
+        }
+    )
+    state = TSPNFPState(make_complete_planar_graph(N=6, seed=3), max_num_neighbors=3)
+    expected = GraphEnv({"state": state, "max_num_children": 6}).reset()
+    obs = env.reset()
+    for key, value in expected["vertex_observations"].items():
+        assert np.array_equal(obs["vertex_observations"][key], value)
+
+    # Instances are built once per process and arguments, and each env gets a
+    # copy of the state memoizing its own children
+    state = make_state("tsp", {"N": 6, "seed": 3})
+    state.children
+    copy = make_state("tsp", {"seed": 3, "N": 6})
+    assert copy is not state and copy.positions is state.positions
+    assert copy._children is None
+    assert make_state("tsp", {"N": 6, "seed": 4}).tour == [0]
+
+    # Unseeded instances are drawn anew every time
+    assert not np.array_equal(
+        make_state("tsp", {"N": 6}).positions,
+        make_state("tsp", {"N": 6, "seed": None}).positions,
+    )
+
+
+def test_register_state():
+    register_state("short_hallway", lambda: HallwayState(3))
+    env = GraphEnv({"state_factory": "short_hallway", "max_num_children": 2})
+    assert env.state.end_pos == 2
+
+    path = "graphenv.examples.hallway.hallway_state:HallwayState"
+    state = make_state(path, {"corridor_length": 4}, cache=False)
+    assert state.end_pos == 3
+    assert state is not make_state(path, {"corridor_length": 4}, cache=False)
+
+    with pytest.raises(ValueError):
+        make_state("bogus")
@@ -1,7 +1,12 @@
 import pytest
 from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
 from graphenv.examples.tsp.tsp_model import TSPModel, TSPQModel
-from graphenv.examples.tsp.tsp_nfp_model import TSPGNNModel, TSPGNNQModel
+from graphenv.examples.tsp.tsp_nfp_model import (
+    TSPGNNModel,
+    TSPGNNQModel,
+    TSPSharedGNNModel,
+    TSPSharedGNNQModel,
+)
 from graphenv.examples.tsp.tsp_nfp_state import TSPNFPState
 from graphenv.examples.tsp.tsp_state import TSPState
 from graphenv.graph_env import GraphEnv
@@ -50,10 +55,14 @@ def test_rllib_base(ray_init, agent, N, G):
     trainer.train()
 
 
-def test_rllib_nfp(ray_init, agent, N, G):
+@pytest.mark.parametrize("shared", [False, True])
+def test_rllib_nfp(ray_init, agent, N, G, shared):
 
     trainer_fn, config, needs_q_model = agent
-    model = TSPGNNQModel if needs_q_model else TSPGNNModel
+    if shared:
+        model = TSPSharedGNNQModel if needs_q_model else TSPSharedGNNModel
+    else:
+        model = TSPGNNQModel if needs_q_model else TSPGNNModel
 
     ModelCatalog.register_custom_model("this_model", model)
     register_env("graphenv", lambda config: GraphEnv(config))
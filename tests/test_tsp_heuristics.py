@@ -0,0 +1,128 @@
+import itertools
+
+import networkx as nx
+import numpy as np
+import pytest
+from graphenv.examples.tsp.baselines import (
+    greedy_edge_tour,
+    nearest_neighbor_tour,
+    space_filling_curve_tour,
+    tour_cost,
+)
+from graphenv.examples.tsp.graph_utils import (
+    get_positions,
+    make_complete_planar_graph,
+    random_tsp,
+)
+from graphenv.examples.tsp.held_karp import HeldKarp
+from graphenv.examples.tsp.local_search import improve_tours
+from graphenv.examples.tsp.tsp_state import TSPState
+
+
+@pytest.fixture
+def G():
+    return make_complete_planar_graph(N=20, seed=1)
+
+
+@pytest.fixture
+def pos(G):
+    return get_positions(G)
+
+
+def assert_valid_tour(tour, num_nodes, source=0):
+    assert len(tour) == num_nodes + 1
+    assert tour[0] == tour[-1] == source
+    assert sorted(tour[:-1]) == list(range(num_nodes))
+
+
+def test_tour_cost(G, pos):
+    tour = random_tsp(G, seed=1)
+    assert_valid_tour(tour, 20)
+    expected = sum(G[tour[i]][tour[i + 1]]["weight"] for i in range(20))
+    assert tour_cost(pos, tour) == pytest.approx(expected)
+
+
+@pytest.mark.parametrize(
+    "heuristic", [nearest_neighbor_tour, greedy_edge_tour, space_filling_curve_tour]
+)
+def test_baselines(heuristic, G, pos):
+    tour, cost = heuristic(pos, source=3)
+    assert_valid_tour(tour, 20, source=3)
+    assert cost == pytest.approx(tour_cost(pos, tour))
+
+    # Construction heuristics should comfortably beat a random tour
+    random_cost = np.mean([tour_cost(pos, random_tsp(G, seed=i)) for i in range(10)])
+    assert cost < random_cost
+
+
+def test_nearest_neighbor_matches_networkx(G, pos):
+    tour, _ = nearest_neighbor_tour(pos)
+    assert list(tour) == nx.approximation.greedy_tsp(G, source=0)
+
+
+def test_improve_tours(G, pos):
+    tours = np.array([random_tsp(G, seed=i) for i in range(8)])
+    improved, costs = improve_tours(pos, tours, num_neighbors=19)
+
+    for tour, cost, initial in zip(improved, costs, tours):
+        assert_valid_tour(tour, 20)
+        assert cost == pytest.approx(tour_cost(pos, tour))
+        assert cost < tour_cost(pos, initial)
+
+        # No 2-opt move can improve a tour at a local optimum
+        for i in range(19):
+            for j in range(i + 2, 20):
+                candidate = tour.copy()
+                candidate[i + 1 : j + 1] = candidate[i + 1 : j + 1][::-1]
+                assert tour_cost(pos, candidate) >= cost - 1e-9
+
+
+def test_improve_tours_per_instance():
+    rng = np.random.default_rng(1)
+    pos = rng.random((4, 15, 2))
+    tours = [[0, *rng.permutation(np.arange(1, 15)), 0] for _ in range(4)]
+
+    improved, costs = improve_tours(pos, tours, max_iterations=5)
+    for p, tour, cost in zip(pos, improved, costs):
+        assert_valid_tour(tour, 15)
+        assert cost == pytest.approx(tour_cost(p, tour))
+
+    tour, cost = improve_tours(pos[0], nearest_neighbor_tour(pos[0])[0])
+    assert_valid_tour(tour, 15)
+    assert cost <= nearest_neighbor_tour(pos[0])[1]
+
+
+@pytest.mark.parametrize("start", [0, 4])
+def test_held_karp(start):
+    state = TSPState(make_complete_planar_graph(N=7, seed=2))
+    distances = state.distance_matrix
+    solver = HeldKarp(distances, start=start)
+
+    others = [n for n in range(7) if n != start]
+    optimal = min(
+        sum(distances[a, b] for a, b in zip((start, *p), (*p, start)))
+        for p in itertools.permutations(others)
+    )
+    assert solver.cost == pytest.approx(optimal)
+    assert_valid_tour(solver.tour, 7, source=start)
+    assert tour_cost(state.positions, solver.tour) == pytest.approx(optimal)
+
+
+def test_held_karp_value():
+    state = TSPState(make_complete_planar_graph(N=5, seed=3))
+    solver = HeldKarp.from_state(state)
+    assert solver.value(state) == pytest.approx(-solver.cost)
+
+    # Optimal values satisfy the Bellman equation on every vertex
+    vertices = [state]
+    while vertices:
+        vertex = vertices.pop()
+        if vertex.terminal:
+            assert solver.value(vertex) == 0.0
+            continue
+        best = max(child.reward + solver.value(child) for child in vertex.children)
+        assert best == pytest.approx(solver.value(vertex))
+        vertices.extend(vertex.children)
+
+    with pytest.raises(ValueError):
+        solver.remaining_cost([1, 0])
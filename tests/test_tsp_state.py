@@ -0,0 +1,267 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+from graphenv.examples.tsp.baselines import nearest_neighbor_tour
+from graphenv.examples.tsp.graph_utils import get_positions, make_complete_planar_graph
+from graphenv.examples.tsp.instance_pool import TSPInstancePool
+from graphenv.examples.tsp.tsp_nfp_state import TSPNFPState
+from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.graph_env import GraphEnv
+from graphenv.space_util import stack_observations
+
+
+@pytest.fixture
+def N():
+    return 5
+
+
+@pytest.fixture
+def G(N):
+    return make_complete_planar_graph(N=N, seed=1)
+
+
+@pytest.fixture
+def pool(tmp_path, N):
+    return TSPInstancePool.generate(
+        str(tmp_path / "pool"), num_instances=16, num_nodes=N, seed=1, num_workers=2
+    )
+
+
+def test_tsp_state_matches_graph(G, N):
+    state = TSPState(G)
+    assert len(state.children) == N - 1
+
+    child = state.children[2].children[1]
+    src, dst = child.tour[-2:]
+    assert child.reward == pytest.approx(-G[src][dst]["weight"])
+    assert child.observation["parent_dist"][0] == pytest.approx(G[src][dst]["weight"])
+    assert np.allclose(child.observation["node_obs"], G.nodes[dst]["pos"])
+
+    nbr_dist = min(G[dst][n]["weight"] for n in G if n not in child.tour)
+    assert child.observation["nbr_dist"][0] == pytest.approx(nbr_dist)
+
+
+def test_instance_pool(tmp_path, pool, N):
+    assert len(pool) == 16
+    assert pool.num_nodes == N
+    assert isinstance(pool.positions, np.memmap)
+
+    # Generation is reproducible regardless of the number of workers
+    other = TSPInstancePool.generate(
+        str(tmp_path / "other"), num_instances=16, num_nodes=N, seed=1, num_workers=1
+    )
+    assert np.array_equal(pool.positions, other.positions)
+
+    # Pools pickle by reference to their files
+    assert len(pickle.dumps(pool)) < 200
+    assert np.array_equal(pickle.loads(pickle.dumps(pool)).positions, pool.positions)
+
+    with pytest.raises(ValueError):
+        pool.graph_inputs(0)
+
+
+def _samples(pool):
+    return [pool.sample() for _ in range(20)]
+
+
+def test_instance_pool_sampling(tmp_path, pool, N):
+    # The generation seed does not seed the sampling
+    other = TSPInstancePool.generate(
+        str(tmp_path / "other"), num_instances=16, num_nodes=N, seed=1, num_workers=1
+    )
+    assert _samples(pool) != _samples(other)
+
+    # A seeded pool is reproducible, also when unpickled in worker processes
+    seeded = TSPInstancePool(pool.path, seed=0)
+    assert _samples(seeded) == _samples(TSPInstancePool(pool.path, seed=0))
+    samples = []
+    for _ in range(2):
+        with ProcessPoolExecutor(1) as executor:
+            samples.append(executor.submit(_samples, seeded.spawn(3, 1)).result())
+    assert samples[0] == samples[1] == _samples(seeded.spawn(3, 1))
+
+    # Each worker index draws its own stream
+    assert samples[0] != _samples(seeded.spawn(4, 1))
+    assert samples[0] != _samples(seeded)
+
+
+def test_instance_pool_reset(pool, N):
+    env = GraphEnv(
+        {"state": TSPState.from_instance_pool(pool, index=0), "max_num_children": N}
+    )
+
+    instances = set()
+    for _ in range(10):
+        obs = env.reset()
+        assert env.observation_space.contains(obs)
+        instances.add(tuple(env.state.positions[0]))
+
+        done = False
+        while not done:
+            obs, reward, done, info = env.step(0)
+        assert len(env.state.tour) == N + 1
+
+    assert len(instances) > 1
+
+
+def test_preselect_children():
+    N, K = 50, 5
+    G = make_complete_planar_graph(N=N, seed=2)
+    env = GraphEnv(
+        {"state": TSPState(G), "max_num_children": K, "preselect_children": True}
+    )
+    obs = env.reset()
+    assert obs["action_mask"].sum() == K
+
+    # The actions are the nearest unvisited nodes, nearest first, so always
+    # taking the first one follows the nearest neighbor tour
+    done, total = False, 0.0
+    while not done:
+        state = env.state
+        _, reward, done, _ = env.step(0)
+        assert state._children is None
+        total += reward
+
+    tour, cost = nearest_neighbor_tour(get_positions(G))
+    assert env.state.tour == tour.tolist()
+    assert total == pytest.approx(-cost)
+
+    state = TSPState(G, tour=[0, 7])
+    nearest = [n for n in np.argsort(state.distances(7)) if n not in (0, 7)]
+    assert [child.tour[-1] for child in state.top_children(3)] == nearest[:3]
+
+
+def test_hierarchical_actions():
+    N, K = 200, 15
+    G = make_complete_planar_graph(N=N, seed=3)
+    env = GraphEnv(
+        {
+            "state": TSPState(G),
+            "max_num_children": K,
+            "hierarchical_actions": True,
+            "preselect_children": True,  # sorts the last K children by distance
+        }
+    )
+    obs = env.reset()
+    assert obs["action_mask"].sum() == 14  # ceil(199 / 15) clusters
+
+    clusters = env.state._clusters[1]
+    assert sorted(np.concatenate(clusters).tolist()) == list(range(N - 1))
+    assert max(len(cluster) for cluster in clusters) <= K
+
+    # Picking the cluster with the nearest representative, then its nearest node
+    # follows the nearest neighbor tour
+    num_steps, done, total = 0, False, 0.0
+    while not done:
+        obs, reward, done, _ = env.step(0)
+        assert obs["action_mask"].sum() <= K
+        num_steps += 1
+        total += reward
+
+    assert num_steps > N
+    tour, cost = nearest_neighbor_tour(get_positions(G))
+    assert env.state.tour == tour.tolist()
+    assert total == pytest.approx(-cost)
+
+
+def test_hierarchical_actions_too_many_children():
+    # 29 next nodes do not fit in 4 clusters of at most 4 nodes
+    G = make_complete_planar_graph(N=30, seed=0)
+    config = {"max_num_children": 4, "hierarchical_actions": True}
+    with pytest.raises(ValueError, match="at least 6"):
+        GraphEnv({"state": TSPState(G), **config})
+
+    # Once enough nodes are visited, the remaining ones can be clustered
+    env = GraphEnv({"state": TSPState(G, tour=list(range(14))), **config})
+    obs, _, done, _ = env.step(0)
+    while not done:
+        assert obs["action_mask"].sum() <= 4
+        obs, _, done, _ = env.step(0)
+
+
+def test_lazy_children(G, N):
+    state = TSPState(G)
+    assert state.num_children == N - 1
+    assert not state.terminal
+    assert state._children is None
+
+    env = GraphEnv({"state": state, "max_num_children": N})
+    streamed = env.make_observation()
+    assert state._children is None
+    assert state.child(2).tour == [0, 3]
+    assert state._children is None
+
+    # Streaming gives the same observation as stacking the memoized children
+    assert state.children[2].tour == [0, 3]
+    memoized = env.make_observation()
+    for key, value in streamed["vertex_observations"].items():
+        assert np.array_equal(value, memoized["vertex_observations"][key])
+
+    closed = TSPState(G, tour=[0, 1, 2, 3, 4, 0])
+    assert closed.num_children == 0 and closed.terminal
+    assert TSPState(G, tour=[0, 1, 2, 3, 4]).num_children == 1
+
+
+@pytest.mark.parametrize("cls", [TSPState, TSPNFPState])
+def test_children_batch(G, N, cls):
+    env = GraphEnv({"state": cls(G), "max_num_children": N})
+    for tour in [[0], [0, 3], [0, 3, 1, 4], [0, 3, 1, 4, 2]]:
+        state = cls(G, tour=tour)
+        batch = state.children_batch
+        assert batch.num_children == state.num_children
+        obs = env.make_observation(state)["vertex_observations"]
+        assert state._children is None
+
+        # The batch matches observing each child
+        children = state.children
+        expected = stack_observations(
+            state.observation_space, [c.observation for c in children]
+        )
+        for key, value in expected.items():
+            rows = obs[key][1 : batch.num_children + 1]
+            assert np.allclose(rows, value), key
+        assert batch.fields["node"].tolist() == [c.tour[-1] for c in children]
+
+
+def _observe(state):
+    return GraphEnv({"state": state, "max_num_children": state.num_nodes}).reset()
+
+
+@pytest.mark.parametrize("cls", [TSPState, TSPNFPState])
+def test_share(cls):
+    sizes = []
+    for N in [10, 200]:
+        state = cls(make_complete_planar_graph(N=N, seed=0))
+        shared = state.share()
+        assert shared.G is None
+        assert shared.new([0, 1]).positions is shared.positions
+
+        # Pickles reference the shared arrays rather than copying them
+        sizes.append(len(pickle.dumps(shared)))
+        attached = pickle.loads(pickle.dumps(shared))
+        assert attached.positions.name == shared.positions.name
+        assert np.array_equal(attached.positions, state.positions)
+    assert sizes[1] - sizes[0] < 16
+
+    with ProcessPoolExecutor(1) as executor:
+        obs = executor.submit(_observe, shared).result()
+    expected = _observe(state)
+    for key, value in expected["vertex_observations"].items():
+        assert np.array_equal(obs["vertex_observations"][key], value)
+
+
+def test_pickle_drops_graph():
+    sizes = []
+    for N in [10, 200]:
+        G = make_complete_planar_graph(N=N, seed=0)
+        state = TSPState(G, tour=[0, 1])
+        copy = pickle.loads(pickle.dumps(state))
+        assert copy.G is None and copy.tour == [0, 1]
+        assert np.array_equal(copy.positions, state.positions)
+        assert copy.num_children == state.num_children
+
+        # Only the positions grow with N, not the O(N^2) edges of the graph
+        sizes.append(len(pickle.dumps(state)))
+    assert sizes[1] - sizes[0] <= 16 * 190 + 64
@@ -0,0 +1,71 @@
+from concurrent.futures import ThreadPoolExecutor
+from math import factorial
+
+import numpy as np
+import pytest
+from graphenv.csr_graph import CSRGraph, enumerate_graph
+from graphenv.examples.hallway.hallway_state import HallwayState
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.held_karp import HeldKarp
+from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.value_iteration import value_iteration
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_enumerate_hallway(threaded):
+    root = HallwayState(5).root
+    key = lambda vertex: vertex.cur_pos  # noqa: E731
+    if threaded:
+        with ThreadPoolExecutor(2) as executor:
+            graph = enumerate_graph(root, key, executor=executor, chunk_size=1)
+    else:
+        graph = enumerate_graph(root, key)
+
+    assert graph.num_vertices == 5
+    assert [v.cur_pos for v in graph.vertices] == [0, 1, 2, 3, 4]
+    assert graph.children(0).tolist() == [1]
+    assert graph.children(2).tolist() == [1, 3]
+    assert graph.children(4).tolist() == []
+    assert graph.terminal.tolist() == [False] * 4 + [True]
+
+    values, policy = value_iteration(graph)
+    goal = graph.rewards[4]
+    assert np.allclose(values, [goal - 0.3, goal - 0.2, goal - 0.1, goal, 0.0])
+    assert policy.tolist() == [0, 1, 1, 1, -1]
+
+    with pytest.raises(RuntimeError):
+        enumerate_graph(root, key, max_vertices=3)
+
+
+def test_value_iteration_tsp():
+    G = make_complete_planar_graph(N=6, seed=0)
+    root = TSPState(G).root
+    graph = enumerate_graph(root, lambda vertex: tuple(vertex.tour))
+    # Every partial tour of the 5 non-start nodes, plus the closed tours
+    num_tours = sum(factorial(5) // factorial(5 - k) for k in range(6))
+    assert graph.num_vertices == num_tours + factorial(5)
+
+    values, policy = value_iteration(graph)
+    solver = HeldKarp.from_state(root)
+    expected = [solver.value(vertex) for vertex in graph.vertices]
+    assert np.allclose(values, expected)
+
+    # Following the policy from the root collects the optimal tour
+    vertex, total = 0, 0.0
+    while policy[vertex] >= 0:
+        vertex = graph.children(vertex)[policy[vertex]]
+        total += graph.rewards[vertex]
+    assert graph.terminal[vertex]
+    assert np.isclose(total, -solver.cost)
+
+
+def test_csr_graph_save_load(tmp_path):
+    graph = enumerate_graph(HallwayState(4).root, lambda vertex: vertex.cur_pos)
+    graph.save(str(tmp_path))
+    loaded = CSRGraph.load(str(tmp_path), mmap_mode="r")
+
+    assert isinstance(loaded.indices, np.memmap)
+    assert loaded.vertices is None
+    for name in ["indptr", "indices", "rewards", "terminal"]:
+        assert np.array_equal(getattr(loaded, name), getattr(graph, name))
+    assert np.allclose(value_iteration(loaded)[0], value_iteration(graph)[0])
@@ -0,0 +1,358 @@
+import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gym
+import numpy as np
+import pytest
+from graphenv.examples.hallway.hallway_state import HallwayState
+from graphenv.examples.tsp.graph_utils import make_complete_planar_graph
+from graphenv.examples.tsp.tsp_nfp_state import TSPNFPState
+from graphenv.examples.tsp.tsp_state import TSPState
+from graphenv.graph_env import GraphEnv
+from graphenv.vertex import Vertex, _lock_for
+
+
+class CountingVertex(Vertex):
+    """A binary tree of the given depth, counting how often it is expanded."""
+
+    thread_safe = True
+
+    def __init__(self, depth: int, counts: dict) -> None:
+        super().__init__()
+        self.depth = depth
+        self.counts = counts
+
+    @property
+    def observation_space(self) -> gym.spaces.Space:
+        return gym.spaces.Box(low=0, high=np.inf, shape=(1,))
+
+    @property
+    def root(self) -> "CountingVertex":
+        return self
+
+    @property
+    def reward(self) -> float:
+        return 0.0
+
+    def _count(self, key: str) -> None:
+        with self.counts["lock"]:
+            self.counts[key] += 1
+        time.sleep(0.01)  # widen the window for concurrent expansions
+
+    def _get_children(self):
+        self._count("children")
+        if self.depth > 0:
+            for _ in range(2):
+                yield CountingVertex(self.depth - 1, self.counts)
+
+    def _make_observation(self) -> np.ndarray:
+        self._count("observations")
+        return np.array([self.depth], dtype=np.float32)
+
+
+def test_concurrent_memoization():
+    counts = {"lock": threading.Lock(), "children": 0, "observations": 0}
+    root = CountingVertex(1, counts)
+
+    def read(_):
+        return root.children, root.observation, root.children[0].observation
+
+    with ThreadPoolExecutor(8) as executor:
+        results = list(executor.map(read, range(32)))
+
+    assert counts["children"] == 1
+    assert counts["observations"] == 2
+    assert all(children is results[0][0] for children, _, _ in results)
+    assert all(len(children) == 2 for children, _, _ in results)
+
+
+class LeafVertex(Vertex):
+    """A leaf observed as its index, with trivial hooks."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int) -> None:
+        super().__init__()
+        self.index = index
+
+    observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(1,))
+    root = None
+    reward = 0.0
+
+    def _get_children(self):
+        return ()
+
+    def _make_observation(self) -> int:
+        return self.index
+
+
+class PlainMemoLeaf(LeafVertex):
+    """Memoizes with a plain check-then-set, as a reference for the cost of
+    Vertex's memoization."""
+
+    __slots__ = ()
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = list(self._get_children())
+        return self._children
+
+    @property
+    def observation(self):
+        if self._observation is None:
+            self._observation = self._make_observation()
+        return self._observation
+
+
+def _first_reads(cls) -> float:
+    vertices = [cls(i) for i in range(20000)]
+    start = time.perf_counter()
+    for vertex in vertices:
+        vertex.children
+        vertex.observation
+    return time.perf_counter() - start
+
+
+def test_single_thread_memoization_overhead():
+    # Without thread_safe, computing memoized values takes no locks
+    plain = min(_first_reads(PlainMemoLeaf) for _ in range(5))
+    memoized = min(_first_reads(LeafVertex) for _ in range(5))
+    assert memoized < 1.5 * plain
+
+
+class PartnerVertex(CountingVertex):
+    """Observes itself by reading the observation of a partner vertex, once
+    every thread is observing."""
+
+    def __init__(self, barrier=None) -> None:
+        super().__init__(0, {"lock": threading.Lock(), "observations": 0})
+        self.barrier = barrier
+        self.partner = None
+
+    def _make_observation(self) -> np.ndarray:
+        if self.partner is None:
+            return np.zeros(1, dtype=np.float32)
+        self.barrier.wait(timeout=5)
+        return self.partner.observation + 1
+
+
+def test_no_deadlock_across_lock_stripes():
+    # Thread 1 observes a, reading b, while thread 2 observes c, reading d. With
+    # b sharing a lock stripe with c and d with a, holding a stripe while
+    # observing would deadlock.
+    barrier = threading.Barrier(2)
+    pool = [PartnerVertex(barrier) for _ in range(1000)]
+    a, c = next(
+        (a, c) for a in pool for c in pool if _lock_for(a) is not _lock_for(c)
+    )
+    b = next(v for v in pool if _lock_for(v) is _lock_for(c) and v is not c)
+    d = next(v for v in pool if _lock_for(v) is _lock_for(a) and v is not a)
+    a.partner, c.partner = b, d
+
+    threads = [
+        threading.Thread(target=lambda v=v: v.observation, daemon=True)
+        for v in (a, c)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert not any(thread.is_alive() for thread in threads)
+    assert a.observation[0] == c.observation[0] == 1
+
+
+def test_slots():
+    G = make_complete_planar_graph(N=5, seed=0)
+    for vertex in [HallwayState(5), TSPState(G), TSPNFPState(G)]:
+        assert not hasattr(vertex, "__dict__")
+        child = vertex.children[0]
+        assert child.children is child.children
+
+    # Subclasses without __slots__ keep working, with a __dict__
+    counts = {"lock": threading.Lock(), "children": 0, "observations": 0}
+    vertex = CountingVertex(1, counts)
+    assert vertex.__dict__ == {"depth": 1, "counts": counts}
+    assert len(vertex.children) == 2
+
+
+class SlowVertex(Vertex):
+    """A star of leaves that each take a while to observe."""
+
+    def __init__(self, width: int, index: int = -1) -> None:
+        super().__init__()
+        self.width = width
+        self.index = index
+
+    @property
+    def observation_space(self) -> gym.spaces.Space:
+        return gym.spaces.Box(low=-1, high=np.inf, shape=(1,))
+
+    @property
+    def root(self) -> "SlowVertex":
+        return SlowVertex(self.width)
+
+    @property
+    def reward(self) -> float:
+        return float(self.index)
+
+    def _get_children(self):
+        if self.index < 0:
+            for i in range(self.width):
+                yield SlowVertex(self.width, i)
+
+    def _make_observation(self) -> np.ndarray:
+        if self.index >= 0:
+            time.sleep(0.02)
+        return np.array([self.index], dtype=np.float32)
+
+
+class StreamedVertex(SlowVertex):
+    """A star of leaves, counted and created individually without generating
+    the others, recording which leaves are generated."""
+
+    def __init__(self, width: int, index: int = -1, generated=None) -> None:
+        super().__init__(width, index)
+        self.generated = [] if generated is None else generated
+
+    @property
+    def root(self) -> "StreamedVertex":
+        return StreamedVertex(self.width, generated=self.generated)
+
+    def _get_num_children(self) -> int:
+        return self.width if self.index < 0 else 0
+
+    def _get_children(self):
+        if self.index < 0:
+            for i in range(self.width):
+                self.generated.append(i)
+                yield StreamedVertex(self.width, i, self.generated)
+
+    def _get_children_subset(self, indices):
+        return [StreamedVertex(self.width, i, self.generated) for i in indices]
+
+
+def test_step_time_budget():
+    env = GraphEnv(
+        {"state": StreamedVertex(20), "max_num_children": 20, "step_time_budget": 0.1}
+    )
+    obs = env.reset()
+    num_observed = obs["action_mask"].sum()
+    assert 1 <= num_observed < 20
+    assert np.array_equal(
+        obs["vertex_observations"][1 : num_observed + 1, 0], range(num_observed)
+    )
+    assert (obs["vertex_observations"][num_observed + 1 :, 0] == -1).all()
+    assert env.num_observations == env.num_truncated_observations == 1
+
+    # Masked actions leave the state unchanged
+    with pytest.warns(RuntimeWarning):
+        _, _, _, info = env.step(19)
+    assert env.state.index == -1
+    assert info["truncated_children"] > 0
+
+    _, reward, done, info = env.step(0)
+    assert reward == 0.0 and done
+    assert info["truncated_children"] == 0
+    assert env.truncation_rate == 2 / 3
+
+    # Without a budget every child is observed
+    obs = GraphEnv({"state": SlowVertex(5), "max_num_children": 5}).reset()
+    assert obs["action_mask"][1:].all()
+
+    # Verticies have to count their children without creating them
+    with pytest.raises(ValueError, match="_get_num_children"):
+        GraphEnv(
+            {"state": SlowVertex(5), "max_num_children": 5, "step_time_budget": 0.1}
+        )
+
+
+class EvenVertex(SlowVertex):
+    """A star keeping only its even leaves by overriding children."""
+
+    @property
+    def root(self) -> "EvenVertex":
+        return EvenVertex(self.width)
+
+    @property
+    def children(self):
+        return [child for child in super().children if child.index % 2 == 0]
+
+
+def test_streamed_children():
+    # Children are counted without creating them, and streamed into the
+    # observation without memoizing them
+    vertex = StreamedVertex(4)
+    env = GraphEnv({"state": vertex, "max_num_children": 5})
+    assert not vertex.terminal and vertex.generated == []
+    obs = env.make_observation()
+    assert vertex._children is None and vertex.generated == [0, 1, 2, 3]
+    assert np.array_equal(obs["vertex_observations"][:, 0], [-1, 0, 1, 2, 3, -1])
+    assert np.array_equal(obs["action_mask"], [0, 1, 1, 1, 1, 0])
+
+    # The action moves to the streamed child, without generating it again
+    observed = env._streamed_children[2]
+    env.step(2)
+    assert env.state is observed and vertex.generated == [0, 1, 2, 3]
+
+    # Streaming stops generating children at the deadline
+    env = GraphEnv(
+        {
+            "state": StreamedVertex(20),
+            "max_num_children": 20,
+            "step_time_budget": 0.05,
+        }
+    )
+    obs = env.reset()
+    num_observed = obs["action_mask"].sum()
+    assert 1 <= num_observed < 20
+    assert env.state._children is None
+    assert env.state.generated == list(range(num_observed + 1))
+
+
+def test_streamed_children_override():
+    # Verticies overriding children are observed through it, like the step
+    env = GraphEnv({"state": EvenVertex(6), "max_num_children": 4})
+    obs = env.reset()
+    assert np.array_equal(obs["vertex_observations"][:, 0], [-1, 0, 2, 4, -1])
+    _, reward, _, _ = env.step(1)
+    assert env.state.index == 2 and reward == 2.0
+
+
+def test_pickle_drops_memoized_values():
+    G = make_complete_planar_graph(N=6, seed=0)
+    for vertex in [HallwayState(5), TSPState(G), TSPNFPState(G)]:
+        fresh = len(pickle.dumps(vertex))
+        for child in vertex.children:
+            child.observation
+        vertex.top_children(2)
+
+        copy = pickle.loads(pickle.dumps(vertex))
+        assert len(pickle.dumps(vertex)) == fresh
+        assert copy._children is None and copy._top_children is None
+        assert len(copy.children) == len(vertex.children)
+
+    # Subclasses with a __dict__ keep their attributes
+    counts = {"lock": None, "children": 0, "observations": 0}
+    copy = pickle.loads(pickle.dumps(CountingVertex(1, counts)))
+    assert copy.depth == 1 and copy.counts == counts
+
+
+class OneClusterVertex(SlowVertex):
+    """A star whose leaves are all grouped in a single cluster."""
+
+    def _get_child_clusters(self, max_size: int):
+        return [list(range(self.width))]
+
+
+def test_oversized_clusters():
+    vertex = OneClusterVertex(5)
+    assert len(vertex.cluster_representatives(5)) == 1
+    with pytest.raises(ValueError, match="more than the maximum of 4"):
+        vertex.cluster_representatives(4)
+    with pytest.raises(ValueError):
+        GraphEnv(
+            {"state": vertex, "max_num_children": 4, "hierarchical_actions": True}
+        )